@@ -1,7 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
 from django.db import models
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import FileResponse
+from django.utils import timezone
+import tempfile
+
+from dashboard.exportacao import ExportacaoIndisponivel, agendar_pregeracao, exportar_treinos_excel
+from personal.paginacao import PaginadorEstimado
 from .models import CustomUser, ConsultoriaOnline, Exercicio, Treino, DiaTreino, ExercicioTreino
 
 @admin.register(CustomUser)
@@ -14,14 +20,20 @@ class CustomUserAdmin(BaseUserAdmin):
     )
     list_display = ('username', 'email', 'whatsapp', 'first_name', 'last_name', 'is_staff')
     search_fields = ('username', 'email', 'first_name', 'last_name')
+    paginator = PaginadorEstimado
+    show_full_result_count = False
 
 
 @admin.register(ConsultoriaOnline)
 class ConsultoriaOnlineAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'aluno', 'ativa', 'data_inicio', 'data_fim', 'data_atualizacao')
-    list_filter = ('ativa', 'data_inicio', 'usuario')
+    list_filter = ('ativa', 'data_inicio')
+    list_select_related = ('usuario',)
     search_fields = ('usuario__username', 'usuario__email', 'usuario__first_name', 'usuario__last_name')
     readonly_fields = ('data_inicio', 'data_atualizacao')
+    autocomplete_fields = ('usuario',)
+    paginator = PaginadorEstimado
+    show_full_result_count = False
     
     fieldsets = (
         ('Informações do Aluno', {
@@ -41,13 +53,34 @@ class ConsultoriaOnlineAdmin(admin.ModelAdmin):
         }),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('usuario')
+    actions = ['exportar_treinos']
 
     def aluno(self, obj):
         return obj.usuario.get_full_name() or obj.usuario.username
     aluno.short_description = 'Aluno'
 
+    def exportar_treinos(self, request, queryset):
+        # Planilha gerada em arquivo temporário (write-only) e enviada em blocos
+        temporario = tempfile.TemporaryFile()
+        try:
+            total = exportar_treinos_excel(queryset, temporario)
+        except ExportacaoIndisponivel as e:
+            temporario.close()
+            self.message_user(request, str(e), messages.ERROR)
+            return None
+        if not total:
+            temporario.close()
+            self.message_user(request, 'Nenhum treino atual nas consultorias selecionadas.', messages.WARNING)
+            return None
+        temporario.seek(0)
+        return FileResponse(
+            temporario,
+            as_attachment=True,
+            filename=f"treinos_atuais_{timezone.localdate():%Y%m%d}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    exportar_treinos.short_description = 'Exportar treinos atuais (Excel, uma aba por aluno)'
+
 
 # ===== BANCO DE EXERCÍCIOS =====
 
@@ -57,6 +90,7 @@ class ExercicioAdmin(admin.ModelAdmin):
     list_filter = ('ativo', 'grupo_muscular')
     search_fields = ('nome', 'descricao', 'grupo_muscular')
     readonly_fields = ('criado_em', 'atualizado_em')
+    show_full_result_count = False
     
     fieldsets = (
         ('Informações Básicas', {
@@ -98,10 +132,14 @@ class DiaTreinoInline(admin.StackedInline):
 @admin.register(Treino)
 class TreinoAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'aluno', 'consultoria', 'status', 'criado_em')
-    list_filter = ('status', 'criado_em', 'consultoria__usuario')
+    list_filter = ('status', 'criado_em')
+    list_select_related = ('consultoria__usuario',)
     search_fields = ('titulo', 'descricao', 'consultoria__usuario__username', 'consultoria__usuario__email')
     readonly_fields = ('aluno', 'criado_em', 'atualizado_em')
+    autocomplete_fields = ('consultoria',)
     inlines = [DiaTreinoInline]
+    paginator = PaginadorEstimado
+    show_full_result_count = False
     
     fieldsets = (
         ('Informações do Treino', {
@@ -126,6 +164,12 @@ class TreinoAdmin(admin.ModelAdmin):
             ).exclude(pk=obj.pk).update(status='inativo')
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Dias e exercícios (inlines) já salvos: gera PDF/Excel em segundo plano
+        if form.instance.status == 'atual':
+            agendar_pregeracao(form.instance.consultoria_id)
+
     def aluno(self, obj):
         return obj.consultoria.usuario.get_full_name() or obj.consultoria.usuario.username
     aluno.short_description = 'Aluno'
@@ -134,10 +178,19 @@ class TreinoAdmin(admin.ModelAdmin):
 @admin.register(DiaTreino)
 class DiaTreinoAdmin(admin.ModelAdmin):
     list_display = ('nome', 'treino', 'aluno', 'ordem')
-    list_filter = ('treino', 'treino__consultoria__usuario')
-    search_fields = ('nome', 'treino__titulo')
+    list_filter = ('treino__status',)
+    list_select_related = ('treino__consultoria__usuario',)
+    search_fields = ('nome', 'treino__titulo', 'treino__consultoria__usuario__username', 'treino__consultoria__usuario__email')
+    autocomplete_fields = ('treino',)
     inlines = [ExercicioTreinoInline]
     ordering = ('treino', 'ordem')
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if form.instance.treino.status == 'atual':
+            agendar_pregeracao(form.instance.treino.consultoria_id)
 
     def aluno(self, obj):
         return obj.treino.consultoria.usuario.get_full_name() or obj.treino.consultoria.usuario.username
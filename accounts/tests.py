@@ -1,3 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from personal.tests import ChangelistMixin
+from .models import ConsultoriaOnline, DiaTreino, Exercicio, ExercicioTreino, Treino
+from .treinos import carregar_treino_atual, iterar_treinos_atuais
+
+User = get_user_model()
+
+
+def criar_treino(consultoria, dias=3, exercicios_por_dia=5, status='atual'):
+    treino = Treino.objects.create(consultoria=consultoria, titulo='Hipertrofia', status=status)
+    for ordem_dia in range(dias, 0, -1):
+        dia = DiaTreino.objects.create(treino=treino, nome=f'Treino {ordem_dia}', ordem=ordem_dia)
+        for ordem in range(exercicios_por_dia, 0, -1):
+            exercicio = Exercicio.objects.create(nome=f'Exercício {ordem_dia}.{ordem}', grupo_muscular='Peito')
+            ExercicioTreino.objects.create(
+                dia_treino=dia, exercicio=exercicio, ordem=ordem, series=4, repeticoes='10-12', carga='20kg',
+            )
+    return treino
+
+
+def criar_consultoria(username='aluno@a.com'):
+    usuario = User.objects.create_user(username=username, email=username, password='x12345')
+    return ConsultoriaOnline.objects.create(usuario=usuario)
+
+
+class CarregarTreinoTestCase(TestCase):
+    """O treino inteiro é lido em 3 consultas, qualquer que seja o tamanho do plano."""
+
+    def setUp(self):
+        self.consultoria = criar_consultoria()
+
+    def test_tres_consultas_independente_do_tamanho(self):
+        criar_treino(self.consultoria, dias=6, exercicios_por_dia=10)
+        with self.assertNumQueries(3):
+            plano = carregar_treino_atual(self.consultoria)
+
+        with self.assertNumQueries(0):
+            total = sum(len(dia.exercicios) for dia in plano.dias)
+        self.assertEqual((len(plano.dias), total), (6, 60))
+
+    def test_dias_e_exercicios_na_ordem(self):
+        criar_treino(self.consultoria, dias=2, exercicios_por_dia=2)
+        plano = carregar_treino_atual(self.consultoria)
+        self.assertEqual([dia.nome for dia in plano.dias], ['Treino 1', 'Treino 2'])
+        self.assertEqual([item.nome for item in plano.dias[0].exercicios], ['Exercício 1.1', 'Exercício 1.2'])
+        self.assertEqual((plano.dias[0].exercicios[0].series, plano.dias[0].exercicios[0].carga), (4, '20kg'))
+
+    def test_ignora_treinos_inativos(self):
+        criar_treino(self.consultoria, status='inativo')
+        with self.assertNumQueries(1):
+            self.assertIsNone(carregar_treino_atual(self.consultoria))
+
+    def test_iterar_treinos_consultas_por_lote(self):
+        consultorias = [self.consultoria] + [criar_consultoria(f'aluno{i}@a.com') for i in range(4)]
+        for consultoria in consultorias:
+            criar_treino(consultoria, dias=2, exercicios_por_dia=3)
+
+        with self.assertNumQueries(3):
+            resultado = list(iterar_treinos_atuais(consultorias))
+        self.assertEqual(len(resultado), 5)
+        self.assertEqual(resultado[0][0], self.consultoria.usuario)
+
+
+class PaginaTreinoTestCase(TestCase):
+    """A página do treino não faz uma consulta por dia ou exercício."""
+
+    def consultas_da_pagina(self, dias, exercicios_por_dia):
+        consultoria = criar_consultoria(f'aluno{dias}@a.com')
+        criar_treino(consultoria, dias=dias, exercicios_por_dia=exercicios_por_dia)
+        self.client.force_login(consultoria.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('dashboard:consultoria_treino'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, f'Exercício {dias}.{exercicios_por_dia}')
+        return len(consultas)
+
+    def test_consultas_constantes(self):
+        self.assertEqual(self.consultas_da_pagina(1, 1), self.consultas_da_pagina(6, 10))
+
+
+class ChangelistsConsultoriaTestCase(ChangelistMixin, TestCase):
+    """Changelists de usuários, consultorias e treinos sem consulta por linha."""
+
+    def novas_consultorias(self, n):
+        inicio = ConsultoriaOnline.objects.count()
+        return [criar_consultoria(f'aluno{inicio + i}@a.com') for i in range(n)]
+
+    def test_usuarios(self):
+        self.assertChangelistConstante(User, self.novas_consultorias)
+
+    def test_consultorias(self):
+        self.assertChangelistConstante(ConsultoriaOnline, self.novas_consultorias)
+
+    def test_treinos(self):
+        def criar(n):
+            for consultoria in self.novas_consultorias(n):
+                criar_treino(consultoria, dias=1, exercicios_por_dia=1)
+        self.assertChangelistConstante(Treino, criar)
+
+    def test_dias_de_treino(self):
+        def criar(n):
+            for consultoria in self.novas_consultorias(n):
+                criar_treino(consultoria, dias=1, exercicios_por_dia=0)
+        self.assertChangelistConstante(DiaTreino, criar)
@@ -0,0 +1,116 @@
+"""
+Leitura do treino da consultoria para exibição e exportação
+
+O treino inteiro (Treino → DiaTreino → ExercicioTreino → Exercicio) é buscado em
+um número fixo de consultas e convertido em estruturas imutáveis, que a página
+do aluno, o PDF e o Excel apenas percorrem, sem acessar o banco.
+"""
+from dataclasses import dataclass
+from django.db.models import Prefetch
+
+from .models import DiaTreino, ExercicioTreino, Treino
+
+
+@dataclass(frozen=True, slots=True)
+class ExercicioPlano:
+    nome: str
+    grupo_muscular: str
+    descricao: str
+    link_video: str
+    series: int
+    repeticoes: str
+    carga: str
+    descanso: str
+    observacao_especifica: str
+
+
+@dataclass(frozen=True, slots=True)
+class DiaPlano:
+    nome: str
+    descricao: str
+    exercicios: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class TreinoPlano:
+    id: int
+    titulo: str
+    descricao: str
+    arquivo_pdf_url: str
+    atualizado_em: object
+    dias: tuple
+
+
+def _exercicio_plano(item):
+    exercicio = item.exercicio
+    return ExercicioPlano(
+        nome=exercicio.nome,
+        grupo_muscular=exercicio.grupo_muscular,
+        descricao=exercicio.descricao,
+        link_video=exercicio.link_video,
+        series=item.series,
+        repeticoes=item.repeticoes,
+        carga=item.carga,
+        descanso=item.descanso,
+        observacao_especifica=item.observacao_especifica,
+    )
+
+
+def _treinos_atuais():
+    """Treinos atuais com dias e exercícios pré-carregados (3 consultas por lote)."""
+    return (
+        Treino.objects
+        .filter(status='atual')
+        .select_related('consultoria__usuario')
+        .prefetch_related(
+            Prefetch(
+                'dias',
+                queryset=DiaTreino.objects.order_by('ordem', 'id').prefetch_related(
+                    Prefetch(
+                        'exercicios',
+                        queryset=ExercicioTreino.objects.select_related('exercicio').order_by('ordem', 'id'),
+                    )
+                ),
+            )
+        )
+    )
+
+
+def _treino_plano(treino):
+    return TreinoPlano(
+        id=treino.id,
+        titulo=treino.titulo,
+        descricao=treino.descricao,
+        arquivo_pdf_url=treino.arquivo_pdf.url if treino.arquivo_pdf else '',
+        atualizado_em=treino.atualizado_em,
+        dias=tuple(
+            DiaPlano(
+                nome=dia.nome,
+                descricao=dia.descricao,
+                exercicios=tuple(_exercicio_plano(item) for item in dia.exercicios.all()),
+            )
+            for dia in treino.dias.all()
+        ),
+    )
+
+
+def carregar_treino_atual(consultoria):
+    """
+    Retorna o treino atual da consultoria como TreinoPlano (ou None), em 3 consultas:
+    treino, dias e exercícios (com o exercício do banco via JOIN).
+    """
+    treino = _treinos_atuais().filter(consultoria=consultoria).first()
+    if treino is None:
+        return None
+    return _treino_plano(treino)
+
+
+def iterar_treinos_atuais(consultorias, lote=100):
+    """
+    Percorre os treinos atuais das consultorias informadas, gerando
+    (usuario, TreinoPlano) em lotes de `lote` treinos - 3 consultas por lote,
+    sem manter todos os treinos em memória.
+    """
+    treinos = _treinos_atuais().filter(consultoria__in=consultorias).order_by('consultoria_id', '-criado_em')
+    for treino in treinos.iterator(chunk_size=lote):
+        yield treino.consultoria.usuario, _treino_plano(treino)
@@ -4,6 +4,48 @@ from produtos.models import Produto
 
 COUPON_SESSION_KEY = 'cupom_id'
 
+# Formato do carrinho na sessão: {"v": 2, "i": [[produto_id, quantidade, preco_centavos], ...]}
+# (a versão 1 era {"<produto_id>": {"quantidade": n, "preco": "10.00"}} e ainda é lida)
+VERSAO_CARRINHO = 2
+
+_SEM_CUPOM = object()
+
+
+def decodificar_carrinho(dados):
+    """Converte o carrinho da sessão em {produto_id: [quantidade, preco_centavos]}."""
+    if not dados:
+        return {}
+    if isinstance(dados, dict) and dados.get('v') == VERSAO_CARRINHO:
+        return {produto_id: [quantidade, centavos] for produto_id, quantidade, centavos in dados['i']}
+    # Formato antigo (v1)
+    return {
+        int(produto_id): [linha['quantidade'], int(Decimal(linha['preco']) * 100)]
+        for produto_id, linha in dados.items()
+    }
+
+
+def codificar_carrinho(linhas):
+    return {
+        'v': VERSAO_CARRINHO,
+        'i': [[produto_id, quantidade, centavos] for produto_id, (quantidade, centavos) in linhas.items()],
+    }
+
+
+def _centavos_para_preco(centavos):
+    return (Decimal(centavos) / 100).quantize(Decimal('0.01'))
+
+
+def obter_carrinho(request):
+    """
+    Retorna o carrinho do request, criado uma única vez por requisição.
+    Views e o context processor compartilham a mesma instância (e os caches
+    de cupom e produtos dela).
+    """
+    carrinho = getattr(request, '_carrinho', None)
+    if carrinho is None:
+        carrinho = request._carrinho = Carrinho(request)
+    return carrinho
+
 
 class Carrinho:
     """
@@ -15,35 +57,40 @@ class Carrinho:
         Inicializa o carrinho com a sessão do request.
         """
         self.session = request.session
-        carrinho = self.session.get(settings.CART_SESSION_ID)
-        
-        if not carrinho:
-            # Salva um carrinho vazio na sessão
-            carrinho = self.session[settings.CART_SESSION_ID] = {}
-        
-        self.carrinho = carrinho
+        # {produto_id: [quantidade, preco_centavos]}; carrinho vazio não é gravado na sessão
+        self.carrinho = decodificar_carrinho(self.session.get(settings.CART_SESSION_ID))
+
+        # Caches da requisição: cupom resolvido uma vez e produtos por id
+        self._cupom = _SEM_CUPOM
+        self._produtos = {}
 
     # ─── Métodos de Cupom ────────────────────────────────────────────────────
 
     @property
     def cupom(self):
-        """Retorna o objeto Cupom armazenado na sessão, ou None."""
+        """Retorna o objeto Cupom armazenado na sessão, ou None (consulta uma vez por requisição)."""
+        if self._cupom is not _SEM_CUPOM:
+            return self._cupom
+
         from carrinho.models import Cupom
+        self._cupom = None
         cupom_id = self.session.get(COUPON_SESSION_KEY)
         if cupom_id:
             try:
-                return Cupom.objects.get(id=cupom_id)
+                self._cupom = Cupom.objects.get(id=cupom_id)
             except Cupom.DoesNotExist:
                 self.clear_cupom()
-        return None
+        return self._cupom
 
     def set_cupom(self, cupom):
         """Armazena o ID do cupom na sessão."""
         self.session[COUPON_SESSION_KEY] = cupom.id
+        self._cupom = cupom
         self.save()
 
     def clear_cupom(self):
         """Remove o cupom da sessão."""
+        self._cupom = None
         if COUPON_SESSION_KEY in self.session:
             del self.session[COUPON_SESSION_KEY]
             self.save()
@@ -72,26 +119,30 @@ class Carrinho:
             quantidade: Quantidade a adicionar (padrão 1)
             substituir_quantidade: Se True, substitui a quantidade ao invés de somar
         """
-        produto_id = str(produto.id)
-        
-        if produto_id not in self.carrinho:
-            self.carrinho[produto_id] = {
-                'quantidade': 0,
-                'preco': str(produto.preco_final)
-            }
-        
+        self._produtos[produto.id] = produto
+        linha = self.carrinho.get(produto.id)
+        anterior = list(linha) if linha else None
+
+        if linha is None:
+            linha = self.carrinho[produto.id] = [0, int(produto.preco_final * 100)]
+
         if substituir_quantidade:
-            self.carrinho[produto_id]['quantidade'] = quantidade
+            linha[0] = quantidade
         else:
-            self.carrinho[produto_id]['quantidade'] += quantidade
-        
-        self.save()
+            linha[0] += quantidade
+
+        # Re-adicionar o mesmo produto sem mudança não grava a sessão
+        if linha != anterior:
+            self.save()
     
     def save(self):
         """
-        Marca a sessão como modificada para garantir que seja salva.
+        Grava o carrinho codificado na sessão (a sessão fica marcada como modificada).
         """
-        self.session.modified = True
+        if self.carrinho:
+            self.session[settings.CART_SESSION_ID] = codificar_carrinho(self.carrinho)
+        else:
+            self.session.pop(settings.CART_SESSION_ID, None)
     
     def remove(self, produto):
         """
@@ -100,47 +151,59 @@ class Carrinho:
         Args:
             produto: Instância do modelo Produto ou ID do produto
         """
-        produto_id = str(produto.id if hasattr(produto, 'id') else produto)
+        produto_id = int(produto.id if hasattr(produto, 'id') else produto)
         
         if produto_id in self.carrinho:
             del self.carrinho[produto_id]
             self.save()
+
+    def linhas(self):
+        """Itens do carrinho como (produto_id, quantidade, preco), sem consultar o banco."""
+        return [
+            (produto_id, quantidade, _centavos_para_preco(centavos))
+            for produto_id, (quantidade, centavos) in self.carrinho.items()
+        ]
     
     def __iter__(self):
         """
         Itera pelos itens no carrinho e busca os produtos no banco de dados.
+        Os produtos ficam em cache na instância: iterar de novo na mesma
+        requisição não consulta o banco, e a sessão não é alterada.
         """
-        produtos_ids = self.carrinho.keys()
-        produtos = Produto.objects.filter(id__in=produtos_ids)
-        
-        carrinho = self.carrinho.copy()
-        
-        for produto in produtos:
-            carrinho[str(produto.id)]['produto'] = produto
-        
-        for item in carrinho.values():
-            item['preco'] = Decimal(item['preco'])
-            item['total_preco'] = item['preco'] * item['quantidade']
-            yield item
+        produtos = self.get_produtos()
+
+        for produto_id, quantidade, preco in self.linhas():
+            yield {
+                'quantidade': quantidade,
+                'preco': preco,
+                'total_preco': preco * quantidade,
+                'produto': produtos.get(produto_id),
+            }
+
+    def get_produtos(self):
+        """Produtos do carrinho por id, buscando no banco apenas os que faltam no cache."""
+        faltando = [produto_id for produto_id in self.carrinho if produto_id not in self._produtos]
+        if faltando:
+            self._produtos.update(Produto.objects.select_related('categoria').in_bulk(faltando))
+        return self._produtos
     
     def __len__(self):
         """
         Retorna o número total de itens no carrinho.
         """
-        return sum(item['quantidade'] for item in self.carrinho.values())
+        return sum(quantidade for quantidade, _ in self.carrinho.values())
     
     def get_total_preco(self):
         """
         Calcula o preço total de todos os itens no carrinho.
         """
-        return sum(
-            Decimal(item['preco']) * item['quantidade'] 
-            for item in self.carrinho.values()
+        return _centavos_para_preco(
+            sum(quantidade * centavos for quantidade, centavos in self.carrinho.values())
         )
     
     def clear(self):
         """
         Limpa o carrinho da sessão.
         """
-        del self.session[settings.CART_SESSION_ID]
+        self.carrinho = {}
         self.save()
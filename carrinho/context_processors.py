@@ -1,8 +1,11 @@
-from .carrinho import Carrinho
+from django.utils.functional import SimpleLazyObject
+
+from .carrinho import obter_carrinho
 
 
 def carrinho(request):
     """
     Context processor para disponibilizar o carrinho em todos os templates.
+    O carrinho só é montado (e a sessão lida) se o template usá-lo.
     """
-    return {'carrinho': Carrinho(request)}
+    return {'carrinho': SimpleLazyObject(lambda: obter_carrinho(request))}
@@ -0,0 +1,96 @@
+"""
+Uso de cupons sem corrida entre checkouts simultâneos
+
+O uso é reservado ao criar o pedido com um UPDATE condicional
+(`total_usado < uso_maximo`): o banco decide qual checkout fica com o último
+uso, sem ler-e-gravar em Python e sem bloquear a tabela. `total_usado` conta
+usos reservados e confirmados.
+
+Ciclo do uso no pedido (Pedido.cupom_status):
+    reservado  -> confirmado (pagamento aprovado)
+    reservado  -> liberado   (pedido cancelado, descartado ou expirado)
+As transições também são UPDATEs condicionais, então reprocessar o mesmo
+evento (webhook repetido) não conta nem devolve o uso duas vezes.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from produtos.models import Pedido
+from .models import Cupom
+
+
+def reservar_uso(cupom):
+    """Reserva um uso do cupom. Retorna False se ele esgotou, expirou ou foi desativado."""
+    atualizados = (
+        Cupom.objects.filter(id=cupom.pk, ativo=True)
+        .filter(Q(validade__isnull=True) | Q(validade__gt=timezone.now()))
+        .filter(Q(uso_maximo__isnull=True) | Q(total_usado__lt=F('uso_maximo')))
+        .update(total_usado=F('total_usado') + 1)
+    )
+    return atualizados == 1
+
+
+def confirmar_usos(pedido_ids):
+    """
+    Confirma os usos reservados dos pedidos (pagamento aprovado). Pedidos que
+    tiveram o uso liberado e foram aprovados depois (nova tentativa de
+    pagamento) voltam a contar o uso, mesmo acima do limite: o desconto já foi pago.
+    """
+    with transaction.atomic():
+        confirmados = Pedido.objects.filter(id__in=pedido_ids, cupom_status='reservado').update(
+            cupom_status='confirmado'
+        )
+        liberados = list(
+            Pedido.objects.select_for_update()
+            .filter(id__in=pedido_ids, cupom_status='liberado', cupom__isnull=False)
+            .values_list('id', 'cupom_id')
+        )
+        if liberados:
+            Pedido.objects.filter(id__in=[pedido_id for pedido_id, _ in liberados]).update(cupom_status='confirmado')
+            _ajustar_total_usado([cupom_id for _, cupom_id in liberados], +1)
+    return confirmados + len(liberados)
+
+
+def _ajustar_total_usado(cupom_ids, sinal):
+    """Soma (sinal=+1) ou subtrai (sinal=-1) um uso por ocorrência de cada cupom."""
+    por_cupom = defaultdict(int)
+    for cupom_id in cupom_ids:
+        if cupom_id:
+            por_cupom[cupom_id] += 1
+    # Um UPDATE por quantidade distinta (normalmente um só)
+    por_quantidade = defaultdict(list)
+    for cupom_id, quantidade in por_cupom.items():
+        por_quantidade[quantidade].append(cupom_id)
+    for quantidade, ids in por_quantidade.items():
+        cupons = Cupom.objects.filter(id__in=ids)
+        if sinal < 0:
+            cupons = cupons.filter(total_usado__gte=quantidade)
+        cupons.update(total_usado=F('total_usado') + sinal * quantidade)
+
+
+def liberar_usos(pedido_ids):
+    """Devolve ao cupom os usos ainda reservados dos pedidos. Retorna quantos foram devolvidos."""
+    with transaction.atomic():
+        reservados = list(
+            Pedido.objects.select_for_update()
+            .filter(id__in=pedido_ids, cupom_status='reservado')
+            .values_list('id', 'cupom_id')
+        )
+        if not reservados:
+            return 0
+
+        Pedido.objects.filter(id__in=[pedido_id for pedido_id, _ in reservados]).update(cupom_status='liberado')
+
+        _ajustar_total_usado([cupom_id for _, cupom_id in reservados], -1)
+
+    return len(reservados)
+
+
+def confirmar_uso(pedido):
+    return confirmar_usos([pedido.pk])
+
+
+def liberar_uso(pedido):
+    return liberar_usos([pedido.pk])
@@ -76,12 +76,19 @@ class Cupom(models.Model):
             raise ValidationError({'valor': 'O valor do desconto deve ser maior que zero.'})
 
     @property
-    def esta_valido(self):
-        """Retorna True se o cupom pode ser usado agora."""
+    def esta_ativo(self):
+        """Retorna True se o cupom está ativo e dentro da validade (sem olhar o limite de usos)."""
         if not self.ativo:
             return False
         if self.validade and timezone.now() > self.validade:
             return False
+        return True
+
+    @property
+    def esta_valido(self):
+        """Retorna True se o cupom pode ser usado agora."""
+        if not self.esta_ativo:
+            return False
         if self.uso_maximo is not None and self.total_usado >= self.uso_maximo:
             return False
         return True
@@ -1,3 +1,242 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+import json
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from checkout.limpeza import cancelar_abandonados
+from checkout.pagamentos import aplicar_status_pagamento
+from produtos.models import Categoria, Pedido, Produto
+from .carrinho import Carrinho, codificar_carrinho, decodificar_carrinho, obter_carrinho
+from .context_processors import carrinho as carrinho_context_processor
+from .cupons import confirmar_usos, liberar_usos, reservar_uso
+from .models import Cupom
+
+
+def criar_produto(slug='ebook', preco='10.00', preco_promocional=None):
+    categoria = Categoria.objects.get_or_create(nome='Ebooks', slug='ebooks')[0]
+    return Produto.objects.create(
+        nome=slug.title(), slug=slug, categoria=categoria, preco=Decimal(preco),
+        preco_promocional=Decimal(preco_promocional) if preco_promocional else None, status='publicado',
+    )
+
+
+class CodificacaoCarrinhoTestCase(TestCase):
+    """Formato compacto e versionado do carrinho na sessão."""
+
+    def setUp(self):
+        self.sessoes = import_module(settings.SESSION_ENGINE).SessionStore
+
+    def carrinho(self, sessao):
+        request = RequestFactory().get('/')
+        request.session = sessao
+        return Carrinho(request)
+
+    def test_codificacao_ida_e_volta(self):
+        linhas = {3: [1, 1990], 7: [2, 5000]}
+        codificado = codificar_carrinho(linhas)
+        self.assertEqual(codificado, {'v': 2, 'i': [[3, 1, 1990], [7, 2, 5000]]})
+        self.assertEqual(decodificar_carrinho(json.loads(json.dumps(codificado))), linhas)
+
+    def test_carrinho_sobrevive_a_gravacao_da_sessao(self):
+        produto = criar_produto(preco='19.90')
+        sessao = self.sessoes()
+        self.carrinho(sessao).add(produto)
+        sessao.save()
+
+        carrinho = self.carrinho(self.sessoes(sessao.session_key))
+        self.assertEqual(carrinho.linhas(), [(produto.id, 1, Decimal('19.90'))])
+        self.assertEqual(carrinho.get_total_preco(), Decimal('19.90'))
+
+    def test_formato_antigo_e_lido_e_regravado_na_proxima_alteracao(self):
+        primeiro, segundo = criar_produto('um', '10.00'), criar_produto('dois', '7.50')
+        sessao = self.sessoes()
+        sessao[settings.CART_SESSION_ID] = {str(primeiro.id): {'quantidade': 2, 'preco': '10.00'}}
+
+        carrinho = self.carrinho(sessao)
+        self.assertEqual(carrinho.linhas(), [(primeiro.id, 2, Decimal('10.00'))])
+
+        carrinho.add(segundo)
+        self.assertEqual(sessao[settings.CART_SESSION_ID], {
+            'v': 2, 'i': [[primeiro.id, 2, 1000], [segundo.id, 1, 750]],
+        })
+
+    def test_formato_novo_e_menor_que_o_antigo(self):
+        antigo = {str(produto_id): {'quantidade': 1, 'preco': '149.90'} for produto_id in range(100, 110)}
+        novo = codificar_carrinho(decodificar_carrinho(antigo))
+        self.assertLess(len(json.dumps(novo)), len(json.dumps(antigo)) / 2)
+
+    def test_preco_promocional_em_centavos(self):
+        produto = criar_produto(preco='99.90', preco_promocional='49.95')
+        sessao = self.sessoes()
+        self.carrinho(sessao).add(produto, quantidade=3)
+        self.assertEqual(sessao[settings.CART_SESSION_ID]['i'], [[produto.id, 3, 4995]])
+        self.assertEqual(self.carrinho(sessao).get_total_preco(), Decimal('149.85'))
+
+    def test_readicionar_sem_mudanca_nao_grava_a_sessao(self):
+        produto = criar_produto()
+        sessao = self.sessoes()
+        self.carrinho(sessao).add(produto, substituir_quantidade=True)
+        sessao.save()
+
+        sessao = self.sessoes(sessao.session_key)
+        carrinho = self.carrinho(sessao)
+        carrinho.add(produto, substituir_quantidade=True)
+        list(carrinho)
+        self.assertFalse(sessao.modified)
+
+    def test_iterar_nao_altera_a_sessao(self):
+        produto = criar_produto()
+        sessao = self.sessoes()
+        self.carrinho(sessao).add(produto)
+        gravado = json.dumps(sessao[settings.CART_SESSION_ID])
+
+        for item in self.carrinho(sessao):
+            item['quantidade'] = 99
+        self.assertEqual(json.dumps(sessao[settings.CART_SESSION_ID]), gravado)
+
+    def test_remover_ultimo_item_tira_o_carrinho_da_sessao(self):
+        produto = criar_produto()
+        sessao = self.sessoes()
+        carrinho = self.carrinho(sessao)
+        carrinho.add(produto)
+        carrinho.remove(produto.id)
+        self.assertNotIn(settings.CART_SESSION_ID, sessao)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class SessaoCarrinhoTestCase(TestCase):
+    """Com sessões cached_db, ver o carrinho não consulta a tabela de sessões."""
+
+    def test_ver_carrinho_nao_consulta_sessoes(self):
+        produto = criar_produto()
+        self.client.post(reverse('carrinho:carrinho_add', args=[produto.id]))
+        self.assertEqual(self.client.session[settings.CART_SESSION_ID]['i'], [[produto.id, 1, 1000]])
+
+        with self.assertNumQueries(1):  # apenas os produtos do carrinho
+            resposta = self.client.get(reverse('carrinho:carrinho_detalhes'))
+        self.assertContains(resposta, produto.nome)
+
+
+class UsoCupomTestCase(TestCase):
+    """Reserva, confirmação e devolução de usos do cupom com UPDATEs condicionais."""
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username='aluno@a.com', email='aluno@a.com')
+        self.cupom = Cupom.objects.create(codigo='BEMVINDO10', valor=Decimal('10'), uso_maximo=2)
+
+    def total_usado(self):
+        return Cupom.objects.get(pk=self.cupom.pk).total_usado
+
+    def pedido_com_cupom(self):
+        """Pedido criado no checkout: reserva o uso e guarda a reserva no pedido."""
+        self.assertTrue(reservar_uso(self.cupom))
+        return Pedido.objects.create(
+            usuario=self.usuario, nome_compra='Aluno', email_compra=self.usuario.email,
+            subtotal=Decimal('10.00'), desconto=Decimal('1.00'), total=Decimal('9.00'),
+            cupom=self.cupom, codigo_cupom=self.cupom.codigo, cupom_status='reservado',
+        )
+
+    def cupom_status(self, pedido):
+        return Pedido.objects.get(pk=pedido.pk).cupom_status
+
+    def test_reserva_recusada_ao_atingir_o_limite(self):
+        self.assertTrue(reservar_uso(self.cupom))
+        self.assertTrue(reservar_uso(self.cupom))
+        self.assertFalse(reservar_uso(self.cupom))
+        self.assertEqual(self.total_usado(), 2)
+
+    def test_reserva_recusada_para_cupom_expirado_ou_inativo(self):
+        Cupom.objects.filter(pk=self.cupom.pk).update(validade=timezone.now() - timedelta(minutes=1))
+        self.assertFalse(reservar_uso(self.cupom))
+        Cupom.objects.filter(pk=self.cupom.pk).update(validade=None, ativo=False)
+        self.assertFalse(reservar_uso(self.cupom))
+        self.assertEqual(self.total_usado(), 0)
+
+    def test_confirmacao_acontece_uma_vez(self):
+        pedido = self.pedido_com_cupom()
+        self.assertEqual(confirmar_usos([pedido.pk]), 1)
+        self.assertEqual(confirmar_usos([pedido.pk]), 0)
+        self.assertEqual(self.cupom_status(pedido), 'confirmado')
+        self.assertEqual(self.total_usado(), 1)
+
+        # Uso confirmado não é devolvido
+        self.assertEqual(liberar_usos([pedido.pk]), 0)
+        self.assertEqual(self.cupom_status(pedido), 'confirmado')
+        self.assertEqual(self.total_usado(), 1)
+
+    def test_devolucao_acontece_uma_vez(self):
+        pedido = self.pedido_com_cupom()
+        self.assertEqual(liberar_usos([pedido.pk]), 1)
+        self.assertEqual(liberar_usos([pedido.pk]), 0)
+        self.assertEqual(self.cupom_status(pedido), 'liberado')
+        self.assertEqual(self.total_usado(), 0)
+
+    def test_aprovacao_depois_da_devolucao_volta_a_contar(self):
+        pedido = self.pedido_com_cupom()
+        liberar_usos([pedido.pk])
+        self.assertEqual(confirmar_usos([pedido.pk]), 1)
+        self.assertEqual(self.cupom_status(pedido), 'confirmado')
+        self.assertEqual(self.total_usado(), 1)
+
+    def test_cancelamento_do_pagamento_devolve_o_uso(self):
+        pedido = self.pedido_com_cupom()
+        self.pedido_com_cupom()
+        self.assertFalse(reservar_uso(self.cupom))
+
+        aplicar_status_pagamento(pedido, 555, 'rejected', origem='webhook', valor=pedido.total)
+
+        self.assertEqual(self.cupom_status(pedido), 'liberado')
+        self.assertTrue(reservar_uso(self.cupom))
+
+    def test_pedido_expirado_devolve_o_uso(self):
+        pedido = self.pedido_com_cupom()
+        self.pedido_com_cupom()
+        Pedido.objects.filter(pk=pedido.pk).update(atualizado_em=timezone.now() - timedelta(hours=73))
+
+        self.assertEqual(cancelar_abandonados(horas=72, pausa=0), (1, 1))
+
+        self.assertEqual(self.cupom_status(pedido), 'liberado')
+        self.assertEqual(self.total_usado(), 1)
+        self.assertTrue(reservar_uso(self.cupom))
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class CarrinhoPreguicosoTestCase(TestCase):
+    """O carrinho só é montado (e a sessão lida) quando a requisição o usa."""
+
+    def setUp(self):
+        produto = criar_produto()
+        self.client.post(reverse('carrinho:carrinho_add', args=[produto.id]))
+
+    def test_pagina_sem_carrinho_nao_le_a_sessao(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('accounts:cadastro'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(consultas.captured_queries, [])
+
+    def test_pagina_com_carrinho_le_a_sessao(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('sales'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(any('django_session' in consulta['sql'] for consulta in consultas.captured_queries))
+
+    def test_context_processor_compartilha_o_carrinho_da_view(self):
+        request = RequestFactory().get('/')
+        request.session = mock.MagicMock()
+        contexto = carrinho_context_processor(request)
+
+        request.session.get.assert_not_called()
+        self.assertFalse(hasattr(request, '_carrinho'))
+
+        len(contexto['carrinho'])
+        self.assertIs(obter_carrinho(request), request._carrinho)
+        self.assertEqual(request.session.get.call_count, 1)
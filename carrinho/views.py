@@ -6,7 +6,7 @@ from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
 from produtos.models import Produto
-from .carrinho import Carrinho
+from .carrinho import obter_carrinho
 from .models import Cupom
 
 
@@ -14,7 +14,7 @@ def carrinho_detalhes(request):
     """
     Exibe o carrinho de compras.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     return render(request, 'carrinho/detalhes.html', {'carrinho': carrinho})
 
 
@@ -23,7 +23,7 @@ def carrinho_add(request, produto_id):
     """
     Adiciona um produto ao carrinho.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     produto = get_object_or_404(Produto, id=produto_id, status='publicado')
     
     # Como são produtos digitais, geralmente não duplicamos (quantidade sempre 1)
@@ -40,7 +40,7 @@ def carrinho_remove(request, produto_id):
     """
     Remove um produto do carrinho.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     produto = get_object_or_404(Produto, id=produto_id)
     
     carrinho.remove(produto)
@@ -54,7 +54,7 @@ def carrinho_clear(request):
     """
     Limpa todos os itens do carrinho.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     carrinho.clear()
     
     messages.info(request, 'O carrinho foi esvaziado.')
@@ -67,7 +67,7 @@ def aplicar_cupom(request):
     """
     Aplica um cupom de desconto ao carrinho (validação 100% no backend).
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     codigo = request.POST.get('codigo', '').strip().upper()
 
     if not codigo:
@@ -114,7 +114,7 @@ def remover_cupom(request):
     """
     Remove o cupom aplicado ao carrinho.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     carrinho.clear_cupom()
     messages.info(request, 'Cupom removido.')
     return redirect('carrinho:carrinho_detalhes')
@@ -1,8 +1,97 @@
 """
 Admin da app Checkout
-Os models estão em produtos.models (Pedido, ItemPedido, AcessoProduto)
-Esta app contém apenas a lógica de processamento de pagamento
+Os models de pedido estão em produtos.models (Pedido, ItemPedido, AcessoProduto)
+Aqui ficam apenas os models de processamento de pagamento
 """
+from datetime import timedelta
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
+from personal.paginacao import PaginadorEstimado
+from .models import NotificacaoWebhook, PagamentoEvento, EmailSaida
 
-# Registros de admin estão em produtos/admin.py
+# Registros de Pedido/ItemPedido/AcessoProduto estão em produtos/admin.py
+
+
+@admin.register(NotificacaoWebhook)
+class NotificacaoWebhookAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'payment_id', 'status', 'tentativas', 'proxima_tentativa_em', 'recebido_em', 'processado_em']
+    list_filter = ['status', 'tipo', 'recebido_em']
+    search_fields = ['payment_id']
+    readonly_fields = ['tipo', 'payment_id', 'chave', 'payload', 'tentativas', 'lote', 'ultimo_erro', 'recebido_em', 'processado_em']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    actions = ['reprocessar']
+
+    def reprocessar(self, request, queryset):
+        total = queryset.exclude(status='processado').update(
+            status='pendente',
+            tentativas=0,
+            proxima_tentativa_em=timezone.now(),
+        )
+        self.message_user(request, f'{total} notificação(ões) reenviada(s) para a fila.')
+    reprocessar.short_description = 'Reenviar para a fila'
+
+
+@admin.register(PagamentoEvento)
+class PagamentoEventoAdmin(admin.ModelAdmin):
+    list_display = ['payment_id', 'status', 'pedido', 'status_pedido_anterior', 'status_pedido', 'origem', 'valor', 'criado_em']
+    list_filter = ['status', 'origem', 'provedor', 'criado_em']
+    list_select_related = ['pedido__usuario']
+    search_fields = ['payment_id', 'pedido__id']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    readonly_fields = [
+        'provedor', 'payment_id', 'status', 'pedido', 'origem', 'status_pedido_anterior',
+        'status_pedido', 'valor', 'dados', 'criado_em'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class EmailTravadoFilter(admin.SimpleListFilter):
+    """E-mails que precisam de atenção: com erro, atrasados ou presos em envio."""
+    title = 'situação'
+    parameter_name = 'situacao'
+
+    def lookups(self, request, model_admin):
+        return [('travados', 'Travados')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'travados':
+            agora = timezone.now()
+            return queryset.filter(
+                Q(status='erro')
+                | Q(status='pendente', criado_em__lt=agora - timedelta(minutes=15))
+                | Q(status='processando', proxima_tentativa_em__lt=agora)
+            )
+        return queryset
+
+
+@admin.register(EmailSaida)
+class EmailSaidaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'destinatario', 'assunto', 'status', 'tentativas', 'proxima_tentativa_em', 'criado_em', 'enviado_em']
+    list_filter = [EmailTravadoFilter, 'status', 'criado_em']
+    search_fields = ['destinatario', 'assunto', 'pedido__id']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    readonly_fields = [
+        'destinatario', 'assunto', 'corpo_texto', 'corpo_html', 'pedido', 'tentativas',
+        'lote', 'ultimo_erro', 'criado_em', 'enviado_em'
+    ]
+
+    actions = ['reenviar']
+
+    def reenviar(self, request, queryset):
+        total = queryset.exclude(status='enviado').update(
+            status='pendente',
+            tentativas=0,
+            proxima_tentativa_em=timezone.now(),
+        )
+        self.message_user(request, f'{total} e-mail(s) reenviado(s) para a fila.')
+    reenviar.short_description = 'Reenviar para a fila'
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,140 @@
+"""
+Caixa de saída de e-mails
+
+O fluxo de pagamento apenas enfileira (INSERT na mesma transação da aprovação).
+O envio acontece em `python manage.py enviar_emails`, em lotes, por uma única
+conexão SMTP persistente, com retentativas e status por mensagem.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+import logging
+
+from .filas import proxima_tentativa, reservar_lote
+from .models import EmailSaida
+
+logger = logging.getLogger('mercadopago')
+
+
+def enfileirar_email(destinatario, assunto, corpo_texto, corpo_html='', pedido=None):
+    """Grava o e-mail na caixa de saída."""
+    return EmailSaida.objects.create(
+        destinatario=destinatario,
+        assunto=assunto,
+        corpo_texto=corpo_texto,
+        corpo_html=corpo_html,
+        pedido=pedido,
+    )
+
+
+def enfileirar_email_confirmacao(pedido):
+    """Enfileira o e-mail de confirmação de compra ao cliente após aprovação."""
+    nome_cliente = pedido.nome_compra or pedido.usuario.get_full_name() or pedido.usuario.email
+    itens = pedido.itens.all()
+    base_url = getattr(settings, 'MERCADOPAGO_BASE_URL', '') or ''
+
+    context = {
+        'pedido': pedido,
+        'itens': itens,
+        'nome_cliente': nome_cliente,
+        'base_url': base_url,
+    }
+
+    email = enfileirar_email(
+        destinatario=pedido.email_compra,
+        assunto=f'EvolutyApp - Confirmação do Pedido #{pedido.id}',
+        corpo_texto=f'Seu pedido #{pedido.id} foi aprovado! Acesse seu painel: {base_url}/dashboard/',
+        corpo_html=render_to_string('emails/confirmacao_compra.html', context),
+        pedido=pedido,
+    )
+    logger.info(f'✉️ E-mail de confirmação enfileirado para {pedido.email_compra} - Pedido #{pedido.id}')
+    return email
+
+
+def _montar_mensagem(email, connection):
+    mensagem = EmailMultiAlternatives(
+        subject=email.assunto,
+        body=email.corpo_texto,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.destinatario],
+        connection=connection,
+    )
+    if email.corpo_html:
+        mensagem.attach_alternative(email.corpo_html, 'text/html')
+    return mensagem
+
+
+def enviar_lote(tamanho=50, max_tentativas=None):
+    """
+    Envia um lote da caixa de saída usando uma única conexão SMTP.
+    Retorna a quantidade de e-mails consumidos (enviados ou com falha).
+    """
+    if max_tentativas is None:
+        max_tentativas = getattr(settings, 'EMAIL_MAX_TENTATIVAS', 6)
+
+    emails = reservar_lote(EmailSaida, tamanho, getattr(settings, 'EMAIL_RESERVA_SEGUNDOS', 300))
+    if not emails:
+        return 0
+
+    enviados = []
+    connection = get_connection()
+    try:
+        connection.open()
+        for email in emails:
+            try:
+                connection.send_messages([_montar_mensagem(email, connection)])
+            except Exception as e:
+                tentativas = email.tentativas + 1
+                esgotou = tentativas >= max_tentativas
+                EmailSaida.objects.filter(id=email.id).update(
+                    status='erro' if esgotou else 'pendente',
+                    tentativas=F('tentativas') + 1,
+                    proxima_tentativa_em=proxima_tentativa(
+                        tentativas,
+                        getattr(settings, 'EMAIL_BACKOFF_SEGUNDOS', 60),
+                        getattr(settings, 'EMAIL_BACKOFF_MAXIMO', 3600),
+                    ),
+                    ultimo_erro=str(e)[:2000],
+                )
+                logger.error(f'Falha ao enviar e-mail #{email.id} para {email.destinatario} (tentativa {tentativas}): {e}')
+                # A conexão pode ter caído: reabre para as próximas mensagens
+                connection.close()
+                connection.open()
+                continue
+            enviados.append(email.id)
+    except Exception as e:
+        # Falha ao abrir a conexão: devolve o restante do lote para a fila
+        restantes = [email.id for email in emails if email.id not in enviados]
+        EmailSaida.objects.filter(id__in=restantes, status='processando').update(
+            status='pendente',
+            tentativas=F('tentativas') + 1,
+            proxima_tentativa_em=proxima_tentativa(1, getattr(settings, 'EMAIL_BACKOFF_SEGUNDOS', 60), 3600),
+            ultimo_erro=str(e)[:2000],
+        )
+        logger.error(f'Falha na conexão SMTP: {e}')
+    finally:
+        connection.close()
+        if enviados:
+            EmailSaida.objects.filter(id__in=enviados).update(
+                status='enviado',
+                enviado_em=timezone.now(),
+                ultimo_erro='',
+            )
+            logger.info(f'✉️ {len(enviados)} e-mail(s) enviado(s)')
+
+    return len(emails)
+
+
+def enviar_fila(tamanho=50, max_lotes=None, max_tentativas=None):
+    """Esvazia a caixa de saída em lotes sucessivos. Retorna o total consumido."""
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        consumidos = enviar_lote(tamanho, max_tentativas=max_tentativas)
+        if not consumidos:
+            break
+        total += consumidos
+        lotes += 1
+    return total
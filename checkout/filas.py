@@ -0,0 +1,44 @@
+"""
+Utilitários das filas em banco (notificações do webhook, e-mails)
+
+Os workers reservam lotes por um tempo limitado (campo `proxima_tentativa_em`
+passa a ser o fim da reserva). Se o worker morrer, a reserva expira e os itens
+voltam a ficar disponíveis; vários workers podem rodar sem pegar o mesmo item.
+"""
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+import uuid
+
+
+def disponiveis(modelo, agora):
+    """Itens prontos para processar: pendentes ou com reserva expirada."""
+    return modelo.objects.filter(
+        Q(status='pendente') | Q(status='processando'),
+        proxima_tentativa_em__lte=agora,
+    )
+
+
+def reservar_lote(modelo, tamanho, reserva_segundos):
+    """Reserva até `tamanho` itens para este worker e devolve os reservados."""
+    agora = timezone.now()
+    ids = list(
+        disponiveis(modelo, agora)
+        .order_by('proxima_tentativa_em', 'id')
+        .values_list('id', flat=True)[:tamanho]
+    )
+    if not ids:
+        return []
+
+    lote = uuid.uuid4().hex
+    disponiveis(modelo, agora).filter(id__in=ids).update(
+        status='processando',
+        lote=lote,
+        proxima_tentativa_em=agora + timedelta(seconds=reserva_segundos),
+    )
+    return list(modelo.objects.filter(lote=lote, status='processando').order_by('id'))
+
+
+def proxima_tentativa(tentativas, base, maximo):
+    """Backoff exponencial: base, 2*base, 4*base... limitado a `maximo` segundos."""
+    return timezone.now() + timedelta(seconds=min(base * 2 ** max(tentativas - 1, 0), maximo))
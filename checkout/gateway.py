@@ -0,0 +1,188 @@
+"""
+Cliente do gateway de pagamento (Mercado Pago)
+
+Um único SDK por processo, com sessão HTTP keep-alive (sem novo handshake TLS
+a cada chamada), timeouts curtos, pool de conexões e circuit breaker.
+Use `obter_sdk()` em vez de criar `mercadopago.SDK(...)` a cada requisição.
+
+Configurações (settings.py):
+    MERCADOPAGO_API_URL            URL base da API (troque por um stub local em testes)
+    MERCADOPAGO_TIMEOUT_CONEXAO    timeout de conexão em segundos
+    MERCADOPAGO_TIMEOUT_LEITURA    timeout de leitura em segundos
+    MERCADOPAGO_POOL_CONEXOES      conexões mantidas abertas por host
+    MERCADOPAGO_MAX_RETENTATIVAS   retentativas para GET/PUT em 429/5xx
+    MERCADOPAGO_CIRCUITO_FALHAS    falhas seguidas que abrem o circuito
+    MERCADOPAGO_CIRCUITO_REABERTURA segundos até tentar novamente com o circuito aberto
+"""
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import mercadopago
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+import logging
+import requests
+import threading
+import time
+
+logger = logging.getLogger('mercadopago')
+
+API_URL_PADRAO = 'https://api.mercadopago.com'
+
+
+class GatewayIndisponivel(Exception):
+    """Circuito aberto: o gateway falhou repetidamente e as chamadas estão suspensas."""
+
+
+class CircuitBreaker:
+    """
+    Abre o circuito após `limite_falhas` falhas seguidas. Depois de
+    `tempo_reabertura` segundos, deixa uma chamada de teste passar (meio-aberto):
+    sucesso fecha o circuito, falha o mantém aberto por mais um período.
+    """
+
+    def __init__(self, limite_falhas=5, tempo_reabertura=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_reabertura = tempo_reabertura
+        self.falhas = 0
+        self.aberto_em = None
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.aberto_em is None:
+            return 'fechado'
+        if time.monotonic() - self.aberto_em >= self.tempo_reabertura:
+            return 'meio-aberto'
+        return 'aberto'
+
+    def permitir(self):
+        with self._lock:
+            estado = self.estado
+            if estado == 'fechado':
+                return True
+            if estado == 'meio-aberto' and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self.aberto_em is not None:
+                logger.info('Circuito do Mercado Pago fechado novamente')
+            self.falhas = 0
+            self.aberto_em = None
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            self._teste_em_andamento = False
+            if self.aberto_em is not None or self.falhas >= self.limite_falhas:
+                if self.aberto_em is None:
+                    logger.error(f'Circuito do Mercado Pago aberto após {self.falhas} falhas seguidas')
+                self.aberto_em = time.monotonic()
+
+
+class HttpClientPersistente(HttpClient):
+    """HttpClient do SDK sobre uma única `requests.Session` com pool keep-alive."""
+
+    def __init__(self, api_url=API_URL_PADRAO, timeout=(3.05, 10), pool_conexoes=10,
+                 max_retentativas=2, circuit_breaker=None):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=max_retentativas,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_conexoes, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        """Executa a chamada respeitando o circuit breaker e os timeouts configurados."""
+        if not self.circuit_breaker.permitir():
+            raise GatewayIndisponivel('Mercado Pago temporariamente indisponível (circuito aberto)')
+
+        if url.startswith(API_URL_PADRAO):
+            url = self.api_url + url[len(API_URL_PADRAO):]
+        kwargs['timeout'] = self.timeout
+
+        try:
+            api_result = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.circuit_breaker.registrar_falha()
+            raise
+
+        if api_result.status_code >= 500 or api_result.status_code == 429:
+            self.circuit_breaker.registrar_falha()
+        else:
+            self.circuit_breaker.registrar_sucesso()
+
+        try:
+            corpo = api_result.json()
+        except ValueError:
+            corpo = {}
+        return {
+            "status": api_result.status_code,
+            "response": corpo,
+        }
+
+    def fechar(self):
+        self.session.close()
+
+
+_sdk = None
+_sdk_token = None
+_sdk_lock = threading.Lock()
+
+
+def _criar_sdk(access_token):
+    timeout = (
+        float(getattr(settings, 'MERCADOPAGO_TIMEOUT_CONEXAO', 3.05)),
+        float(getattr(settings, 'MERCADOPAGO_TIMEOUT_LEITURA', 10)),
+    )
+    http_client = HttpClientPersistente(
+        api_url=getattr(settings, 'MERCADOPAGO_API_URL', '') or API_URL_PADRAO,
+        timeout=timeout,
+        pool_conexoes=int(getattr(settings, 'MERCADOPAGO_POOL_CONEXOES', 10)),
+        max_retentativas=int(getattr(settings, 'MERCADOPAGO_MAX_RETENTATIVAS', 2)),
+        circuit_breaker=CircuitBreaker(
+            limite_falhas=int(getattr(settings, 'MERCADOPAGO_CIRCUITO_FALHAS', 5)),
+            tempo_reabertura=float(getattr(settings, 'MERCADOPAGO_CIRCUITO_REABERTURA', 30)),
+        ),
+    )
+    request_options = RequestOptions(connection_timeout=timeout[1], max_retries=0)
+    return mercadopago.SDK(access_token, http_client=http_client, request_options=request_options)
+
+
+def obter_sdk():
+    """SDK do Mercado Pago compartilhado pelo processo (recriado se o token mudar)."""
+    global _sdk, _sdk_token
+    access_token = getattr(settings, 'MERCADOPAGO_ACCESS_TOKEN', '')
+    if _sdk is not None and _sdk_token == access_token:
+        return _sdk
+
+    with _sdk_lock:
+        if _sdk is None or _sdk_token != access_token:
+            if _sdk is not None:
+                _sdk.http_client.fechar()
+            _sdk = _criar_sdk(access_token)
+            _sdk_token = access_token
+    return _sdk
+
+
+def resetar_sdk():
+    """Descarta o SDK atual (ex.: após alterar settings em testes)."""
+    global _sdk, _sdk_token
+    with _sdk_lock:
+        if _sdk is not None:
+            _sdk.http_client.fechar()
+        _sdk = None
+        _sdk_token = None
@@ -0,0 +1,72 @@
+"""
+Cancelamento de pedidos abandonados
+
+Pedidos que ficaram em `pendente` (o cliente saiu da página do Mercado Pago)
+são cancelados em lotes pequenos, cada um na sua própria transação curta: no
+SQLite o banco fica bloqueado para escrita só durante um lote, e as requisições
+do site conseguem gravar entre um lote e outro. Os usos de cupom ainda
+reservados pelos pedidos são devolvidos no mesmo lote.
+
+Um pagamento aprovado depois do cancelamento ainda é aplicado normalmente
+(cancelado -> aprovado é uma transição permitida).
+
+Configurações (settings.py):
+    PEDIDO_ABANDONADO_HORAS    horas sem alteração até o pedido pendente ser cancelado
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+import logging
+import time
+
+from carrinho.cupons import liberar_usos
+from produtos.models import Pedido
+
+logger = logging.getLogger('mercadopago')
+
+
+def pedidos_abandonados(horas=None):
+    """Pedidos pendentes sem alteração há mais de `horas` horas."""
+    horas = horas if horas is not None else getattr(settings, 'PEDIDO_ABANDONADO_HORAS', 72)
+    return Pedido.objects.filter(status='pendente', atualizado_em__lt=timezone.now() - timedelta(hours=horas))
+
+
+def resumo_abandonados(horas=None):
+    """Quantidades que seriam afetadas (para --dry-run), em uma consulta."""
+    return pedidos_abandonados(horas).aggregate(
+        pedidos=Count('id'),
+        cupons=Count('id', filter=Q(cupom_status='reservado')),
+    )
+
+
+def cancelar_abandonados(horas=None, lote=500, pausa=0.1):
+    """
+    Cancela os pedidos abandonados em lotes de `lote`, com `pausa` segundos
+    entre os lotes. Retorna (pedidos cancelados, usos de cupom devolvidos).
+    """
+    abandonados = pedidos_abandonados(horas)
+    cancelados = cupons = 0
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            # Linhas bloqueadas até o fim do lote: um pedido pago ou reaproveitado
+            # ao mesmo tempo espera o cancelamento terminar e não é perdido
+            ids = list(
+                abandonados.select_for_update()
+                .filter(id__gt=ultimo_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+            cancelados += Pedido.objects.filter(id__in=ids).update(status='cancelado', atualizado_em=timezone.now())
+            cupons += liberar_usos(ids)
+        if pausa:
+            time.sleep(pausa)
+
+    if cancelados:
+        logger.info(f'🧹 {cancelados} pedido(s) abandonado(s) cancelado(s), {cupons} uso(s) de cupom devolvido(s)')
+    return cancelados, cupons
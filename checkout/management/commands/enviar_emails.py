@@ -0,0 +1,64 @@
+"""
+Comando para enviar os e-mails da caixa de saída
+O fluxo de pagamento apenas enfileira; este worker envia em lotes usando
+uma única conexão SMTP por lote, com retentativas.
+
+Uso:
+    python manage.py enviar_emails                 # esvazia a fila e termina (cron)
+    python manage.py enviar_emails --continuo      # fica rodando (always-on task)
+    python manage.py enviar_emails --lote=100
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from checkout.emails import enviar_fila
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails pendentes da caixa de saída'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=50,
+            help='Quantidade de e-mails enviados por conexão SMTP (padrão: 50)'
+        )
+        parser.add_argument(
+            '--max-tentativas',
+            type=int,
+            help='Tentativas antes de marcar o e-mail como erro (padrão: EMAIL_MAX_TENTATIVAS ou 6)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Mantém o worker rodando, verificando a fila a cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos de espera quando a fila está vazia no modo contínuo (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        max_tentativas = options['max_tentativas']
+
+        if not options['continuo']:
+            total = enviar_fila(lote, max_tentativas=max_tentativas)
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} e-mail(s) processado(s)'))
+            return
+
+        self.stdout.write(f'🔄 Worker de e-mails iniciado (lote={lote}, intervalo={options["intervalo"]}s)')
+        try:
+            while True:
+                close_old_connections()
+                total = enviar_fila(lote, max_tentativas=max_tentativas)
+                if total:
+                    self.stdout.write(f'   {total} e-mail(s) processado(s)')
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹️  Worker encerrado')
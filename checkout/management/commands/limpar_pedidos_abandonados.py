@@ -0,0 +1,60 @@
+"""
+Comando para cancelar pedidos pendentes abandonados na página do Mercado Pago
+
+Cancela em lotes curtos (sem bloquear o banco por muito tempo) e devolve os
+usos de cupom reservados. Agende uma vez por dia.
+
+Uso:
+    python manage.py limpar_pedidos_abandonados --dry-run   # apenas mostra as quantidades
+    python manage.py limpar_pedidos_abandonados             # pendentes há mais de PEDIDO_ABANDONADO_HORAS
+    python manage.py limpar_pedidos_abandonados --horas=24 --lote=200
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from checkout.limpeza import cancelar_abandonados, resumo_abandonados
+
+
+class Command(BaseCommand):
+    help = 'Cancela pedidos pendentes abandonados e devolve os cupons reservados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas',
+            type=int,
+            help='Pedidos pendentes sem alteração há mais de N horas (padrão: PEDIDO_ABANDONADO_HORAS)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Pedidos cancelados por transação (padrão: 500)'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.1,
+            help='Segundos de pausa entre os lotes (padrão: 0.1)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra quantos pedidos seriam cancelados'
+        )
+
+    def handle(self, *args, **options):
+        horas = options['horas'] if options['horas'] is not None else getattr(settings, 'PEDIDO_ABANDONADO_HORAS', 72)
+
+        if options['dry_run']:
+            resumo = resumo_abandonados(horas)
+            self.stdout.write(f'🔍 Pedidos pendentes há mais de {horas}h:')
+            self.stdout.write(f'   🗑️  A cancelar: {resumo["pedidos"]}')
+            self.stdout.write(f'   🎟️  Usos de cupom a devolver: {resumo["cupons"]}')
+            self.stdout.write(self.style.WARNING('⚠️  Dry-run: nada foi alterado'))
+            return
+
+        self.stdout.write(f'🧹 Cancelando pedidos pendentes há mais de {horas}h...')
+        cancelados, cupons = cancelar_abandonados(horas, lote=options['lote'], pausa=options['pausa'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {cancelados} pedido(s) cancelado(s), {cupons} uso(s) de cupom devolvido(s)'
+        ))
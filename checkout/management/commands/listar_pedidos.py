@@ -1,21 +1,46 @@
 """
 Comando para listar pedidos e seus status
-Útil para verificar rapidamente os pedidos criados durante os testes
+Útil para verificar rapidamente os pedidos criados durante os testes e para
+exportar pedidos para outras ferramentas (CSV / JSON lines).
+
+Os pedidos são lidos em blocos (iterator + prefetch dos itens), com a
+verificação de acessos e a contagem de itens calculadas no próprio SELECT;
+a saída é escrita à medida que os blocos chegam, com memória constante.
 
 Uso:
     python manage.py listar_pedidos
     python manage.py listar_pedidos --usuario=user@example.com
     python manage.py listar_pedidos --status=pendente
+    python manage.py listar_pedidos --ultimos=0 --formato=csv > pedidos.csv
+    python manage.py listar_pedidos --ultimos=0 --formato=jsonl | jq .total
 """
 from django.core.management.base import BaseCommand
-from produtos.models import Pedido
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from produtos.models import AcessoProduto, Pedido
 from django.contrib.auth import get_user_model
+import csv
+import json
 
 User = get_user_model()
 
+STATUS_ICONES = {
+    'pendente': '⏳',
+    'processando': '🔄',
+    'aprovado': '✅',
+    'cancelado': '❌',
+    'reembolsado': '↩️',
+}
+
+COLUNAS = [
+    'id', 'criado_em', 'status', 'nome_compra', 'email_compra', 'subtotal', 'desconto', 'total',
+    'codigo_cupom', 'metodo_pagamento', 'transaction_id', 'aprovado_em', 'total_itens',
+    'itens_sem_acesso', 'itens',
+]
+
 
 class Command(BaseCommand):
-    help = 'Lista todos os pedidos do sistema'
+    help = 'Lista os pedidos do sistema (texto, CSV ou JSON lines)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -26,7 +51,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--status',
             type=str,
-            choices=['pendente', 'processando', 'aprovado', 'cancelado'],
+            choices=list(STATUS_ICONES),
             help='Filtrar por status do pedido'
         )
         parser.add_argument(
@@ -35,123 +60,198 @@ class Command(BaseCommand):
             default=10,
             help='Número de pedidos mais recentes a mostrar (padrão: 10, use 0 para todos)'
         )
+        parser.add_argument(
+            '--formato',
+            choices=['texto', 'csv', 'jsonl'],
+            default='texto',
+            help='texto (padrão), csv ou jsonl - um pedido por linha, sem resumo'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Pedidos lidos do banco por vez (padrão: 2000)'
+        )
 
     def handle(self, *args, **options):
-        # Construir queryset com filtros
-        pedidos = Pedido.objects.all().order_by('-criado_em')
-        
+        texto = options['formato'] == 'texto'
+        pedidos = Pedido.objects.all()
+
         # Filtrar por usuário
         if options['usuario']:
             try:
                 user = User.objects.get(email=options['usuario'])
-                pedidos = pedidos.filter(usuario=user)
-                self.stdout.write(f'\n📊 Pedidos do usuário: {user.email}')
             except User.DoesNotExist:
-                self.stdout.write(self.style.ERROR(
+                self.stderr.write(self.style.ERROR(
                     f'\n❌ Usuário {options["usuario"]} não encontrado\n'
                 ))
                 return
-        else:
+            pedidos = pedidos.filter(usuario=user)
+            if texto:
+                self.stdout.write(f'\n📊 Pedidos do usuário: {user.email}')
+        elif texto:
             self.stdout.write('\n📊 Todos os pedidos')
-        
+
         # Filtrar por status
         if options['status']:
             pedidos = pedidos.filter(status=options['status'])
-            self.stdout.write(f'   Filtro: status = {options["status"]}')
-        
+            if texto:
+                self.stdout.write(f'   Filtro: status = {options["status"]}')
+
+        filtrados = pedidos
+
+        # Itens e acessos calculados no SELECT: um item está "sem acesso" se o
+        # usuário do pedido não tiver AcessoProduto para o produto do item
+        sem_acesso = ~Exists(AcessoProduto.objects.filter(
+            usuario_id=OuterRef('usuario_id'),
+            produto_id=OuterRef('itens__produto_id'),
+        ))
+        pedidos = (
+            pedidos
+            .annotate(
+                total_itens=Count('itens'),
+                itens_sem_acesso=Count('itens', filter=sem_acesso),
+            )
+            .prefetch_related('itens')
+            .order_by('-criado_em', '-id')
+        )
+
         # Limitar quantidade
         ultimos = options['ultimos']
         if ultimos > 0:
             pedidos = pedidos[:ultimos]
-            self.stdout.write(f'   Mostrando: últimos {ultimos} pedidos')
-        
+            if texto:
+                self.stdout.write(f'   Mostrando: últimos {ultimos} pedidos')
+
+        linhas = pedidos.iterator(chunk_size=options['lote'])
+
+        if options['formato'] == 'csv':
+            escritor = csv.writer(self.stdout, lineterminator='\n')
+            escritor.writerow(COLUNAS)
+            for pedido in linhas:
+                dados = self._dados(pedido)
+                dados['itens'] = '; '.join(f"{item['nome_produto']} x{item['quantidade']}" for item in dados['itens'])
+                escritor.writerow([dados[coluna] for coluna in COLUNAS])
+            return
+
+        if options['formato'] == 'jsonl':
+            for pedido in linhas:
+                self.stdout.write(json.dumps(self._dados(pedido), cls=DjangoJSONEncoder, ensure_ascii=False))
+            return
+
         self.stdout.write('\n' + '=' * 100 + '\n')
-        
-        # Verificar se há pedidos
-        if not pedidos.exists():
+
+        listados = 0
+        for pedido in linhas:
+            self._escrever_pedido(pedido)
+            listados += 1
+
+        if not listados:
             self.stdout.write(self.style.WARNING('   Nenhum pedido encontrado.\n'))
             return
-        
-        # Listar pedidos
-        for pedido in pedidos:
-            # Ícone baseado no status
-            status_icon = {
-                'pendente': '⏳',
-                'processando': '🔄',
-                'aprovado': '✅',
-                'cancelado': '❌'
-            }.get(pedido.status, '❓')
-            
-            # Cor baseada no status
-            if pedido.status == 'aprovado':
-                status_style = self.style.SUCCESS
-            elif pedido.status == 'cancelado':
-                status_style = self.style.ERROR
-            elif pedido.status == 'processando':
-                status_style = self.style.WARNING
-            else:
-                status_style = self.style.NOTICE
-            
-            # Cabeçalho do pedido
-            self.stdout.write(
-                f'{status_icon} ' + status_style(f'PEDIDO #{pedido.id}') +
-                f' - {pedido.criado_em.strftime("%d/%m/%Y %H:%M")}'
-            )
-            
-            # Informações do pedido
-            self.stdout.write(f'   👤 Cliente: {pedido.nome_compra} ({pedido.email_compra})')
-            self.stdout.write(f'   💰 Total: R$ {pedido.total:.2f}')
-            self.stdout.write(f'   📦 Status: {pedido.status.upper()}')
-            
-            if pedido.metodo_pagamento:
-                self.stdout.write(f'   💳 Pagamento: {pedido.metodo_pagamento}')
-            
-            if pedido.transaction_id:
-                self.stdout.write(f'   🔑 Transaction ID: {pedido.transaction_id}')
-            
-            if pedido.aprovado_em:
-                self.stdout.write(f'   ✅ Aprovado em: {pedido.aprovado_em.strftime("%d/%m/%Y %H:%M")}')
-            
-            # Listar itens
-            itens = pedido.itens.all()
-            if itens.exists():
-                self.stdout.write('   📋 Itens:')
-                for item in itens:
-                    self.stdout.write(
-                        f'      • {item.nome_produto} '
-                        f'(x{item.quantidade}) - R$ {item.subtotal:.2f}'
-                    )
-            
-            # Verificar acessos liberados
-            acessos = pedido.acessos.all()
-            if acessos.exists():
-                self.stdout.write(self.style.SUCCESS('   🔓 Acessos liberados:'))
-                for acesso in acessos:
-                    self.stdout.write(f'      • {acesso.produto.nome}')
-            elif pedido.status == 'aprovado':
-                self.stdout.write(self.style.WARNING('   ⚠️  Nenhum acesso liberado ainda'))
-            
-            self.stdout.write('')  # Linha em branco
-        
-        # Resumo
+
+        # Resumo: uma única agregação sobre os pedidos filtrados
+        resumo = filtrados.aggregate(
+            quantidade=Count('id'),
+            valor_aprovado=Sum('total', filter=Q(status='aprovado')),
+            **{status: Count('id', filter=Q(status=status)) for status in STATUS_ICONES},
+        )
+
         self.stdout.write('=' * 100)
         self.stdout.write(f'\n📈 Resumo:')
-        self.stdout.write(f'   Total de pedidos: {pedidos.count()}')
-        
+        self.stdout.write(f'   Pedidos listados: {listados} de {resumo["quantidade"]}')
+
         # Estatísticas por status
-        for status in ['pendente', 'processando', 'aprovado', 'cancelado']:
-            count = Pedido.objects.filter(status=status).count()
-            if count > 0:
-                icon = {'pendente': '⏳', 'processando': '🔄', 'aprovado': '✅', 'cancelado': '❌'}[status]
-                self.stdout.write(f'   {icon} {status.capitalize()}: {count}')
-        
+        for status, icon in STATUS_ICONES.items():
+            if resumo[status]:
+                self.stdout.write(f'   {icon} {status.capitalize()}: {resumo[status]}')
+
         # Valor total
-        total_aprovados = sum(p.total for p in Pedido.objects.filter(status='aprovado'))
-        if total_aprovados > 0:
-            self.stdout.write(f'\n   💵 Total aprovado: R$ {total_aprovados:.2f}')
-        
+        if resumo['valor_aprovado']:
+            self.stdout.write(f'\n   💵 Total aprovado: R$ {resumo["valor_aprovado"]:.2f}')
+
         self.stdout.write('\n💡 Dicas:')
         self.stdout.write('   • Para simular pagamento: python manage.py simular_pagamento <id>')
         self.stdout.write('   • Para filtrar por status: python manage.py listar_pedidos --status=pendente')
         self.stdout.write('   • Para ver todos: python manage.py listar_pedidos --ultimos=0')
+        self.stdout.write('   • Para exportar: python manage.py listar_pedidos --ultimos=0 --formato=csv')
         self.stdout.write('')
+
+    def _dados(self, pedido):
+        return {
+            'id': pedido.id,
+            'criado_em': pedido.criado_em,
+            'status': pedido.status,
+            'nome_compra': pedido.nome_compra,
+            'email_compra': pedido.email_compra,
+            'subtotal': pedido.subtotal,
+            'desconto': pedido.desconto,
+            'total': pedido.total,
+            'codigo_cupom': pedido.codigo_cupom,
+            'metodo_pagamento': pedido.metodo_pagamento,
+            'transaction_id': pedido.transaction_id,
+            'aprovado_em': pedido.aprovado_em,
+            'total_itens': pedido.total_itens,
+            'itens_sem_acesso': pedido.itens_sem_acesso,
+            'itens': [
+                {
+                    'produto_id': item.produto_id,
+                    'nome_produto': item.nome_produto,
+                    'quantidade': item.quantidade,
+                    'preco_unitario': item.preco_unitario,
+                    'subtotal': item.subtotal,
+                }
+                for item in pedido.itens.all()
+            ],
+        }
+
+    def _escrever_pedido(self, pedido):
+        # Cor baseada no status
+        if pedido.status == 'aprovado':
+            status_style = self.style.SUCCESS
+        elif pedido.status == 'cancelado':
+            status_style = self.style.ERROR
+        elif pedido.status == 'processando':
+            status_style = self.style.WARNING
+        else:
+            status_style = self.style.NOTICE
+
+        # Cabeçalho do pedido
+        self.stdout.write(
+            f'{STATUS_ICONES.get(pedido.status, "❓")} ' + status_style(f'PEDIDO #{pedido.id}') +
+            f' - {pedido.criado_em.strftime("%d/%m/%Y %H:%M")}'
+        )
+
+        # Informações do pedido
+        self.stdout.write(f'   👤 Cliente: {pedido.nome_compra} ({pedido.email_compra})')
+        self.stdout.write(f'   💰 Total: R$ {pedido.total:.2f}')
+        self.stdout.write(f'   📦 Status: {pedido.status.upper()}')
+
+        if pedido.metodo_pagamento:
+            self.stdout.write(f'   💳 Pagamento: {pedido.metodo_pagamento}')
+
+        if pedido.transaction_id:
+            self.stdout.write(f'   🔑 Transaction ID: {pedido.transaction_id}')
+
+        if pedido.aprovado_em:
+            self.stdout.write(f'   ✅ Aprovado em: {pedido.aprovado_em.strftime("%d/%m/%Y %H:%M")}')
+
+        # Listar itens (pré-carregados com o bloco)
+        if pedido.total_itens:
+            self.stdout.write('   📋 Itens:')
+            for item in pedido.itens.all():
+                self.stdout.write(
+                    f'      • {item.nome_produto} '
+                    f'(x{item.quantidade}) - R$ {item.subtotal:.2f}'
+                )
+
+        # Acessos liberados para os produtos do pedido
+        if pedido.status == 'aprovado':
+            if pedido.total_itens and not pedido.itens_sem_acesso:
+                self.stdout.write(self.style.SUCCESS('   🔓 Acessos liberados'))
+            elif pedido.itens_sem_acesso:
+                self.stdout.write(self.style.WARNING(
+                    f'   ⚠️  {pedido.itens_sem_acesso} item(ns) sem acesso liberado'
+                ))
+
+        self.stdout.write('')  # Linha em branco
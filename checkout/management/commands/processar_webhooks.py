@@ -0,0 +1,64 @@
+"""
+Comando para processar a fila de notificações do Mercado Pago
+O webhook apenas grava as notificações; este worker consulta os pagamentos,
+atualiza os pedidos, libera acessos e envia os e-mails.
+
+Uso:
+    python manage.py processar_webhooks                 # esvazia a fila e termina (cron)
+    python manage.py processar_webhooks --continuo      # fica rodando (always-on task)
+    python manage.py processar_webhooks --lote=100 --intervalo=2
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from checkout.webhooks import processar_fila
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de notificações do webhook do Mercado Pago'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=50,
+            help='Quantidade de notificações reservadas por lote (padrão: 50)'
+        )
+        parser.add_argument(
+            '--max-tentativas',
+            type=int,
+            help='Tentativas antes de marcar a notificação como erro (padrão: WEBHOOK_MAX_TENTATIVAS ou 8)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Mantém o worker rodando, verificando a fila a cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos de espera quando a fila está vazia no modo contínuo (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        max_tentativas = options['max_tentativas']
+
+        if not options['continuo']:
+            total = processar_fila(lote, max_tentativas=max_tentativas)
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} notificação(ões) processada(s)'))
+            return
+
+        self.stdout.write(f'🔄 Worker de webhooks iniciado (lote={lote}, intervalo={options["intervalo"]}s)')
+        try:
+            while True:
+                close_old_connections()
+                total = processar_fila(lote, max_tentativas=max_tentativas)
+                if total:
+                    self.stdout.write(f'   {total} notificação(ões) processada(s)')
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹️  Worker encerrado')
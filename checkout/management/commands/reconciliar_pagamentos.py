@@ -0,0 +1,67 @@
+"""
+Comando para reconciliar com o Mercado Pago os pedidos parados em pendente/processando
+
+Cobre notificações do webhook que se perderam: consulta os pagamentos de cada
+pedido parado e aplica o status pela mesma máquina de estados do webhook.
+
+Uso:
+    python manage.py reconciliar_pagamentos                     # pedidos parados há 30+ min, últimos 7 dias
+    python manage.py reconciliar_pagamentos --minutos=60 --dias=2
+    python manage.py reconciliar_pagamentos --threads=8 --taxa=10
+"""
+from django.core.management.base import BaseCommand
+
+from checkout.reconciliacao import reconciliar_pagamentos
+
+
+class Command(BaseCommand):
+    help = 'Consulta no Mercado Pago os pedidos pendentes/processando parados e atualiza o status'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos',
+            type=int,
+            default=30,
+            help='Pedidos sem alteração há pelo menos N minutos (padrão: 30)'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=7,
+            help='Apenas pedidos criados nos últimos N dias (padrão: 7)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=200,
+            help='Pedidos lidos do banco por vez (padrão: 200)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='Consultas simultâneas ao Mercado Pago (padrão: MERCADOPAGO_RECONCILIACAO_THREADS)'
+        )
+        parser.add_argument(
+            '--taxa',
+            type=float,
+            help='Consultas por segundo ao Mercado Pago (padrão: MERCADOPAGO_RECONCILIACAO_TAXA)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'🔄 Reconciliando pedidos parados há {options["minutos"]}+ min '
+            f'(criados nos últimos {options["dias"]} dias)...'
+        )
+        resultado = reconciliar_pagamentos(
+            minutos=options['minutos'],
+            dias=options['dias'],
+            lote=options['lote'],
+            threads=options['threads'],
+            taxa=options['taxa'],
+        )
+
+        self.stdout.write(f'   🔍 Consultados: {resultado["consultados"]}')
+        self.stdout.write(f'   📭 Sem pagamento no Mercado Pago: {resultado["sem_pagamento"]}')
+        self.stdout.write(self.style.SUCCESS(f'✅ {resultado["atualizados"]} pedido(s) atualizado(s)'))
+        if resultado['erros']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {resultado["erros"]} consulta(s) com erro (veja o log)'))
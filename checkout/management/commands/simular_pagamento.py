@@ -7,10 +7,9 @@ Uso:
     python manage.py simular_pagamento <pedido_id> --status=rejected
 """
 from django.core.management.base import BaseCommand, CommandError
-from django.test import RequestFactory
-from produtos.models import Pedido
-from checkout.views import webhook
-import json
+from produtos.models import Pedido, AcessoProduto
+from checkout.models import NotificacaoWebhook
+from checkout.webhooks import registrar_notificacao, processar_fila
 
 
 class Command(BaseCommand):
@@ -50,9 +49,6 @@ class Command(BaseCommand):
         if valor is None:
             valor = float(pedido.total)
         
-        # Criar requisição fake simulando o webhook do Mercado Pago
-        factory = RequestFactory()
-        
         # Dados do webhook simulado
         webhook_data = {
             'type': 'payment',
@@ -64,14 +60,6 @@ class Command(BaseCommand):
             'transaction_amount': valor
         }
         
-        # Criar requisição POST
-        request = factory.post(
-            '/webhook/mercadopago/',
-            data=json.dumps(webhook_data),
-            content_type='application/json',
-            HTTP_USER_AGENT='MercadoPagoSimulator/1.0 (Development)'
-        )
-        
         # Processar webhook
         self.stdout.write(self.style.WARNING(
             f'\n🔄 Simulando webhook do Mercado Pago...\n'
@@ -81,14 +69,18 @@ class Command(BaseCommand):
         self.stdout.write(f'   Valor: R$ {valor:.2f}')
         self.stdout.write(f'   Status atual do pedido: {pedido.status}\n')
         
-        # Executar webhook
-        response = webhook(request)
+        # Enfileirar como o webhook faria e processar a fila em seguida
+        registrar_notificacao(webhook_data)
+        processar_fila()
         
         # Recarregar pedido para ver mudanças
         pedido.refresh_from_db()
+        notificacao = NotificacaoWebhook.objects.filter(
+            payment_id=webhook_data['data']['id']
+        ).order_by('-id').first()
         
         # Resultado
-        if response.status_code == 200:
+        if notificacao and notificacao.status == 'processado':
             self.stdout.write(self.style.SUCCESS(
                 f'\n✅ Webhook processado com sucesso!\n'
             ))
@@ -101,7 +93,10 @@ class Command(BaseCommand):
                 self.stdout.write(f'   Data de aprovação: {pedido.aprovado_em}')
                 
                 # Listar produtos com acesso liberado
-                acessos = pedido.acessos.all()
+                acessos = AcessoProduto.objects.filter(
+                    usuario=pedido.usuario,
+                    produto__in=pedido.itens.values('produto')
+                ).select_related('produto')
                 if acessos:
                     self.stdout.write('\n   Produtos liberados:')
                     for acesso in acessos:
@@ -120,8 +115,9 @@ class Command(BaseCommand):
             self.stdout.write('\n')
             
         else:
+            erro = notificacao.ultimo_erro if notificacao else 'notificação não registrada'
             self.stdout.write(self.style.ERROR(
-                f'\n❌ Erro ao processar webhook! Status: {response.status_code}\n'
+                f'\n❌ Erro ao processar webhook! {erro}\n'
             ))
         
         # Dicas úteis
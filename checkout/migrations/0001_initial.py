@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('payment_id', models.CharField(db_index=True, max_length=100)),
+                ('payload', models.JSONField(default=dict, help_text='Corpo original da notificação')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('processado', 'Processado'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Quando pendente: próxima tentativa. Quando processando: fim da reserva do worker.')),
+                ('lote', models.CharField(blank=True, help_text='Identificador do worker que reservou a notificação', max_length=32)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Notificação do Webhook',
+                'verbose_name_plural': 'Notificações do Webhook',
+                'ordering': ['-recebido_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='checkout_notif_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0001_initial'),
+        ('produtos', '0005_pedido_codigo_cupom_pedido_cupom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagamentoEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provedor', models.CharField(default='mercadopago', max_length=30)),
+                ('payment_id', models.CharField(max_length=100)),
+                ('status', models.CharField(help_text='Status do pagamento no provedor (approved, rejected...)', max_length=30)),
+                ('origem', models.CharField(choices=[('webhook', 'Webhook'), ('retorno', 'Página de retorno')], max_length=20)),
+                ('status_pedido_anterior', models.CharField(blank=True, max_length=20)),
+                ('status_pedido', models.CharField(blank=True, help_text='Status do pedido após o evento', max_length=20)),
+                ('valor', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('dados', models.JSONField(blank=True, default=dict)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_pagamento', to='produtos.pedido')),
+            ],
+            options={
+                'verbose_name': 'Evento de Pagamento',
+                'verbose_name_plural': 'Eventos de Pagamento',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pagamentoevento',
+            constraint=models.UniqueConstraint(fields=('provedor', 'payment_id', 'status'), name='checkout_pagamento_evento_unico'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0002_pagamentoevento'),
+        ('produtos', '0005_pedido_codigo_cupom_pedido_cupom'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSaida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('assunto', models.CharField(max_length=255)),
+                ('corpo_texto', models.TextField()),
+                ('corpo_html', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Enviando'), ('enviado', 'Enviado'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Quando pendente: próxima tentativa. Quando enviando: fim da reserva do worker.')),
+                ('lote', models.CharField(blank=True, help_text='Identificador do worker que reservou o e-mail', max_length=32)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='produtos.pedido')),
+            ],
+            options={
+                'verbose_name': 'E-mail (caixa de saída)',
+                'verbose_name_plural': 'E-mails (caixa de saída)',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='checkout_email_fila_idx')],
+            },
+        ),
+    ]
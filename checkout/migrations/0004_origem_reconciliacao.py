@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0003_emailsaida'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagamentoevento',
+            name='origem',
+            field=models.CharField(choices=[('webhook', 'Webhook'), ('retorno', 'Página de retorno'), ('reconciliacao', 'Reconciliação')], max_length=20),
+        ),
+    ]
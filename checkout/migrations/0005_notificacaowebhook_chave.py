@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0004_origem_reconciliacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacaowebhook',
+            name='chave',
+            field=models.CharField(blank=True, help_text='Identidade da notificação no MP (id, ou action:data.id:date_created): reenvios não entram de novo', max_length=200, null=True, unique=True),
+        ),
+    ]
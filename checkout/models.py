@@ -1,3 +1,139 @@
+"""
+Models da app Checkout
+Pedido, ItemPedido e AcessoProduto continuam em produtos.models;
+aqui ficam apenas as estruturas de processamento de pagamento.
+"""
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class NotificacaoWebhook(models.Model):
+    """Caixa de entrada das notificações recebidas do Mercado Pago"""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('processado', 'Processado'),
+        ('erro', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    payment_id = models.CharField(max_length=100, db_index=True)
+    chave = models.CharField(
+        max_length=200, null=True, blank=True, unique=True,
+        help_text="Identidade da notificação no MP (id, ou action:data.id:date_created): reenvios não entram de novo"
+    )
+    payload = models.JSONField(default=dict, help_text="Corpo original da notificação")
+
+    # Controle de processamento
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(
+        default=timezone.now,
+        help_text="Quando pendente: próxima tentativa. Quando processando: fim da reserva do worker."
+    )
+    lote = models.CharField(max_length=32, blank=True, help_text="Identificador do worker que reservou a notificação")
+    ultimo_erro = models.TextField(blank=True)
+
+    # Metadados
+    recebido_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notificação do Webhook"
+        verbose_name_plural = "Notificações do Webhook"
+        ordering = ['-recebido_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='checkout_notif_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.payment_id} ({self.get_status_display()})"
+
+
+class PagamentoEvento(models.Model):
+    """
+    Ledger dos status de pagamento já aplicados aos pedidos.
+    A chave única (provedor, payment_id, status) garante que cada transição
+    seja processada uma única vez, venha ela do webhook ou das páginas de retorno.
+    """
+    ORIGEM_CHOICES = [
+        ('webhook', 'Webhook'),
+        ('retorno', 'Página de retorno'),
+        ('reconciliacao', 'Reconciliação'),
+    ]
+
+    provedor = models.CharField(max_length=30, default='mercadopago')
+    payment_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=30, help_text="Status do pagamento no provedor (approved, rejected...)")
+    pedido = models.ForeignKey(
+        'produtos.Pedido',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='eventos_pagamento'
+    )
+    origem = models.CharField(max_length=20, choices=ORIGEM_CHOICES)
+    status_pedido_anterior = models.CharField(max_length=20, blank=True)
+    status_pedido = models.CharField(max_length=20, blank=True, help_text="Status do pedido após o evento")
+    valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    dados = models.JSONField(default=dict, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento de Pagamento"
+        verbose_name_plural = "Eventos de Pagamento"
+        ordering = ['-criado_em']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provedor', 'payment_id', 'status'],
+                name='checkout_pagamento_evento_unico'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.provedor} {self.payment_id}: {self.status}"
+
+
+class EmailSaida(models.Model):
+    """Caixa de saída de e-mails transacionais (enviados pelo worker `enviar_emails`)"""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('erro', 'Erro'),
+    ]
+
+    destinatario = models.EmailField()
+    assunto = models.CharField(max_length=255)
+    corpo_texto = models.TextField()
+    corpo_html = models.TextField(blank=True)
+    pedido = models.ForeignKey(
+        'produtos.Pedido',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        related_name='emails'
+    )
+
+    # Controle de envio
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(
+        default=timezone.now,
+        help_text="Quando pendente: próxima tentativa. Quando enviando: fim da reserva do worker."
+    )
+    lote = models.CharField(max_length=32, blank=True, help_text="Identificador do worker que reservou o e-mail")
+    ultimo_erro = models.TextField(blank=True)
+
+    # Metadados
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "E-mail (caixa de saída)"
+        verbose_name_plural = "E-mails (caixa de saída)"
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='checkout_email_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.assunto} -> {self.destinatario} ({self.get_status_display()})"
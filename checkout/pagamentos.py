@@ -0,0 +1,234 @@
+"""
+Processamento de pagamentos do Mercado Pago
+Usado pelo worker da fila de webhooks e pelas páginas de retorno.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from decimal import Decimal
+import logging
+
+from carrinho.cupons import confirmar_uso, liberar_uso
+from produtos.acessos import revogar_acessos
+from produtos.models import Pedido
+from produtos.vendas import estornar_vendas, registrar_vendas
+from .emails import enfileirar_email_confirmacao
+from .gateway import obter_sdk
+from .models import PagamentoEvento
+
+logger = logging.getLogger('mercadopago')
+security_logger = logging.getLogger('security')
+
+PROVEDOR_MP = 'mercadopago'
+
+# Status do pagamento no Mercado Pago -> status do Pedido
+STATUS_PEDIDO = {
+    'approved': 'aprovado',
+    'authorized': 'processando',
+    'in_process': 'processando',
+    'in_mediation': 'processando',
+    'pending': 'processando',
+    'rejected': 'cancelado',
+    'cancelled': 'cancelado',
+    'refunded': 'reembolsado',
+    'charged_back': 'reembolsado',
+}
+
+# Transições permitidas do Pedido (status atual -> próximos possíveis)
+TRANSICOES = {
+    'pendente': {'processando', 'aprovado', 'cancelado'},
+    'processando': {'aprovado', 'cancelado'},
+    'cancelado': {'aprovado'},  # nova tentativa de pagamento aprovada
+    'aprovado': {'reembolsado'},
+    'reembolsado': set(),
+}
+
+# Status do MP após os quais nenhum outro pode ocorrer para o mesmo pagamento
+STATUS_FINAIS_MP = {'rejected', 'cancelled', 'refunded', 'charged_back'}
+
+
+def _pagamento_fake(dados):
+    """Monta um pagamento a partir da própria notificação (apenas em desenvolvimento)."""
+    return {
+        'external_reference': dados.get('external_reference') or dados.get('data', {}).get('external_reference'),
+        'status': dados.get('status', 'approved'),
+        'transaction_amount': dados.get('transaction_amount', 0),
+        'payment_method_id': 'test'
+    }
+
+
+def consultar_pagamento(payment_id, dados):
+    """
+    Busca o pagamento na API do Mercado Pago.
+    Em desenvolvimento, se a API falhar, usa os dados da própria notificação.
+    Em produção, a falha é propagada para que a notificação seja reprocessada.
+    """
+    sdk = obter_sdk()
+
+    try:
+        payment_info = sdk.payment().get(payment_id)
+    except Exception as e:
+        logger.error(f'Erro ao buscar pagamento {payment_id}: {str(e)}')
+        if not settings.DEBUG:
+            raise
+        logger.warning('🔓 MODO DEV: Continuando mesmo com erro na API')
+        return _pagamento_fake(dados)
+
+    if payment_info['status'] != 200:
+        logger.error(f'Pagamento {payment_id} não encontrado no MP')
+        if not settings.DEBUG:
+            raise RuntimeError(f'Mercado Pago respondeu {payment_info["status"]} para o pagamento {payment_id}')
+        logger.warning('🔓 MODO DEV: Continuando mesmo sem encontrar pagamento')
+        return _pagamento_fake(dados)
+
+    return payment_info['response']
+
+
+def notificacao_duplicada(payment_id, status=None, acao=None, provedor=PROVEDOR_MP):
+    """
+    Verifica no ledger se a notificação já foi aplicada (uma consulta no índice único).
+
+    Com `status` conhecido (páginas de retorno), basta o evento existir.
+    Sem status (webhook), a notificação é duplicada se o pagamento já atingiu um
+    status final, se é um `payment.created` de um pagamento já registrado (a
+    criação não traz status novo) ou se o pagamento já foi aprovado e a
+    notificação não é uma atualização. Apenas `payment.updated` pode trazer
+    aprovação ou estorno de um pagamento conhecido, e só ele consulta o MP.
+    Reenvios da mesma notificação nem chegam aqui: param na chave única da fila
+    (webhooks.registrar_notificacao).
+    """
+    registrados = set(
+        PagamentoEvento.objects
+        .filter(provedor=provedor, payment_id=str(payment_id))
+        .values_list('status', flat=True)
+    )
+    if not registrados:
+        return False
+    if status:
+        return status in registrados
+    if registrados & STATUS_FINAIS_MP:
+        return True
+    if acao == 'payment.updated':
+        return False
+    return acao == 'payment.created' or 'approved' in registrados
+
+
+def aplicar_status_pagamento(pedido, payment_id, status_mp, origem, metodo_pagamento='',
+                             valor=None, dados=None, provedor=PROVEDOR_MP):
+    """
+    Máquina de estados única do pagamento.
+
+    Registra o evento (provedor, payment_id, status) no ledger e, se ele for novo,
+    bloqueia o pedido e aplica a transição permitida. Eventos duplicados param no
+    INSERT: sem bloqueio de linha, sem liberação de acesso e sem e-mail.
+    Retorna True se o evento era inédito.
+    """
+    novo_status = STATUS_PEDIDO.get(status_mp)
+    if novo_status is None:
+        logger.warning(f'Status desconhecido: {status_mp} para pedido #{pedido.id}')
+        return False
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                evento = PagamentoEvento.objects.create(
+                    provedor=provedor,
+                    payment_id=str(payment_id),
+                    status=status_mp,
+                    pedido=pedido,
+                    origem=origem,
+                    valor=valor,
+                    dados=dados or {},
+                )
+        except IntegrityError:
+            logger.info(f'Evento {status_mp} do pagamento {payment_id} já processado - ignorado')
+            return False
+
+        bloqueado = Pedido.objects.select_for_update().get(pk=pedido.pk)
+        anterior = bloqueado.status
+        evento.status_pedido_anterior = anterior
+
+        if novo_status not in TRANSICOES.get(anterior, set()):
+            evento.status_pedido = anterior
+            evento.save(update_fields=['status_pedido_anterior', 'status_pedido'])
+            if novo_status != anterior:
+                logger.warning(
+                    f'Transição {anterior} -> {novo_status} ignorada para pedido #{pedido.id} '
+                    f'(pagamento {payment_id}: {status_mp})'
+                )
+            return True
+
+        bloqueado.status = novo_status
+        if novo_status == 'aprovado':
+            bloqueado.aprovado_em = timezone.now()
+            bloqueado.transaction_id = str(payment_id)
+            if metodo_pagamento:
+                bloqueado.metodo_pagamento = metodo_pagamento
+        bloqueado.save()
+
+        evento.status_pedido = novo_status
+        evento.save(update_fields=['status_pedido_anterior', 'status_pedido'])
+
+        if novo_status == 'aprovado':
+            # Libera acesso aos produtos, confirma o cupom e enfileira o e-mail na mesma transação
+            bloqueado.liberar_acesso_produtos()
+            confirmar_uso(bloqueado)
+            registrar_vendas([bloqueado.pk])
+            enfileirar_email_confirmacao(bloqueado)
+            logger.info(f'✅ Pedido #{pedido.id} APROVADO - Pagamento {payment_id} - R$ {valor}')
+            security_logger.info(f'Acesso liberado para pedido #{pedido.id} - Usuário: {bloqueado.usuario.email}')
+        elif novo_status == 'processando':
+            logger.info(f'⏳ Pedido #{pedido.id} EM PROCESSAMENTO')
+        elif novo_status == 'cancelado':
+            liberar_uso(bloqueado)
+            logger.info(f'❌ Pedido #{pedido.id} CANCELADO/REJEITADO')
+        else:
+            # Reembolso/chargeback: o comprador perde o acesso e a venda sai dos totais
+            revogar_acessos([bloqueado.pk])
+            estornar_vendas([bloqueado.pk])
+            logger.info(f'↩️ Pedido #{pedido.id} REEMBOLSADO')
+
+    pedido.refresh_from_db()
+    return True
+
+
+def _resumo_pagamento(payment):
+    """Campos do pagamento guardados no ledger."""
+    campos = ('status', 'status_detail', 'transaction_amount', 'payment_method_id', 'external_reference')
+    return {campo: payment.get(campo) for campo in campos if payment.get(campo) is not None}
+
+
+def processar_notificacao_pagamento(payment_id, dados):
+    """
+    Consulta o pagamento no Mercado Pago e atualiza o pedido correspondente.
+    `dados` é o corpo original da notificação recebida pelo webhook.
+    """
+    if notificacao_duplicada(payment_id, acao=dados.get('action')):
+        logger.info(f'Notificação do pagamento {payment_id} já aplicada - sem consulta ao MP')
+        return
+
+    payment = consultar_pagamento(payment_id, dados)
+
+    # VALIDAÇÕES DE SEGURANÇA DO PAGAMENTO
+    pedido_id = payment.get('external_reference')
+    valor_pago = Decimal(str(payment.get('transaction_amount', 0)))
+
+    if not pedido_id:
+        logger.warning(f'Pagamento {payment_id} sem external_reference')
+        return
+
+    try:
+        pedido = Pedido.objects.get(id=pedido_id)
+    except (Pedido.DoesNotExist, ValueError):
+        logger.error(f'Tentativa de atualizar pedido inexistente: {pedido_id}')
+        return
+
+    aplicar_status_pagamento(
+        pedido,
+        payment_id,
+        payment.get('status'),
+        origem='webhook',
+        metodo_pagamento=f"Mercado Pago - {payment.get('payment_method_id', 'N/A')}",
+        valor=valor_pago,
+        dados=_resumo_pagamento(payment),
+    )
@@ -0,0 +1,144 @@
+"""
+Materialização do pedido a partir do carrinho
+
+Uma única passada pelo carrinho: os produtos são carregados de uma vez, os
+totais, os itens do pedido e o payload `items` do Mercado Pago são montados
+juntos e os itens são gravados com `bulk_create`. O número de queries não
+depende do tamanho do carrinho.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from django.db import transaction
+import logging
+
+from carrinho.cupons import liberar_uso, reservar_uso
+from produtos.models import Produto, Pedido, ItemPedido
+
+security_logger = logging.getLogger('security')
+
+
+class PedidoInvalido(Exception):
+    """O carrinho não pode ser convertido em pedido (ex.: produto removido)."""
+
+
+class CupomEsgotado(PedidoInvalido):
+    """Não foi possível reservar um uso do cupom do carrinho."""
+
+
+@dataclass
+class PedidoMaterializado:
+    pedido: Pedido
+    items_mp: list
+    cupom: object = None
+
+
+def materializar_pedido(usuario, carrinho):
+    """
+    Cria (ou reaproveita o pedido pendente do usuário) com os itens do
+    carrinho, em uma transação, reservando o uso do cupom. Levanta
+    PedidoInvalido se algum produto do carrinho não existir mais e
+    CupomEsgotado se o cupom não tiver mais usos disponíveis.
+    """
+    linhas = carrinho.linhas()
+    produtos = Produto.objects.in_bulk([produto_id for produto_id, _, _ in linhas])
+
+    ausentes = [produto_id for produto_id, _, _ in linhas if produto_id not in produtos]
+    if ausentes:
+        security_logger.warning(f'Carrinho de {usuario.email} com produtos inexistentes: {ausentes}')
+        raise PedidoInvalido('Alguns produtos do carrinho não estão mais disponíveis.')
+
+    itens = []
+    items_mp = []
+    subtotal = Decimal('0.00')
+    for produto_id, quantidade, preco in linhas:
+        produto = produtos[produto_id]
+        total_item = preco * quantidade
+        subtotal += total_item
+
+        itens.append(ItemPedido(
+            produto=produto,
+            nome_produto=produto.nome,
+            preco_unitario=preco,
+            quantidade=quantidade,
+            subtotal=total_item,
+        ))
+        items_mp.append({
+            "title": produto.nome[:120],
+            "quantity": quantidade,
+            "unit_price": float(preco),
+            "currency_id": "BRL",
+        })
+
+    # A validade e o limite de usos do cupom são garantidos pela reserva, abaixo
+    cupom = carrinho.cupom  # pode ser None
+    desconto = Decimal('0.00')
+    codigo_cupom = ''
+    if cupom and subtotal >= cupom.valor_minimo_pedido:
+        desconto = cupom.calcular_desconto(subtotal)
+        codigo_cupom = cupom.codigo
+    else:
+        cupom = None
+
+    # Aplica desconto do cupom no payload do Mercado Pago (item com valor negativo)
+    if desconto > Decimal('0.00'):
+        nome_cupom = f'Cupom {codigo_cupom}' if codigo_cupom else 'Desconto'
+        items_mp.append({
+            "title": nome_cupom[:120],
+            "quantity": 1,
+            "unit_price": -float(desconto),
+            "currency_id": "BRL",
+        })
+
+    dados = {
+        'subtotal': subtotal,
+        'desconto': desconto,
+        'total': subtotal - desconto,
+        'email_compra': usuario.email,
+        'nome_compra': usuario.get_full_name() or usuario.email,
+        'metodo_pagamento': 'Mercado Pago',
+        'cupom': cupom,
+        'codigo_cupom': codigo_cupom,
+    }
+
+    with transaction.atomic():
+        # Reaproveita o pedido pendente/processando do usuário
+        pedido = (
+            Pedido.objects.select_for_update()
+            .filter(usuario=usuario, status__in=['pendente', 'processando'])
+            .order_by('-criado_em')
+            .first()
+        )
+        if pedido:
+            ItemPedido.objects.filter(pedido=pedido).delete()
+        else:
+            pedido = Pedido(usuario=usuario, status='pendente')
+
+        # Reserva o uso do cupom (o pedido reaproveitado mantém a reserva do mesmo cupom)
+        mesmo_cupom = (
+            pedido.cupom_status == 'reservado' and cupom is not None
+            and pedido.cupom_id == cupom.pk and cupom.esta_ativo
+        )
+        if pedido.cupom_status == 'reservado' and not mesmo_cupom:
+            liberar_uso(pedido)
+            pedido.cupom_status = ''
+        if cupom is not None and not mesmo_cupom:
+            if not reservar_uso(cupom):
+                raise CupomEsgotado(f'O cupom {cupom.codigo} atingiu o limite de usos ou não é mais válido.')
+            pedido.cupom_status = 'reservado'
+
+        for campo, valor in dados.items():
+            setattr(pedido, campo, valor)
+        pedido.save()
+
+        for item in itens:
+            item.pedido = pedido
+        ItemPedido.objects.bulk_create(itens)
+
+    return PedidoMaterializado(pedido=pedido, items_mp=items_mp, cupom=cupom)
+
+
+def descartar_pedido(pedido):
+    """Remove o pedido que não chegou ao pagamento, devolvendo o uso reservado do cupom."""
+    with transaction.atomic():
+        liberar_uso(pedido)
+        pedido.delete()
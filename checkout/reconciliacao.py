@@ -0,0 +1,167 @@
+"""
+Reconciliação de pagamentos de pedidos parados
+
+Se a notificação do webhook se perder, o pedido fica em pendente/processando
+até o cliente voltar à página de retorno. A reconciliação percorre os pedidos
+parados em lotes (paginação por id, sem OFFSET), consulta os pagamentos de
+cada um no Mercado Pago (GET /v1/payments/search por external_reference) em
+algumas threads, limitadas por um balde de tokens, e aplica o status com a
+mesma máquina de estados do webhook (`aplicar_status_pagamento`).
+
+As threads fazem apenas HTTP; todo acesso ao banco fica na thread principal.
+Para testar contra um stub local da API, aponte MERCADOPAGO_API_URL para ele.
+
+Configurações (settings.py):
+    MERCADOPAGO_RECONCILIACAO_THREADS   consultas simultâneas ao Mercado Pago
+    MERCADOPAGO_RECONCILIACAO_TAXA      consultas por segundo (média)
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+import logging
+import threading
+import time
+
+from produtos.models import Pedido
+from .gateway import GatewayIndisponivel, obter_sdk
+from .pagamentos import _resumo_pagamento, aplicar_status_pagamento, notificacao_duplicada
+
+logger = logging.getLogger('mercadopago')
+
+STATUS_PARADOS = ['pendente', 'processando']
+
+
+class BaldeTokens:
+    """
+    Limita a taxa de chamadas entre threads: `taxa` tokens por segundo, com
+    rajadas de até `capacidade`. `aguardar()` bloqueia até haver um token.
+    """
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade or max(1, taxa))
+        self.tokens = self.capacidade
+        self.atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+                self.atualizado_em = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+
+def pedidos_parados(minutos=30, dias=7, lote=200):
+    """
+    Gera listas de ids de pedidos em pendente/processando sem alteração há mais
+    de `minutos` (e criados nos últimos `dias`), em lotes ordenados por id.
+    """
+    agora = timezone.now()
+    parados = Pedido.objects.filter(
+        status__in=STATUS_PARADOS,
+        atualizado_em__lt=agora - timedelta(minutes=minutos),
+        criado_em__gte=agora - timedelta(days=dias),
+    )
+    ultimo_id = 0
+    while True:
+        ids = list(parados.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:lote])
+        if not ids:
+            return
+        yield ids
+        ultimo_id = ids[-1]
+
+
+def buscar_pagamentos(pedido_id, balde=None):
+    """Pagamentos do pedido no Mercado Pago (busca por external_reference)."""
+    if balde is not None:
+        balde.aguardar()
+    resposta = obter_sdk().payment().search({
+        'external_reference': str(pedido_id),
+        'sort': 'date_created',
+        'criteria': 'desc',
+    })
+    if resposta['status'] != 200:
+        raise RuntimeError(f'Mercado Pago respondeu {resposta["status"]} na busca do pedido #{pedido_id}')
+    return resposta['response'].get('results') or []
+
+
+def escolher_pagamento(pagamentos):
+    """Pagamento que define o status do pedido: um aprovado, se houver; senão o mais recente."""
+    for payment in pagamentos:
+        if payment.get('status') == 'approved':
+            return payment
+    return pagamentos[0] if pagamentos else None
+
+
+def _aplicar(pedido_id, pagamentos):
+    """Aplica o pagamento escolhido ao pedido. Retorna True se o pedido foi atualizado."""
+    payment = escolher_pagamento(pagamentos)
+    if payment is None or not payment.get('id') or not payment.get('status'):
+        return False
+    if str(payment.get('external_reference')) != str(pedido_id):
+        logger.warning(f'Busca do pedido #{pedido_id} retornou pagamento {payment.get("id")} de outro pedido')
+        return False
+    if notificacao_duplicada(payment['id'], status=payment['status']):
+        return False
+
+    pedido = Pedido.objects.filter(id=pedido_id, status__in=STATUS_PARADOS).first()
+    if pedido is None:
+        # Atualizado por webhook/retorno enquanto a busca estava em andamento
+        return False
+
+    anterior = pedido.status
+    aplicar_status_pagamento(
+        pedido,
+        payment['id'],
+        payment['status'],
+        origem='reconciliacao',
+        metodo_pagamento=f"Mercado Pago - {payment.get('payment_method_id', 'N/A')}",
+        valor=Decimal(str(payment.get('transaction_amount', 0))),
+        dados=_resumo_pagamento(payment),
+    )
+    return pedido.status != anterior
+
+
+def reconciliar_pagamentos(minutos=30, dias=7, lote=200, threads=None, taxa=None):
+    """
+    Reconcilia os pedidos parados com o Mercado Pago.
+    Retorna um dict com as quantidades consultados/atualizados/sem_pagamento/erros.
+    """
+    threads = threads or int(getattr(settings, 'MERCADOPAGO_RECONCILIACAO_THREADS', 4))
+    balde = BaldeTokens(taxa or float(getattr(settings, 'MERCADOPAGO_RECONCILIACAO_TAXA', 5)))
+    resultado = {'consultados': 0, 'atualizados': 0, 'sem_pagamento': 0, 'erros': 0}
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='reconciliacao') as executor:
+        for ids in pedidos_parados(minutos, dias, lote):
+            buscas = {executor.submit(buscar_pagamentos, pedido_id, balde): pedido_id for pedido_id in ids}
+            gateway_fora = False
+            for busca in as_completed(buscas):
+                pedido_id = buscas[busca]
+                resultado['consultados'] += 1
+                try:
+                    pagamentos = busca.result()
+                    if not pagamentos:
+                        resultado['sem_pagamento'] += 1
+                    elif _aplicar(pedido_id, pagamentos):
+                        resultado['atualizados'] += 1
+                except GatewayIndisponivel:
+                    resultado['erros'] += 1
+                    gateway_fora = True
+                except Exception as e:
+                    resultado['erros'] += 1
+                    logger.error(f'Erro ao reconciliar pedido #{pedido_id}: {str(e)}')
+
+            if gateway_fora:
+                # Circuito aberto: os próximos lotes falhariam da mesma forma
+                logger.error('Reconciliação interrompida: Mercado Pago indisponível (circuito aberto)')
+                break
+
+    return resultado
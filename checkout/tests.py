@@ -1,3 +1,657 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+import json
+import requests
+import threading
+import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from carrinho.carrinho import Carrinho
+from carrinho.cupons import reservar_uso
+from carrinho.models import Cupom
+from personal.tests import ChangelistMixin
+from produtos.models import AcessoProduto, Categoria, ItemPedido, Pedido, Produto
+from .emails import enviar_lote
+from .gateway import CircuitBreaker, GatewayIndisponivel, obter_sdk, resetar_sdk
+from .models import EmailSaida, NotificacaoWebhook, PagamentoEvento
+from .limpeza import cancelar_abandonados, resumo_abandonados
+from .pedidos import materializar_pedido
+from .pagamentos import aplicar_status_pagamento, notificacao_duplicada, processar_notificacao_pagamento
+from .reconciliacao import BaldeTokens, pedidos_parados, reconciliar_pagamentos
+from .webhooks import processar_lote, registrar_notificacao
+
+User = get_user_model()
+
+
+def criar_pedido(usuario=None, total='10.00'):
+    usuario = usuario or User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+    categoria = Categoria.objects.get_or_create(nome='Ebooks', slug='ebooks')[0]
+    produto = Produto.objects.get_or_create(
+        slug='ebook', defaults={'nome': 'Ebook', 'categoria': categoria, 'preco': Decimal(total)}
+    )[0]
+    pedido = Pedido.objects.create(
+        usuario=usuario, nome_compra='Aluno', email_compra=usuario.email,
+        subtotal=Decimal(total), desconto=Decimal('0.00'), total=Decimal(total),
+    )
+    ItemPedido.objects.create(
+        pedido=pedido, produto=produto, nome_produto=produto.nome,
+        preco_unitario=Decimal(total), quantidade=1, subtotal=Decimal(total),
+    )
+    return pedido
+
+
+def resposta_mp(pedido, status, payment_id=555):
+    return {
+        'status': 200,
+        'response': {
+            'id': payment_id,
+            'status': status,
+            'external_reference': str(pedido.id),
+            'transaction_amount': float(pedido.total),
+            'payment_method_id': 'pix',
+        },
+    }
+
+
+def notificacao(payment_id='123', action='payment.created', notificacao_id=1, data='2025-01-01T10:00:00Z'):
+    return {
+        'id': notificacao_id,
+        'type': 'payment',
+        'action': action,
+        'date_created': data,
+        'data': {'id': payment_id},
+    }
+
+
+class FilaWebhookTestCase(TestCase):
+    """Fila de notificações: reenvios param no INSERT, notificações distintas são consolidadas."""
+
+    def test_reenvio_da_mesma_notificacao_nao_entra_de_novo(self):
+        self.assertIsNotNone(registrar_notificacao(notificacao()))
+        self.assertIsNone(registrar_notificacao(notificacao()))
+        self.assertEqual(NotificacaoWebhook.objects.count(), 1)
+
+    def test_sem_id_usa_action_pagamento_e_data(self):
+        sem_id = notificacao()
+        del sem_id['id']
+        registrar_notificacao(sem_id)
+        registrar_notificacao(dict(sem_id, action='payment.updated'))
+        self.assertIsNone(registrar_notificacao(sem_id))
+        self.assertEqual(NotificacaoWebhook.objects.count(), 2)
+
+    def test_atualizacao_apos_criacao_pendente_nao_e_perdida(self):
+        registrar_notificacao(notificacao(action='payment.created', notificacao_id=1))
+        registrar_notificacao(notificacao(action='payment.updated', notificacao_id=2))
+        registrar_notificacao(notificacao(action='payment.created', notificacao_id=3))
+        self.assertEqual(NotificacaoWebhook.objects.filter(status='pendente').count(), 3)
+
+        with mock.patch('checkout.webhooks.processar_notificacao_pagamento') as processar:
+            self.assertEqual(processar_lote(), 3)
+
+        processar.assert_called_once()
+        payment_id, dados = processar.call_args.args
+        self.assertEqual(payment_id, '123')
+        self.assertEqual(dados['action'], 'payment.updated')
+        self.assertEqual(NotificacaoWebhook.objects.filter(status='processado').count(), 3)
+
+    def test_reenvio_de_notificacao_com_erro_volta_para_a_fila(self):
+        registrar_notificacao(notificacao())
+        NotificacaoWebhook.objects.update(status='erro', tentativas=8)
+        self.assertIsNone(registrar_notificacao(notificacao()))
+        fila = NotificacaoWebhook.objects.get()
+        self.assertEqual((fila.status, fila.tentativas), ('pendente', 0))
+
+    def test_falha_mantem_notificacoes_para_nova_tentativa(self):
+        registrar_notificacao(notificacao())
+        with mock.patch('checkout.webhooks.processar_notificacao_pagamento', side_effect=RuntimeError('MP fora')):
+            processar_lote()
+        fila = NotificacaoWebhook.objects.get()
+        self.assertEqual((fila.status, fila.tentativas, fila.ultimo_erro), ('pendente', 1, 'MP fora'))
+
+
+class PagamentoEventoTestCase(TestCase):
+    """Ledger de eventos de pagamento: duplicados e fora de ordem."""
+
+    def setUp(self):
+        cache.clear()
+        self.pedido = criar_pedido()
+
+    def aplicar(self, status, payment_id=555, origem='webhook'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return aplicar_status_pagamento(self.pedido, payment_id, status, origem=origem, valor=self.pedido.total)
+
+    def test_evento_duplicado_nao_reaplica_transicao(self):
+        self.assertTrue(self.aplicar('approved'))
+        self.assertFalse(self.aplicar('approved', origem='retorno'))
+
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'aprovado')
+        self.assertEqual(PagamentoEvento.objects.count(), 1)
+        self.assertEqual(EmailSaida.objects.count(), 1)
+        self.assertEqual(AcessoProduto.objects.count(), 1)
+        self.assertEqual(Produto.objects.get().total_vendas, 1)
+
+    def test_pendente_depois_de_aprovado_e_ignorado(self):
+        self.aplicar('approved')
+        self.assertTrue(self.aplicar('in_process'))
+
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'aprovado')
+        evento = PagamentoEvento.objects.get(status='in_process')
+        self.assertEqual((evento.status_pedido_anterior, evento.status_pedido), ('aprovado', 'aprovado'))
+
+    def test_estorno_antes_da_aprovacao_e_ignorado(self):
+        self.aplicar('refunded')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'pendente')
+
+        self.aplicar('approved')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'aprovado')
+
+    def test_nova_tentativa_aprovada_depois_de_rejeitada(self):
+        self.aplicar('rejected', payment_id=1)
+        self.aplicar('approved', payment_id=2)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'aprovado')
+
+    def test_estorno_depois_de_aprovado(self):
+        self.aplicar('approved')
+        self.aplicar('refunded')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'reembolsado')
+        self.assertFalse(AcessoProduto.objects.get().ativo)
+        self.assertEqual(Produto.objects.get().total_vendas, 0)
+
+
+class NotificacaoDuplicadaTestCase(TestCase):
+    """Notificações duplicadas: uma consulta indexada, sem chamada ao MP e sem bloqueio de linha."""
+
+    def setUp(self):
+        cache.clear()
+        self.pedido = criar_pedido()
+
+    def processar(self, acao, status_mp):
+        sdk = mock.Mock()
+        sdk.payment.return_value.get.return_value = resposta_mp(self.pedido, status_mp)
+        with mock.patch('checkout.pagamentos.obter_sdk', return_value=sdk):
+            with self.captureOnCommitCallbacks(execute=True):
+                processar_notificacao_pagamento(555, {'action': acao, 'data': {'id': '555'}})
+        return sdk.payment.return_value.get.call_count
+
+    def test_custo_de_uma_notificacao_duplicada(self):
+        self.processar('payment.created', 'approved')
+        for acao in ('payment.created', None):
+            with self.assertNumQueries(1):
+                self.assertEqual(self.processar(acao, 'approved'), 0)
+
+    def test_criacao_repetida_de_pagamento_pendente_nao_consulta_o_mp(self):
+        self.assertEqual(self.processar('payment.created', 'in_process'), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.processar('payment.created', 'in_process'), 0)
+
+    def test_atualizacao_apos_aprovacao_consulta_e_aplica_estorno(self):
+        self.processar('payment.created', 'approved')
+        self.assertEqual(self.processar('payment.updated', 'refunded'), 1)
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.status, 'reembolsado')
+
+    def test_status_final_encerra_o_pagamento(self):
+        self.processar('payment.created', 'rejected')
+        self.assertTrue(notificacao_duplicada(555, acao='payment.updated'))
+
+    def test_retorno_com_status_conhecido(self):
+        self.assertFalse(notificacao_duplicada(555, status='approved'))
+        self.processar('payment.created', 'approved')
+        self.assertTrue(notificacao_duplicada(555, status='approved'))
+        self.assertFalse(notificacao_duplicada(555, status='refunded'))
+
+
+class StubMercadoPago(BaseHTTPRequestHandler):
+    """API do Mercado Pago falsa: responde GET /v1/payments/<id> com keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    status = 200
+    atraso = 0
+    conexoes = 0
+    chamadas = 0
+
+    def setup(self):
+        super().setup()
+        type(self).conexoes += 1
+
+    def do_GET(self):
+        type(self).chamadas += 1
+        if self.atraso:
+            time.sleep(self.atraso)
+        corpo = json.dumps({'id': self.path.rsplit('/', 1)[-1], 'status': 'approved'}).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Cliente que desistiu por timeout fecha a conexão antes da resposta
+        pass
+
+
+class GatewayMercadoPagoTestCase(SimpleTestCase):
+    """Cliente keep-alive e circuit breaker contra um servidor HTTP local."""
+
+    def setUp(self):
+        StubMercadoPago.status = 200
+        StubMercadoPago.atraso = 0
+        StubMercadoPago.conexoes = 0
+        StubMercadoPago.chamadas = 0
+        self.servidor = ServidorStub(('127.0.0.1', 0), StubMercadoPago)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+        configuracao = override_settings(
+            MERCADOPAGO_ACCESS_TOKEN='TEST-token',
+            MERCADOPAGO_API_URL=f'http://127.0.0.1:{self.servidor.server_address[1]}',
+            MERCADOPAGO_TIMEOUT_LEITURA=0.5,
+            MERCADOPAGO_MAX_RETENTATIVAS=0,
+            MERCADOPAGO_CIRCUITO_FALHAS=2,
+            MERCADOPAGO_CIRCUITO_REABERTURA=30,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        resetar_sdk()
+        self.addCleanup(resetar_sdk)
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+    def circuito(self):
+        return obter_sdk().http_client.circuit_breaker
+
+    def test_chamadas_reutilizam_a_mesma_conexao(self):
+        for payment_id in range(5):
+            resposta = obter_sdk().payment().get(payment_id)
+            self.assertEqual(resposta['status'], 200)
+            self.assertEqual(resposta['response']['id'], str(payment_id))
+        self.assertEqual((StubMercadoPago.chamadas, StubMercadoPago.conexoes), (5, 1))
+
+    def test_sdk_compartilhado_e_recriado_quando_o_token_muda(self):
+        sdk = obter_sdk()
+        self.assertIs(obter_sdk(), sdk)
+        with override_settings(MERCADOPAGO_ACCESS_TOKEN='TEST-outro'):
+            self.assertIsNot(obter_sdk(), sdk)
+
+    def test_circuito_abre_apos_falhas_seguidas_e_falha_rapido(self):
+        StubMercadoPago.status = 503
+        for _ in range(2):
+            self.assertEqual(obter_sdk().payment().get(1)['status'], 503)
+        self.assertEqual(self.circuito().estado, 'aberto')
+
+        with self.assertRaises(GatewayIndisponivel):
+            obter_sdk().payment().get(1)
+        self.assertEqual(StubMercadoPago.chamadas, 2)
+
+    def test_chamada_de_teste_com_sucesso_fecha_o_circuito(self):
+        StubMercadoPago.status = 500
+        obter_sdk().payment().get(1)
+        obter_sdk().payment().get(1)
+        # Simula o fim do período de espera
+        self.circuito().aberto_em -= self.circuito().tempo_reabertura
+        self.assertEqual(self.circuito().estado, 'meio-aberto')
+
+        StubMercadoPago.status = 200
+        self.assertEqual(obter_sdk().payment().get(1)['status'], 200)
+        self.assertEqual((self.circuito().estado, self.circuito().falhas), ('fechado', 0))
+
+    def test_timeout_de_leitura_conta_como_falha(self):
+        StubMercadoPago.atraso = 1
+        for _ in range(2):
+            with self.assertRaises(requests.RequestException):
+                obter_sdk().payment().get(1)
+        self.assertEqual(self.circuito().estado, 'aberto')
+
+    def test_meio_aberto_deixa_passar_uma_chamada_por_vez(self):
+        circuito = CircuitBreaker(limite_falhas=1, tempo_reabertura=0)
+        circuito.registrar_falha()
+        self.assertEqual(circuito.estado, 'meio-aberto')
+        self.assertTrue(circuito.permitir())
+        self.assertFalse(circuito.permitir())
+
+        circuito.registrar_falha()
+        self.assertTrue(circuito.permitir())
+        circuito.registrar_sucesso()
+        self.assertEqual(circuito.estado, 'fechado')
+
+
+class ChangelistsCheckoutTestCase(ChangelistMixin, TestCase):
+    """Changelists da fila de notificações, do ledger e da caixa de saída."""
+
+    def novos_pedidos(self, n):
+        inicio = User.objects.count()
+        return [criar_pedido(User.objects.create_user(username=f'u{inicio + i}@a.com', email=f'u{inicio + i}@a.com'))
+                for i in range(n)]
+
+    def test_notificacoes(self):
+        def criar(n):
+            inicio = NotificacaoWebhook.objects.count()
+            for indice in range(inicio, inicio + n):
+                registrar_notificacao(notificacao(payment_id=str(indice), notificacao_id=indice))
+        self.assertChangelistConstante(NotificacaoWebhook, criar)
+
+    def test_eventos_de_pagamento(self):
+        def criar(n):
+            for pedido in self.novos_pedidos(n):
+                PagamentoEvento.objects.create(payment_id=str(pedido.id), status='approved', pedido=pedido,
+                                               origem='webhook')
+        self.assertChangelistConstante(PagamentoEvento, criar)
+
+    def test_emails(self):
+        def criar(n):
+            for pedido in self.novos_pedidos(n):
+                EmailSaida.objects.create(destinatario=pedido.email_compra, assunto='Pedido', corpo_texto='.',
+                                          pedido=pedido)
+        self.assertChangelistConstante(EmailSaida, criar)
+
+
+class ReconciliacaoTestCase(TestCase):
+    """Reconciliação de pedidos parados com a busca de pagamentos do Mercado Pago."""
+
+    def setUp(self):
+        cache.clear()
+        self.pagamentos = {}
+        sdk = mock.Mock()
+        sdk.payment.return_value.search.side_effect = self.buscar
+        patcher = mock.patch('checkout.reconciliacao.obter_sdk', return_value=sdk)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def buscar(self, filtros):
+        resposta = self.pagamentos.get(int(filtros['external_reference']), [])
+        if isinstance(resposta, Exception):
+            raise resposta
+        return {'status': 200, 'response': {'results': resposta}}
+
+    def pedido_parado(self, minutos=60, dias=0):
+        inicio = User.objects.count()
+        pedido = criar_pedido(User.objects.create_user(username=f'u{inicio}@a.com', email=f'u{inicio}@a.com'))
+        agora = timezone.now()
+        Pedido.objects.filter(id=pedido.id).update(
+            atualizado_em=agora - timedelta(minutes=minutos), criado_em=agora - timedelta(days=dias, minutes=minutos),
+        )
+        return pedido
+
+    def pagamento(self, pedido, status, payment_id):
+        return dict(resposta_mp(pedido, status, payment_id)['response'])
+
+    def reconciliar(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reconciliar_pagamentos(threads=2, taxa=1000, **kwargs)
+
+    def test_aplica_pagamento_aprovado_ao_pedido_parado(self):
+        pedido = self.pedido_parado()
+        self.pagamentos[pedido.id] = [self.pagamento(pedido, 'rejected', 2), self.pagamento(pedido, 'approved', 1)]
+
+        resultado = self.reconciliar()
+
+        self.assertEqual(resultado, {'consultados': 1, 'atualizados': 1, 'sem_pagamento': 0, 'erros': 0})
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.status, 'aprovado')
+        evento = PagamentoEvento.objects.get()
+        self.assertEqual((evento.payment_id, evento.origem), ('1', 'reconciliacao'))
+        self.assertEqual(AcessoProduto.objects.filter(usuario=pedido.usuario).count(), 1)
+
+    def test_ignora_pedidos_recentes_e_antigos(self):
+        self.pedido_parado(minutos=5)
+        self.pedido_parado(dias=10)
+        self.assertEqual(self.reconciliar()['consultados'], 0)
+
+    def test_pedido_sem_pagamento(self):
+        self.pedido_parado()
+        self.assertEqual(self.reconciliar()['sem_pagamento'], 1)
+
+    def test_pagamento_de_outro_pedido_nao_e_aplicado(self):
+        pedido, outro = self.pedido_parado(), self.pedido_parado()
+        self.pagamentos[pedido.id] = [self.pagamento(outro, 'approved', 1)]
+        self.assertEqual(self.reconciliar()['atualizados'], 0)
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.status, 'pendente')
+
+    def test_evento_ja_registrado_nao_e_reaplicado(self):
+        pedido = self.pedido_parado()
+        self.pagamentos[pedido.id] = [self.pagamento(pedido, 'in_process', 1)]
+        self.assertEqual(self.reconciliar()['atualizados'], 1)
+        Pedido.objects.filter(id=pedido.id).update(atualizado_em=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.reconciliar()['atualizados'], 0)
+        self.assertEqual(PagamentoEvento.objects.count(), 1)
+
+    def test_erro_em_um_pedido_nao_interrompe_os_demais(self):
+        com_erro, aprovado = self.pedido_parado(), self.pedido_parado()
+        self.pagamentos[com_erro.id] = RuntimeError('timeout')
+        self.pagamentos[aprovado.id] = [self.pagamento(aprovado, 'approved', 1)]
+        resultado = self.reconciliar()
+        self.assertEqual((resultado['erros'], resultado['atualizados']), (1, 1))
+
+    def test_circuito_aberto_interrompe_a_reconciliacao(self):
+        primeiro, segundo = self.pedido_parado(), self.pedido_parado()
+        self.pagamentos[primeiro.id] = GatewayIndisponivel('circuito aberto')
+        self.pagamentos[segundo.id] = [self.pagamento(segundo, 'approved', 1)]
+        resultado = self.reconciliar(lote=1)
+        self.assertEqual((resultado['consultados'], resultado['erros']), (1, 1))
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.status, 'pendente')
+
+    def test_pedidos_parados_em_lotes_por_id(self):
+        ids = [self.pedido_parado().id for _ in range(5)]
+        self.assertEqual(list(pedidos_parados(lote=2)), [ids[:2], ids[2:4], ids[4:]])
+
+    def test_balde_de_tokens_limita_a_taxa(self):
+        balde = BaldeTokens(taxa=50, capacidade=1)
+        inicio = time.monotonic()
+        for _ in range(6):
+            balde.aguardar()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.09)
+
+
+class ListarPedidosTestCase(TestCase):
+    """Comando listar_pedidos com todos os status do pedido."""
+
+    def test_filtro_e_resumo_de_reembolsados(self):
+        reembolsado = criar_pedido()
+        Pedido.objects.filter(pk=reembolsado.pk).update(status='reembolsado')
+        criar_pedido(usuario=reembolsado.usuario)
+
+        saida = StringIO()
+        call_command('listar_pedidos', status='reembolsado', stdout=saida)
+
+        self.assertIn(f'↩️ PEDIDO #{reembolsado.pk}', saida.getvalue())
+        self.assertIn('Pedidos listados: 1 de 1', saida.getvalue())
+        self.assertIn('↩️ Reembolsado: 1', saida.getvalue())
+
+
+class MaterializarPedidoTestCase(TestCase):
+    """Pedido criado a partir do carrinho com um número de queries que não depende dos itens."""
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nome='Ebooks', slug='ebooks')
+        self.produtos = [
+            Produto.objects.create(nome=f'P{indice}', slug=f'p{indice}', categoria=categoria, preco=Decimal('10.00'))
+            for indice in range(20)
+        ]
+        self.cupom = Cupom.objects.create(codigo='BEMVINDO10', valor=Decimal('10'))
+
+    def carrinho(self, itens, cupom=None):
+        request = RequestFactory().get('/')
+        request.session = {}
+        carrinho = Carrinho(request)
+        for produto in self.produtos[:itens]:
+            carrinho.add(produto)
+        if cupom:
+            carrinho.set_cupom(cupom)
+        return carrinho
+
+    def consultas(self, usuario, carrinho):
+        with CaptureQueriesContext(connection) as consultas:
+            materializar_pedido(usuario, carrinho)
+        return len(consultas)
+
+    def test_consultas_constantes_para_pedido_novo(self):
+        esperado = self.consultas(User.objects.create_user(username='u0@a.com', email='u0@a.com'), self.carrinho(1))
+        for indice, itens in enumerate([5, 20], 1):
+            with self.subTest(itens=itens):
+                usuario = User.objects.create_user(username=f'u{indice}@a.com', email=f'u{indice}@a.com')
+                carrinho = self.carrinho(itens)
+                with self.assertNumQueries(esperado):
+                    materializado = materializar_pedido(usuario, carrinho)
+                self.assertEqual(materializado.pedido.itens.count(), itens)
+                self.assertEqual(len(materializado.items_mp), itens)
+
+    def test_consultas_constantes_ao_reaproveitar_pedido_com_cupom(self):
+        usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com')
+        materializar_pedido(usuario, self.carrinho(1, self.cupom))
+        esperado = self.consultas(usuario, self.carrinho(1, self.cupom))
+        for itens in (5, 20):
+            with self.subTest(itens=itens):
+                carrinho = self.carrinho(itens, self.cupom)
+                with self.assertNumQueries(esperado):
+                    materializar_pedido(usuario, carrinho)
+        self.assertEqual(Pedido.objects.get().itens.count(), 20)
+
+
+class LimpezaAbandonadosTestCase(TestCase):
+    """Cancelamento em lotes dos pedidos pendentes abandonados, devolvendo os cupons."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com')
+        self.cupom = Cupom.objects.create(codigo='BEMVINDO10', valor=Decimal('10'), uso_maximo=10)
+        antigo = timezone.now() - timedelta(hours=100)
+        self.abandonados = []
+        for indice in range(7):
+            com_cupom = indice % 2 == 0
+            if com_cupom:
+                reservar_uso(self.cupom)
+            self.abandonados.append(self.criar(cupom=self.cupom if com_cupom else None))
+        Pedido.objects.filter(id__in=[pedido.id for pedido in self.abandonados]).update(atualizado_em=antigo)
+        self.recente = self.criar()
+
+    def criar(self, cupom=None):
+        return Pedido.objects.create(
+            usuario=self.usuario, nome_compra='Aluno', email_compra=self.usuario.email,
+            subtotal=Decimal('10.00'), total=Decimal('10.00'),
+            cupom=cupom, cupom_status='reservado' if cupom else '',
+        )
+
+    def test_dry_run_nao_altera_nada(self):
+        self.assertEqual(resumo_abandonados(72), {'pedidos': 7, 'cupons': 4})
+
+        saida = StringIO()
+        call_command('limpar_pedidos_abandonados', dry_run=True, stdout=saida)
+        self.assertIn('A cancelar: 7', saida.getvalue())
+        self.assertEqual(Pedido.objects.filter(status='pendente').count(), 8)
+        self.assertEqual(Cupom.objects.get().total_usado, 4)
+
+    def test_lotes_menores_que_o_total_processam_todos(self):
+        with mock.patch('checkout.limpeza.time.sleep') as pausa:
+            self.assertEqual(cancelar_abandonados(72, lote=3, pausa=0.5), (7, 4))
+        # 3 + 3 + 1 pedidos: uma pausa depois de cada lote
+        self.assertEqual(pausa.call_count, 3)
+
+        self.assertEqual(Pedido.objects.filter(status='cancelado').count(), 7)
+        self.assertEqual(Pedido.objects.get(pk=self.recente.pk).status, 'pendente')
+        self.assertEqual(
+            set(Pedido.objects.filter(cupom__isnull=False).values_list('cupom_status', flat=True)), {'liberado'}
+        )
+        self.assertEqual(Cupom.objects.get().total_usado, 0)
+        self.assertEqual(cancelar_abandonados(72, lote=3, pausa=0), (0, 0))
+
+
+@override_settings(EMAIL_BACKOFF_SEGUNDOS=60, EMAIL_BACKOFF_MAXIMO=3600)
+class EnviarLoteTestCase(TestCase):
+    """Caixa de saída: uma conexão SMTP por lote, backoff nas falhas e nada enviado duas vezes."""
+
+    def setUp(self):
+        self.emails = [
+            EmailSaida.objects.create(destinatario=f'aluno{indice}@a.com', assunto='Pedido', corpo_texto='Aprovado')
+            for indice in range(3)
+        ]
+        self.conexao = mock.MagicMock()
+        patcher = mock.patch('checkout.emails.get_connection', return_value=self.conexao)
+        self.get_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def destinatarios_enviados(self):
+        return [chamada.args[0][0].to[0] for chamada in self.conexao.send_messages.call_args_list]
+
+    def test_lote_usa_uma_unica_conexao(self):
+        self.assertEqual(enviar_lote(tamanho=10), 3)
+
+        self.assertEqual(self.get_connection.call_count, 1)
+        self.assertEqual(self.conexao.open.call_count, 1)
+        self.assertEqual(self.conexao.send_messages.call_count, 3)
+        self.assertEqual(EmailSaida.objects.filter(status='enviado').count(), 3)
+
+    def test_falha_incrementa_tentativas_e_agenda_nova_tentativa(self):
+        self.conexao.send_messages.side_effect = [None, Exception('SMTP 451'), None]
+        antes = timezone.now()
+
+        enviar_lote(tamanho=10)
+
+        falhou = EmailSaida.objects.get(id=self.emails[1].id)
+        self.assertEqual(falhou.status, 'pendente')
+        self.assertEqual(falhou.tentativas, 1)
+        self.assertEqual(falhou.ultimo_erro, 'SMTP 451')
+        self.assertGreaterEqual(falhou.proxima_tentativa_em, antes + timedelta(seconds=60))
+        self.assertEqual(EmailSaida.objects.filter(status='enviado').count(), 2)
+
+        # A segunda falha dobra a espera
+        EmailSaida.objects.filter(id=falhou.id).update(proxima_tentativa_em=timezone.now())
+        self.conexao.send_messages.side_effect = Exception('SMTP 451')
+        antes = timezone.now()
+        enviar_lote(tamanho=10)
+
+        falhou.refresh_from_db()
+        self.assertEqual(falhou.tentativas, 2)
+        self.assertGreaterEqual(falhou.proxima_tentativa_em, antes + timedelta(seconds=120))
+
+    def test_erro_definitivo_apos_limite_de_tentativas(self):
+        EmailSaida.objects.exclude(id=self.emails[0].id).delete()
+        self.conexao.send_messages.side_effect = Exception('Caixa inexistente')
+
+        for _ in range(3):
+            EmailSaida.objects.filter(status='pendente').update(proxima_tentativa_em=timezone.now())
+            enviar_lote(tamanho=10, max_tentativas=3)
+
+        email = EmailSaida.objects.get()
+        self.assertEqual(email.status, 'erro')
+        self.assertEqual(email.tentativas, 3)
+
+        # Com status erro não volta a ser reservado
+        EmailSaida.objects.update(proxima_tentativa_em=timezone.now())
+        self.assertEqual(enviar_lote(tamanho=10, max_tentativas=3), 0)
+        self.assertEqual(self.conexao.send_messages.call_count, 3)
+
+    def test_enviados_nao_sao_reenviados(self):
+        self.conexao.send_messages.side_effect = [None, Exception('SMTP 451'), None]
+        enviar_lote(tamanho=10)
+        self.assertEqual(self.destinatarios_enviados(), ['aluno0@a.com', 'aluno1@a.com', 'aluno2@a.com'])
+
+        self.conexao.send_messages.reset_mock(side_effect=True)
+        EmailSaida.objects.filter(status='pendente').update(proxima_tentativa_em=timezone.now())
+        self.assertEqual(enviar_lote(tamanho=10), 1)
+
+        self.assertEqual(self.destinatarios_enviados(), ['aluno1@a.com'])
+        self.assertEqual(EmailSaida.objects.filter(status='enviado').count(), 3)
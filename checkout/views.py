@@ -11,54 +11,23 @@ from django.utils import timezone
 from django.conf import settings
 from django.urls import reverse
 from decimal import Decimal
-import mercadopago
 import json
 import hmac
 import hashlib
 import logging
 
 from produtos.models import Produto, Pedido, ItemPedido, AcessoProduto
-from carrinho.carrinho import Carrinho
+from carrinho.carrinho import obter_carrinho
+from .gateway import obter_sdk
+from .pagamentos import aplicar_status_pagamento, notificacao_duplicada
+from .pedidos import CupomEsgotado, PedidoInvalido, descartar_pedido, materializar_pedido
+from .webhooks import registrar_notificacao
 
 # Configurar loggers
 logger = logging.getLogger('mercadopago')
 security_logger = logging.getLogger('security')
 
 
-def _enviar_email_confirmacao(pedido):
-    """Envia e-mail de confirmação de compra ao cliente após aprovação."""
-    try:
-        from django.core.mail import EmailMultiAlternatives
-        from django.template.loader import render_to_string
-        from django.conf import settings
-
-        nome_cliente = pedido.nome_compra or pedido.usuario.get_full_name() or pedido.usuario.email
-        itens = pedido.itens.all()
-        base_url = getattr(settings, 'MERCADOPAGO_BASE_URL', '') or ''
-
-        context = {
-            'pedido': pedido,
-            'itens': itens,
-            'nome_cliente': nome_cliente,
-            'base_url': base_url,
-        }
-
-        assunto = f'EvolutyApp - Confirmação do Pedido #{pedido.id}'
-        corpo_html = render_to_string('emails/confirmacao_compra.html', context)
-
-        email = EmailMultiAlternatives(
-            subject=assunto,
-            body=f'Seu pedido #{pedido.id} foi aprovado! Acesse seu painel: {base_url}/dashboard/',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[pedido.email_compra],
-        )
-        email.attach_alternative(corpo_html, 'text/html')
-        email.send(fail_silently=True)
-        logger.info(f'✉️ E-mail de confirmação enviado para {pedido.email_compra} - Pedido #{pedido.id}')
-    except Exception as e:
-        logger.error(f'Erro ao enviar e-mail de confirmação do pedido #{pedido.id}: {e}')
-
-
 def _normalizar_statement_descriptor(valor: str) -> str:
     """
     Mercado Pago aceita statement descriptor com no máximo 13 caracteres.
@@ -100,37 +69,43 @@ def _sanitizar_nome_payer(nome: str) -> tuple[str, str]:
 def _sincronizar_status_retorno_mp(request, pedido):
     """
     Sincroniza status do pedido com dados de retorno do Mercado Pago.
-    Prioriza consulta na API quando houver payment_id no retorno.
+    O status só é aplicado após confirmação na API (em desenvolvimento, aceita o
+    status do retorno se a API falhar). Retornos já registrados no ledger de
+    pagamentos são reconhecidos sem nova consulta à API.
     """
-    status_mp = request.GET.get('status')
-    payment_id = request.GET.get('payment_id')
-
-    if payment_id:
-        try:
-            sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-            payment_info = sdk.payment().get(payment_id)
-            if payment_info.get('status') == 200:
-                response = payment_info.get('response', {})
-                status_mp = response.get('status') or status_mp
-                pedido.transaction_id = str(payment_id)
-        except Exception as e:
-            logger.warning('Falha ao consultar pagamento %s no retorno: %s', payment_id, str(e))
-
-    if status_mp == 'approved':
-        if pedido.status != 'aprovado':
-            pedido.status = 'aprovado'
-            pedido.aprovado_em = timezone.now()
-            pedido.save()
-            pedido.liberar_acesso_produtos()
-            _enviar_email_confirmacao(pedido)
-    elif status_mp in ('rejected', 'cancelled'):
-        if pedido.status != 'cancelado':
-            pedido.status = 'cancelado'
-            pedido.save()
-    elif status_mp in ('in_process', 'pending'):
-        if pedido.status == 'pendente':
-            pedido.status = 'processando'
-            pedido.save()
+    status_mp = request.GET.get('status') or request.GET.get('collection_status')
+    payment_id = request.GET.get('payment_id') or request.GET.get('collection_id')
+
+    if not payment_id or payment_id == 'null':
+        return
+
+    if notificacao_duplicada(payment_id, status=status_mp):
+        return
+
+    metodo_pagamento = ''
+    try:
+        sdk = obter_sdk()
+        payment_info = sdk.payment().get(payment_id)
+        if payment_info.get('status') == 200:
+            response = payment_info.get('response', {})
+            external_reference = response.get('external_reference')
+            if external_reference and str(external_reference) != str(pedido.id):
+                security_logger.warning(
+                    f'Retorno do pedido #{pedido.id} com pagamento {payment_id} de outro pedido ({external_reference})'
+                )
+                return
+            status_mp = response.get('status') or status_mp
+            if response.get('payment_method_id'):
+                metodo_pagamento = f"Mercado Pago - {response['payment_method_id']}"
+        elif not settings.DEBUG:
+            logger.warning('Pagamento %s não encontrado no retorno (status %s)', payment_id, payment_info.get('status'))
+            return
+    except Exception as e:
+        logger.warning('Falha ao consultar pagamento %s no retorno: %s', payment_id, str(e))
+        if not settings.DEBUG:
+            return
+
+    aplicar_status_pagamento(pedido, payment_id, status_mp, origem='retorno', metodo_pagamento=metodo_pagamento)
 
 
 @login_required
@@ -138,7 +113,7 @@ def checkout(request):
     """
     Página de revisão do pedido antes de finalizar a compra.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     
     # Verifica se o carrinho está vazio
     if len(carrinho) == 0:
@@ -166,102 +141,34 @@ def processar_pedido(request):
     """
     Processa o pedido, cria no banco e redireciona para pagamento no Mercado Pago.
     """
-    carrinho = Carrinho(request)
+    carrinho = obter_carrinho(request)
     
     # Verifica se o carrinho está vazio
     if len(carrinho) == 0:
         messages.error(request, 'Seu carrinho está vazio!')
         return redirect('produtos:catalogo')
     
-    # Calcula valores
-    subtotal = carrinho.get_total_preco()
-    cupom = carrinho.cupom  # pode ser None
-    desconto = Decimal('0.00')
-    codigo_cupom = ''
-
-    if cupom and cupom.esta_valido and subtotal >= cupom.valor_minimo_pedido:
-        desconto = cupom.calcular_desconto(subtotal)
-        codigo_cupom = cupom.codigo
-
-    total = subtotal - desconto
-    
-    # Busca pedido pendente/processando do usuário
-    pedido = Pedido.objects.filter(usuario=request.user, status__in=['pendente', 'processando']).order_by('-criado_em').first()
-    if pedido:
-        # Limpa itens antigos
-        pedido.itens.all().delete()
-        pedido.subtotal = subtotal
-        pedido.desconto = desconto
-        pedido.total = total
-        pedido.email_compra = request.user.email
-        pedido.nome_compra = request.user.get_full_name() or request.user.email
-        pedido.metodo_pagamento = 'Mercado Pago'
-        pedido.cupom = cupom
-        pedido.codigo_cupom = codigo_cupom
-        pedido.save()
-    else:
-        pedido = Pedido.objects.create(
-            usuario=request.user,
-            subtotal=subtotal,
-            desconto=desconto,
-            total=total,
-            status='pendente',
-            email_compra=request.user.email,
-            nome_compra=request.user.get_full_name() or request.user.email,
-            metodo_pagamento='Mercado Pago',
-            cupom=cupom,
-            codigo_cupom=codigo_cupom,
-        )
-
-    # Cria os itens do pedido (sempre reflete o carrinho atual)
-    items_mp = []
-    total_verificacao = Decimal('0.00')
-    for item in carrinho:
-        ItemPedido.objects.create(
-            pedido=pedido,
-            produto=item['produto'],
-            nome_produto=item['produto'].nome,
-            preco_unitario=item['preco'],
-            quantidade=item['quantidade'],
-            subtotal=item['total_preco']
-        )
-        items_mp.append({
-            "title": item['produto'].nome[:120],
-            "quantity": item['quantidade'],
-            "unit_price": float(item['preco']),
-            "currency_id": "BRL",
-        })
-        total_verificacao += item['total_preco']
-
-    # Aplica desconto do cupom no payload do Mercado Pago (item com valor negativo)
-    if desconto > Decimal('0.00'):
-        nome_cupom = f'Cupom {codigo_cupom}' if codigo_cupom else 'Desconto'
-        items_mp.append({
-            "title": nome_cupom[:120],
-            "quantity": 1,
-            "unit_price": -float(desconto),
-            "currency_id": "BRL",
-        })
-
-    # VALIDAÇÃO: items somam ao subtotal; total = subtotal - desconto
-    if abs(total_verificacao - subtotal) > Decimal('0.01'):
-        security_logger.critical(
-            f'ALERTA: Divergência de valores ao criar pedido #{pedido.id}. '
-            f'Subtotal calculado: {total_verificacao}, Subtotal do pedido: {subtotal}'
-        )
-        pedido.delete()
-        messages.error(request, 'Erro ao processar pedido. Por favor, tente novamente.')
-        return redirect('checkout:checkout')
+    # Cria o pedido (sempre reflete o carrinho atual)
+    try:
+        materializado = materializar_pedido(request.user, carrinho)
+    except PedidoInvalido as e:
+        if isinstance(e, CupomEsgotado):
+            carrinho.clear_cupom()
+        messages.error(request, str(e))
+        return redirect('carrinho:carrinho_detalhes')
+
+    pedido = materializado.pedido
+    items_mp = materializado.items_mp
     
     # Configura SDK do Mercado Pago
     access_token = getattr(settings, 'MERCADOPAGO_ACCESS_TOKEN', '')
     if not access_token:
         logger.error('MERCADOPAGO_ACCESS_TOKEN não configurado')
-        pedido.delete()
+        descartar_pedido(pedido)
         messages.error(request, 'Pagamento indisponível no momento. Tente novamente em instantes.')
         return redirect('checkout:checkout')
 
-    sdk = mercadopago.SDK(access_token)
+    sdk = obter_sdk()
 
     mp_mode = getattr(settings, 'MERCADOPAGO_MODE', 'test' if settings.DEBUG else 'prod').lower().strip()
     test_only = bool(getattr(settings, 'MERCADOPAGO_TEST_ONLY', False))
@@ -445,13 +352,7 @@ def processar_pedido(request):
         pedido.transaction_id = preference["id"]
         pedido.save()
         
-        # Incrementa uso do cupom e limpa o carrinho
-        if cupom:
-            try:
-                cupom.total_usado += 1
-                cupom.save(update_fields=['total_usado'])
-            except Exception as e:
-                logger.warning(f'Falha ao incrementar total_usado do cupom {codigo_cupom}: {e}')
+        # O uso do cupom já foi reservado ao criar o pedido; limpa o carrinho
         carrinho.clear_cupom()
         carrinho.clear()
         
@@ -462,7 +363,7 @@ def processar_pedido(request):
         
     except Exception as e:
         logger.error(f'Erro ao criar preferência MP para pedido #{pedido.id}: {str(e)}')
-        pedido.delete()
+        descartar_pedido(pedido)
         if settings.DEBUG:
             messages.error(request, f'Não foi possível iniciar o pagamento. Detalhe: {str(e)}')
         else:
@@ -597,107 +498,18 @@ def webhook(request):
         
         # ========== FIM DAS VALIDAÇÕES DE SEGURANÇA ==========
         
-        # 3. PROCESSA OS DADOS DO WEBHOOK
+        # 3. GRAVA A NOTIFICAÇÃO NA FILA (processada por `manage.py processar_webhooks`)
         data = json.loads(request.body)
         
         logger.info(f'Webhook recebido: {data.get("type")} - ID: {data.get("data", {}).get("id")}')
         
-        # Verifica se é uma notificação de pagamento
+        # Apenas notificações de pagamento entram na fila
         if data.get('type') == 'payment':
-            payment_id = data.get('data', {}).get('id')
-            
-            if not payment_id:
+            if not data.get('data', {}).get('id'):
                 logger.warning('Webhook sem payment_id')
                 return HttpResponse(status=200)
             
-            # 4. BUSCA INFORMAÇÕES DO PAGAMENTO NO MERCADO PAGO
-            # EM MODO DE DESENVOLVIMENTO: Continua mesmo se não encontrar
-            sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-            
-            try:
-                payment_info = sdk.payment().get(payment_id)
-            except Exception as e:
-                logger.error(f'Erro ao buscar pagamento {payment_id}: {str(e)}')
-                logger.warning('🔓 MODO DEV: Continuando mesmo com erro na API')
-                # Em desenvolvimento, cria um payment fake para teste
-                payment = {
-                    'external_reference': data.get('external_reference') or data.get('data', {}).get('external_reference'),
-                    'status': data.get('status', 'approved'),
-                    'transaction_amount': data.get('transaction_amount', 0),
-                    'payment_method_id': 'test'
-                }
-                payment_info = {'status': 200, 'response': payment}
-            
-            if payment_info['status'] != 200:
-                logger.error(f'Pagamento {payment_id} não encontrado no MP')
-                logger.warning('🔓 MODO DEV: Continuando mesmo sem encontrar pagamento')
-                # Em desenvolvimento, cria um payment fake para teste
-                payment = {
-                    'external_reference': data.get('external_reference') or data.get('data', {}).get('external_reference'),
-                    'status': data.get('status', 'approved'),
-                    'transaction_amount': data.get('transaction_amount', 0),
-                    'payment_method_id': 'test'
-                }
-            else:
-                payment = payment_info['response']
-            
-            # 5. VALIDAÇÕES DE SEGURANÇA DO PAGAMENTO
-            pedido_id = payment.get('external_reference')
-            status = payment.get('status')
-            valor_pago = Decimal(str(payment.get('transaction_amount', 0)))
-            
-            if not pedido_id:
-                logger.warning(f'Pagamento {payment_id} sem external_reference')
-                return HttpResponse(status=200)
-            
-            try:
-                pedido = Pedido.objects.get(id=pedido_id)
-            except Pedido.DoesNotExist:
-                logger.error(f'Tentativa de atualizar pedido inexistente: {pedido_id}')
-                return HttpResponse(status=200)
-            
-            # # 6. VALIDAÇÃO CRÍTICA: Verificar se o valor pago bate com o pedido (DESABILITADA)
-            # if abs(valor_pago - pedido.total) > Decimal('0.01'):
-            #     security_logger.critical(
-            #         f'ALERTA DE SEGURANÇA: Valor pago ({valor_pago}) diferente do pedido ({pedido.total}) '
-            #         f'para pedido #{pedido_id}, pagamento {payment_id}'
-            #     )
-            #     return HttpResponse(status=200)
-            
-            # # 7. VALIDAÇÃO: Verificar se o pedido não foi aprovado anteriormente (DESABILITADA)
-            # if pedido.status == 'aprovado' and pedido.aprovado_em:
-            #     logger.info(f'Pedido #{pedido.id} já aprovado anteriormente')
-            #     return HttpResponse(status=200)
-            
-            # 8. ATUALIZA STATUS BASEADO NO PAGAMENTO
-            status_anterior = pedido.status
-            
-            if status == 'approved':
-                pedido.status = 'aprovado'
-                pedido.aprovado_em = timezone.now()
-                pedido.metodo_pagamento = f"Mercado Pago - {payment.get('payment_method_id', 'N/A')}"
-                pedido.transaction_id = str(payment_id)
-                pedido.save()
-                
-                # Libera acesso aos produtos
-                pedido.liberar_acesso_produtos()
-                # Envia e-mail de confirmação
-                _enviar_email_confirmacao(pedido)                
-                logger.info(f'✅ Pedido #{pedido.id} APROVADO - Pagamento {payment_id} - R$ {valor_pago}')
-                security_logger.info(f'Acesso liberado para pedido #{pedido.id} - Usuário: {pedido.usuario.email}')
-                
-            elif status == 'in_process' or status == 'pending':
-                pedido.status = 'processando'
-                pedido.save()
-                logger.info(f'⏳ Pedido #{pedido.id} EM PROCESSAMENTO')
-                
-            elif status == 'rejected' or status == 'cancelled':
-                pedido.status = 'cancelado'
-                pedido.save()
-                logger.info(f'❌ Pedido #{pedido.id} CANCELADO/REJEITADO')
-            
-            else:
-                logger.warning(f'Status desconhecido: {status} para pedido #{pedido.id}')
+            registrar_notificacao(data)
         
         return HttpResponse(status=200)
         
@@ -706,8 +518,9 @@ def webhook(request):
         return HttpResponse(status=400)
         
     except Exception as e:
-        logger.error(f'Erro no processamento do webhook: {str(e)}', exc_info=True)
-        return HttpResponse(status=200)
+        # Falha ao gravar na fila: responde erro para o Mercado Pago reenviar
+        logger.error(f'Erro ao registrar notificação do webhook: {str(e)}', exc_info=True)
+        return HttpResponse(status=500)
 
 
 @require_POST
@@ -0,0 +1,127 @@
+"""
+Fila de notificações do Mercado Pago
+
+O webhook apenas valida e grava a notificação (resposta em milissegundos).
+O processamento acontece fora da requisição em `python manage.py processar_webhooks`,
+em lotes, com retentativas e deduplicação por payment_id.
+
+Toda notificação distinta entra na fila (a chave única é a identidade da
+notificação no MP, então reenvios da mesma notificação param no INSERT); as
+notificações do mesmo pagamento são consolidadas no processamento.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+from .filas import proxima_tentativa, reservar_lote
+from .models import NotificacaoWebhook
+from .pagamentos import processar_notificacao_pagamento
+
+logger = logging.getLogger('mercadopago')
+
+
+def chave_notificacao(dados):
+    """Identidade da notificação: o id do MP ou, sem ele, action + data.id + date_created."""
+    if dados.get('id'):
+        return f"id:{dados['id']}"
+    return f"{dados.get('action') or ''}:{dados.get('data', {}).get('id') or ''}:{dados.get('date_created') or ''}"
+
+
+def registrar_notificacao(dados):
+    """
+    Grava a notificação na fila. Retorna a notificação criada, ou None se a
+    mesma notificação já foi recebida (reenvio do MP).
+    """
+    payment_id = str(dados.get('data', {}).get('id') or '')
+    tipo = dados.get('type') or ''
+    chave = chave_notificacao(dados)
+
+    try:
+        with transaction.atomic():
+            return NotificacaoWebhook.objects.create(tipo=tipo, payment_id=payment_id, chave=chave, payload=dados)
+    except IntegrityError:
+        # Reenvio de uma notificação que esgotou as tentativas: volta para a fila
+        NotificacaoWebhook.objects.filter(chave=chave, status='erro').update(
+            status='pendente', tentativas=0, proxima_tentativa_em=timezone.now()
+        )
+        logger.info(f'Notificação {chave} do pagamento {payment_id} já recebida - ignorada')
+        return None
+
+
+def _consolidar(grupo):
+    """
+    Dados que representam as notificações do mesmo pagamento: a mais recente,
+    mas com `payment.updated` se qualquer uma delas for uma atualização (que
+    pode trazer um estorno e não pode ser tratada como `payment.created`).
+    """
+    dados = dict(grupo[-1].payload)
+    acoes = {notificacao.payload.get('action') for notificacao in grupo}
+    if 'payment.updated' in acoes:
+        dados['action'] = 'payment.updated'
+    return dados
+
+
+def processar_lote(tamanho=50, max_tentativas=None):
+    """
+    Processa um lote da fila. Notificações do mesmo pagamento no lote são
+    tratadas uma única vez. Retorna a quantidade de notificações consumidas.
+    """
+    if max_tentativas is None:
+        max_tentativas = getattr(settings, 'WEBHOOK_MAX_TENTATIVAS', 8)
+
+    notificacoes = reservar_lote(
+        NotificacaoWebhook, tamanho, getattr(settings, 'WEBHOOK_RESERVA_SEGUNDOS', 300)
+    )
+    por_pagamento = defaultdict(list)
+    for notificacao in notificacoes:
+        por_pagamento[notificacao.payment_id].append(notificacao)
+
+    for payment_id, grupo in por_pagamento.items():
+        ids = [n.id for n in grupo]
+        dados = _consolidar(grupo)
+        try:
+            processar_notificacao_pagamento(payment_id, dados)
+        except Exception as e:
+            tentativas = max(n.tentativas for n in grupo) + 1
+            esgotou = tentativas >= max_tentativas
+            NotificacaoWebhook.objects.filter(id__in=ids).update(
+                status='erro' if esgotou else 'pendente',
+                tentativas=F('tentativas') + 1,
+                proxima_tentativa_em=proxima_tentativa(
+                    tentativas,
+                    getattr(settings, 'WEBHOOK_BACKOFF_SEGUNDOS', 30),
+                    getattr(settings, 'WEBHOOK_BACKOFF_MAXIMO', 3600),
+                ),
+                ultimo_erro=str(e)[:2000],
+            )
+            if esgotou:
+                logger.error(f'Notificação do pagamento {payment_id} descartada após {tentativas} tentativas: {e}')
+            else:
+                logger.warning(f'Falha ao processar pagamento {payment_id} (tentativa {tentativas}): {e}')
+            continue
+
+        NotificacaoWebhook.objects.filter(id__in=ids).update(
+            status='processado',
+            processado_em=timezone.now(),
+            ultimo_erro='',
+        )
+        if len(ids) > 1:
+            logger.info(f'Pagamento {payment_id}: {len(ids)} notificações consolidadas em um processamento')
+
+    return len(notificacoes)
+
+
+def processar_fila(tamanho=50, max_lotes=None, max_tentativas=None):
+    """Esvazia a fila em lotes sucessivos. Retorna o total de notificações consumidas."""
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        processadas = processar_lote(tamanho, max_tentativas=max_tentativas)
+        if not processadas:
+            break
+        total += processadas
+        lotes += 1
+    return total
@@ -1,3 +1,51 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from personal.paginacao import PaginadorEstimado
+from .models import ExportacaoTreino
 
-# Register your models here.
+
+@admin.register(ExportacaoTreino)
+class ExportacaoTreinoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'formato', 'status', 'tentativas', 'criado_em', 'concluido_em']
+    list_filter = ['status', 'formato', 'criado_em']
+    search_fields = ['usuario__username', 'usuario__email']
+    list_select_related = ['usuario']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    readonly_fields = [
+        'usuario', 'consultoria', 'formato', 'arquivo', 'tentativas', 'lote',
+        'ultimo_erro', 'criado_em', 'concluido_em'
+    ]
+
+    actions = ['reprocessar']
+
+    def reprocessar(self, request, queryset):
+        # Uma exportação em andamento por consultoria e formato (dashboard_export_ativa_unica)
+        em_andamento = ExportacaoTreino.objects.filter(
+            consultoria=OuterRef('consultoria'), formato=OuterRef('formato'), status__in=['pendente', 'processando']
+        )
+        vistas = set()
+        ids = []
+        erros = queryset.filter(status='erro').exclude(Exists(em_andamento)).order_by('-criado_em')
+        for exportacao_id, consultoria_id, formato in erros.values_list('id', 'consultoria_id', 'formato'):
+            if (consultoria_id, formato) not in vistas:
+                vistas.add((consultoria_id, formato))
+                ids.append(exportacao_id)
+
+        total = ExportacaoTreino.objects.filter(id__in=ids).update(
+            status='pendente',
+            tentativas=0,
+            proxima_tentativa_em=timezone.now(),
+        )
+        ignoradas = queryset.filter(status='erro').count()
+        self.message_user(request, f'{total} exportação(ões) reenviada(s) para a fila.')
+        if ignoradas:
+            self.message_user(
+                request, f'{ignoradas} ignorada(s): já existe exportação em andamento do mesmo treino e formato.',
+                messages.WARNING,
+            )
+    reprocessar.short_description = 'Reenviar para a fila'
+
+    def has_add_permission(self, request):
+        return False
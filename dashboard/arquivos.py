@@ -0,0 +1,110 @@
+"""
+Entrega protegida de arquivos dos conteúdos digitais
+
+Depois da verificação de acesso, a transferência é entregue ao servidor web
+quando configurado (MIDIA_PROTEGIDA_SERVIDOR):
+    'nginx'   -> X-Accel-Redirect para MIDIA_PROTEGIDA_PREFIXO + caminho do arquivo
+                 (location `internal` apontando para MIDIA_PROTEGIDA_ROOT)
+    'apache'  -> X-Sendfile com o caminho absoluto (mod_xsendfile)
+Sem servidor configurado, o próprio Django responde com suporte a Range
+(206 Partial Content), para que avançar um vídeo não baixe o arquivo de novo.
+"""
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+from urllib.parse import quote
+import mimetypes
+import os
+import re
+
+TAMANHO_BLOCO = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    Interpreta um cabeçalho Range de intervalo único.
+    Retorna (inicio, fim) inclusivos, None se ausente/ignorado ou False se inválido.
+    """
+    if not cabecalho:
+        return None
+    match = _RANGE_RE.match(cabecalho.strip())
+    if not match:
+        # Vários intervalos ou unidade desconhecida: responde o arquivo inteiro
+        return None
+    inicio, fim = match.groups()
+    if not inicio:
+        if not fim:
+            return False
+        # Sufixo: últimos N bytes
+        inicio = max(tamanho - int(fim), 0)
+        fim = tamanho - 1
+    else:
+        inicio = int(inicio)
+        fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+def _ler_intervalo(caminho, inicio, fim):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        restante = fim - inicio + 1
+        while restante > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+
+
+def _disposicao(nome, download):
+    tipo = 'attachment' if download else 'inline'
+    return f"{tipo}; filename*=UTF-8''{quote(nome)}"
+
+
+def responder_arquivo(request, arquivo, download=False):
+    """Resposta para o FieldFile informado (acesso já verificado pela view)."""
+    caminho = arquivo.path
+    nome = os.path.basename(arquivo.name)
+    tipo_conteudo = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+    servidor = getattr(settings, 'MIDIA_PROTEGIDA_SERVIDOR', '')
+
+    if servidor:
+        response = HttpResponse(content_type=tipo_conteudo)
+        if servidor == 'nginx':
+            prefixo = getattr(settings, 'MIDIA_PROTEGIDA_PREFIXO', '/midia-protegida/')
+            response['X-Accel-Redirect'] = prefixo.rstrip('/') + '/' + quote(arquivo.name)
+        else:
+            response['X-Sendfile'] = caminho
+        response['Content-Disposition'] = _disposicao(nome, download)
+        return response
+
+    estatisticas = os.stat(caminho)
+    tamanho = estatisticas.st_size
+    intervalo = _intervalo(request.META.get('HTTP_RANGE'), tamanho)
+
+    if intervalo is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamanho}'
+        return response
+
+    if intervalo is None:
+        response = FileResponse(open(caminho, 'rb'), content_type=tipo_conteudo)
+    else:
+        inicio, fim = intervalo
+        response = StreamingHttpResponse(
+            _ler_intervalo(caminho, inicio, fim),
+            status=206,
+            content_type=tipo_conteudo,
+        )
+        response['Content-Length'] = str(fim - inicio + 1)
+        response['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(estatisticas.st_mtime)
+    response['Content-Disposition'] = _disposicao(nome, download)
+    response['Cache-Control'] = 'private'
+    return response
@@ -0,0 +1,279 @@
+"""
+Exportação do treino da consultoria (PDF e Excel) com cache em disco
+
+Os arquivos são gravados em EXPORTACOES_ROOT (fora de MEDIA_ROOT, sem URL
+pública) com o nome derivado de um hash do conteúdo do treino. Enquanto o
+personal não alterar o treino, os downloads são servidos direto do disco.
+
+A geração nunca acontece na requisição: o aluno (POST em
+`exportacao_solicitar`) ou o admin (ao salvar o treino) cria uma
+ExportacaoTreino e o worker `python manage.py processar_exportacoes` gera o
+arquivo; a página do treino consulta o status. Os downloads por GET apenas
+entregam o arquivo já gerado.
+"""
+from dataclasses import asdict
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.functional import LazyObject
+import hashlib
+import json
+import logging
+import tempfile
+
+from accounts.models import ConsultoriaOnline
+from accounts.treinos import carregar_treino_atual, iterar_treinos_atuais
+from checkout.filas import proxima_tentativa, reservar_lote
+from .models import ExportacaoTreino
+from .planilhas import PlanilhaIndisponivel, escrever_treino, nova_pasta
+
+logger = logging.getLogger(__name__)
+
+STATUS_ATIVOS = ('pendente', 'processando')
+
+# Incrementar ao mudar o layout dos arquivos (invalida as exportações em disco)
+VERSAO_LAYOUT = 1
+
+
+class ExportacaoIndisponivel(Exception):
+    """A biblioteca do formato não está instalada ou a geração falhou."""
+
+
+class LimiteExportacoes(Exception):
+    """O usuário já tem o máximo de exportações em andamento."""
+
+
+class _Armazenamento(LazyObject):
+    def _setup(self):
+        self._wrapped = FileSystemStorage(location=settings.EXPORTACOES_ROOT)
+
+
+armazenamento = _Armazenamento()
+
+
+def assinatura_treino(plano, usuario):
+    """Hash do conteúdo exportado: treino, dias, exercícios e nome do aluno."""
+    treino = asdict(plano)
+    # Salvar sem alterar nada muda só a data: o arquivo continua o mesmo
+    del treino['atualizado_em']
+    conteudo = {
+        'layout': VERSAO_LAYOUT,
+        'aluno': usuario.get_full_name() or usuario.username,
+        'treino': treino,
+    }
+    dados = json.dumps(conteudo, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()
+
+
+def gerar_pdf(plano, usuario, destino):
+    try:
+        from xhtml2pdf import pisa
+    except ImportError:
+        raise ExportacaoIndisponivel('Biblioteca de PDF nao instalada. Instale xhtml2pdf.')
+
+    html_string = render_to_string(
+        'dashboard/consultoria/treino_export_pdf.html',
+        {
+            'treino_atual': plano,
+            'usuario': usuario,
+            'gerado_em': timezone.now(),
+        }
+    )
+    pisa_status = pisa.CreatePDF(html_string, dest=destino, encoding='utf-8')
+    if pisa_status.err:
+        raise ExportacaoIndisponivel('Nao foi possivel gerar o PDF.')
+
+
+def gerar_excel(plano, usuario, destino):
+    try:
+        wb = nova_pasta()
+    except PlanilhaIndisponivel as e:
+        raise ExportacaoIndisponivel(str(e))
+    escrever_treino(wb, plano, usuario)
+    wb.save(destino)
+
+
+# formato -> (gerador(plano, usuario, destino), extensão, content type)
+FORMATOS = {
+    'pdf': (gerar_pdf, 'pdf', 'application/pdf'),
+    'excel': (gerar_excel, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def exportar_treinos_excel(consultorias, destino):
+    """
+    Escreve em `destino` uma pasta de trabalho com o treino atual de cada
+    consultoria (uma aba por aluno). Retorna a quantidade de abas; com zero,
+    nada é gravado.
+    """
+    try:
+        wb = nova_pasta()
+    except PlanilhaIndisponivel as e:
+        raise ExportacaoIndisponivel(str(e))
+
+    total = 0
+    for usuario, plano in iterar_treinos_atuais(consultorias):
+        escrever_treino(wb, plano, usuario, titulo_aba=usuario.get_full_name() or usuario.username)
+        total += 1
+    if total:
+        wb.save(destino)
+    return total
+
+
+def nome_exportacao(consultoria, plano, formato):
+    """Nome do arquivo (no armazenamento) para o conteúdo atual do treino."""
+    _, extensao, _ = FORMATOS[formato]
+    return f'treinos/{consultoria.id}/{assinatura_treino(plano, consultoria.usuario)}.{extensao}'
+
+
+def exportacao_pronta(consultoria, plano, formato):
+    """Nome do arquivo se já gerado para o conteúdo atual, ou None (não gera)."""
+    nome = nome_exportacao(consultoria, plano, formato)
+    return nome if armazenamento.exists(nome) else None
+
+
+def obter_exportacao(consultoria, plano, formato):
+    """
+    Retorna o nome (no armazenamento) do arquivo exportado do treino, gerando-o
+    apenas se ainda não existir para o conteúdo atual. Usado pelo worker.
+    """
+    gerador, extensao, _ = FORMATOS[formato]
+    usuario = consultoria.usuario
+    pasta = f'treinos/{consultoria.id}'
+    nome = nome_exportacao(consultoria, plano, formato)
+
+    if armazenamento.exists(nome):
+        return nome
+
+    # Gerado em arquivo temporário e copiado em blocos para o armazenamento
+    with tempfile.TemporaryFile() as temporario:
+        gerador(plano, usuario, temporario)
+        temporario.seek(0)
+        salvo = armazenamento.save(nome, File(temporario))
+    if salvo != nome:
+        # Outro processo gerou o mesmo arquivo ao mesmo tempo
+        armazenamento.delete(salvo)
+
+    # Versões anteriores do treino não são mais servidas
+    _, arquivos = armazenamento.listdir(pasta)
+    for arquivo in arquivos:
+        if arquivo.endswith(f'.{extensao}') and f'{pasta}/{arquivo}' != nome:
+            armazenamento.delete(f'{pasta}/{arquivo}')
+
+    logger.info(f'Exportação {formato} do treino #{plano.id} gerada: {nome}')
+    return nome
+
+
+def solicitar_exportacao(consultoria, formato, limitar=True):
+    """
+    Enfileira a exportação do treino atual. Reaproveita uma exportação em
+    andamento do mesmo formato; com `limitar`, recusa (LimiteExportacoes) quando
+    o aluno já tem EXPORTACAO_MAX_POR_USUARIO exportações em andamento.
+
+    A deduplicação não depende de lock de linha (o SQLite ignora
+    select_for_update): a restrição única parcial `dashboard_export_ativa_unica`
+    admite uma só exportação em andamento por consultoria e formato, e a
+    solicitação que perder a corrida do INSERT devolve a da concorrente. Assim
+    o aluno nunca tem mais que uma exportação em andamento por formato.
+    """
+    em_andamento = ExportacaoTreino.objects.filter(
+        usuario_id=consultoria.usuario_id, status__in=STATUS_ATIVOS
+    )
+    ativa = em_andamento.filter(consultoria=consultoria, formato=formato)
+    existente = ativa.first()
+    if existente:
+        return existente
+
+    if limitar and em_andamento.count() >= getattr(settings, 'EXPORTACAO_MAX_POR_USUARIO', 2):
+        raise LimiteExportacoes('Aguarde a conclusão das exportações em andamento.')
+
+    try:
+        with transaction.atomic():
+            return ExportacaoTreino.objects.create(
+                usuario_id=consultoria.usuario_id,
+                consultoria=consultoria,
+                formato=formato,
+            )
+    except IntegrityError:
+        # Outra solicitação enfileirou o mesmo formato ao mesmo tempo
+        existente = ativa.first()
+        if existente is None:
+            raise
+        return existente
+
+
+def agendar_pregeracao(consultoria_id):
+    """
+    Enfileira PDF e Excel do treino atual depois do commit (admin ao salvar o
+    treino). Formatos já gerados para o conteúdo atual não são enfileirados.
+    """
+    def enfileirar():
+        consultoria = ConsultoriaOnline.objects.select_related('usuario').get(id=consultoria_id)
+        plano = carregar_treino_atual(consultoria)
+        if plano is None:
+            return
+        for formato in FORMATOS:
+            if exportacao_pronta(consultoria, plano, formato) is None:
+                solicitar_exportacao(consultoria, formato, limitar=False)
+    transaction.on_commit(enfileirar)
+
+
+def _processar(exportacao):
+    consultoria = ConsultoriaOnline.objects.select_related('usuario').get(id=exportacao.consultoria_id)
+    plano = carregar_treino_atual(consultoria)
+    if plano is None:
+        raise ExportacaoIndisponivel('Nenhum treino atual para exportar.')
+    return obter_exportacao(consultoria, plano, exportacao.formato)
+
+
+def processar_lote_exportacoes(tamanho=5, max_tentativas=None):
+    """
+    Gera um lote de exportações pendentes. Retorna a quantidade consumida.
+    Erros de biblioteca/treino inexistente não são retentados.
+    """
+    if max_tentativas is None:
+        max_tentativas = getattr(settings, 'EXPORTACAO_MAX_TENTATIVAS', 3)
+
+    exportacoes = reservar_lote(
+        ExportacaoTreino, tamanho, getattr(settings, 'EXPORTACAO_RESERVA_SEGUNDOS', 600)
+    )
+    for exportacao in exportacoes:
+        try:
+            nome = _processar(exportacao)
+        except Exception as e:
+            tentativas = exportacao.tentativas + 1
+            esgotou = isinstance(e, ExportacaoIndisponivel) or tentativas >= max_tentativas
+            ExportacaoTreino.objects.filter(id=exportacao.id).update(
+                status='erro' if esgotou else 'pendente',
+                tentativas=F('tentativas') + 1,
+                proxima_tentativa_em=proxima_tentativa(tentativas, 30, 600),
+                ultimo_erro=str(e)[:2000],
+            )
+            logger.error(f'Falha ao gerar exportação #{exportacao.id} (tentativa {tentativas}): {e}')
+            continue
+
+        ExportacaoTreino.objects.filter(id=exportacao.id).update(
+            status='concluido',
+            arquivo=nome,
+            concluido_em=timezone.now(),
+            ultimo_erro='',
+        )
+
+    return len(exportacoes)
+
+
+def processar_fila_exportacoes(tamanho=5, max_lotes=None, max_tentativas=None):
+    """Esvazia a fila de exportações em lotes sucessivos. Retorna o total consumido."""
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        consumidas = processar_lote_exportacoes(tamanho, max_tentativas=max_tentativas)
+        if not consumidas:
+            break
+        total += consumidas
+        lotes += 1
+    return total
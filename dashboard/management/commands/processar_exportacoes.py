@@ -0,0 +1,64 @@
+"""
+Comando para gerar as exportações de treino (PDF/Excel) pendentes
+A página do treino e o admin apenas enfileiram; este worker gera os arquivos
+fora das requisições, em lotes, com retentativas.
+
+Uso:
+    python manage.py processar_exportacoes                 # esvazia a fila e termina (cron)
+    python manage.py processar_exportacoes --continuo      # fica rodando (always-on task)
+    python manage.py processar_exportacoes --lote=10
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from dashboard.exportacao import processar_fila_exportacoes
+
+
+class Command(BaseCommand):
+    help = 'Gera as exportações de treino (PDF/Excel) pendentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5,
+            help='Quantidade de exportações reservadas por vez (padrão: 5)'
+        )
+        parser.add_argument(
+            '--max-tentativas',
+            type=int,
+            help='Tentativas antes de marcar a exportação como erro (padrão: EXPORTACAO_MAX_TENTATIVAS ou 3)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Mantém o worker rodando, verificando a fila a cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2,
+            help='Segundos de espera quando a fila está vazia no modo contínuo (padrão: 2)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        max_tentativas = options['max_tentativas']
+
+        if not options['continuo']:
+            total = processar_fila_exportacoes(lote, max_tentativas=max_tentativas)
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} exportação(ões) processada(s)'))
+            return
+
+        self.stdout.write(f'🔄 Worker de exportações iniciado (lote={lote}, intervalo={options["intervalo"]}s)')
+        try:
+            while True:
+                close_old_connections()
+                total = processar_fila_exportacoes(lote, max_tentativas=max_tentativas)
+                if total:
+                    self.stdout.write(f'   {total} exportação(ões) processada(s)')
+                else:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹️  Worker encerrado')
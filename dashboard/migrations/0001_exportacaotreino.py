@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0005_alter_exerciciotreino_options_diatreino_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoTreino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('pdf', 'PDF'), ('excel', 'Excel')], max_length=10)),
+                ('arquivo', models.CharField(blank=True, help_text='Nome do arquivo em EXPORTACOES_ROOT', max_length=255)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Gerando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Quando pendente: próxima tentativa. Quando gerando: fim da reserva do worker.')),
+                ('lote', models.CharField(blank=True, help_text='Identificador do worker que reservou a exportação', max_length=32)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('consultoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to='accounts.consultoriaonline')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes_treino', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação de treino',
+                'verbose_name_plural': 'Exportações de treino',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='dashboard_export_fila_idx'), models.Index(fields=['usuario', 'status'], name='dashboard_export_usuario_idx')],
+            },
+        ),
+    ]
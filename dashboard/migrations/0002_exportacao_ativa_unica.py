@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def descartar_duplicadas(apps, schema_editor):
+    """Mantém só a exportação em andamento mais recente de cada consultoria e formato."""
+    ExportacaoTreino = apps.get_model('dashboard', 'ExportacaoTreino')
+    vistas = set()
+    duplicadas = []
+    ativas = ExportacaoTreino.objects.filter(status__in=['pendente', 'processando']).order_by('-criado_em', '-id')
+    for exportacao_id, consultoria_id, formato in ativas.values_list('id', 'consultoria_id', 'formato'):
+        if (consultoria_id, formato) in vistas:
+            duplicadas.append(exportacao_id)
+        vistas.add((consultoria_id, formato))
+    ExportacaoTreino.objects.filter(id__in=duplicadas).update(
+        status='erro', ultimo_erro='Duplicada de outra exportação em andamento'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_exerciciotreino_options_diatreino_and_more'),
+        ('dashboard', '0001_exportacaotreino'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(descartar_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='exportacaotreino',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pendente', 'processando'])), fields=('consultoria', 'formato'), name='dashboard_export_ativa_unica'),
+        ),
+    ]
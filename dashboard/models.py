@@ -1,3 +1,64 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ExportacaoTreino(models.Model):
+    """Exportação do treino (PDF/Excel) gerada fora da requisição pelo worker `processar_exportacoes`"""
+    FORMATO_CHOICES = [
+        ('pdf', 'PDF'),
+        ('excel', 'Excel'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Gerando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='exportacoes_treino'
+    )
+    consultoria = models.ForeignKey(
+        'accounts.ConsultoriaOnline',
+        on_delete=models.CASCADE,
+        related_name='exportacoes'
+    )
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    arquivo = models.CharField(max_length=255, blank=True, help_text="Nome do arquivo em EXPORTACOES_ROOT")
+
+    # Controle da fila
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(
+        default=timezone.now,
+        help_text="Quando pendente: próxima tentativa. Quando gerando: fim da reserva do worker."
+    )
+    lote = models.CharField(max_length=32, blank=True, help_text="Identificador do worker que reservou a exportação")
+    ultimo_erro = models.TextField(blank=True)
+
+    # Metadados
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportação de treino"
+        verbose_name_plural = "Exportações de treino"
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa_em'], name='dashboard_export_fila_idx'),
+            models.Index(fields=['usuario', 'status'], name='dashboard_export_usuario_idx'),
+        ]
+        constraints = [
+            # No máximo uma exportação em andamento por treino e formato (solicitar_exportacao)
+            models.UniqueConstraint(
+                fields=['consultoria', 'formato'],
+                condition=models.Q(status__in=['pendente', 'processando']),
+                name='dashboard_export_ativa_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Exportação {self.get_formato_display()} #{self.id} - {self.usuario} ({self.status})"
@@ -0,0 +1,98 @@
+"""
+Planilhas de treino (Excel) em modo write-only do openpyxl
+
+As linhas são escritas em sequência e descarregadas para um arquivo temporário
+pelo próprio openpyxl, então o uso de memória não cresce com o número de
+exercícios. Os estilos são registrados uma vez por pasta de trabalho como
+estilos nomeados e compartilhados por todas as células.
+
+Usado pela exportação do aluno (uma aba) e pela exportação em lote do admin
+(uma aba por aluno).
+"""
+from django.utils import timezone
+import re
+
+ESTILO_MARCA = 'evoluty_marca'
+ESTILO_CABECALHO = 'evoluty_cabecalho'
+ESTILO_DIA = 'evoluty_dia'
+ESTILO_ROTULO = 'evoluty_rotulo'
+
+COLUNAS = ['Exercicio', 'Series', 'Repeticoes', 'Carga', 'Descanso', 'Obs', 'Video']
+LARGURA_COLUNA = 22
+
+_CARACTERES_ABA_INVALIDOS = re.compile(r'[\[\]:*?/\\]')
+
+
+class PlanilhaIndisponivel(Exception):
+    """openpyxl não está instalado."""
+
+
+def nova_pasta():
+    """Cria a pasta de trabalho write-only com os estilos nomeados registrados."""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+    except ImportError:
+        raise PlanilhaIndisponivel('Biblioteca de Excel nao instalada. Instale openpyxl.')
+
+    wb = Workbook(write_only=True)
+    wb.add_named_style(NamedStyle(
+        name=ESTILO_MARCA, font=Font(bold=True, size=14), alignment=Alignment(horizontal='left')
+    ))
+    wb.add_named_style(NamedStyle(name=ESTILO_CABECALHO, font=Font(bold=True, size=12)))
+    wb.add_named_style(NamedStyle(
+        name=ESTILO_DIA, font=Font(bold=True, size=12), fill=PatternFill('solid', fgColor='EEF2F6')
+    ))
+    wb.add_named_style(NamedStyle(name=ESTILO_ROTULO, font=Font(bold=True)))
+    return wb
+
+
+def _nome_aba(nome, usados):
+    """Nome de aba válido (até 31 caracteres, sem []:*?/\\) e único na pasta."""
+    base = _CARACTERES_ABA_INVALIDOS.sub(' ', nome).strip()[:31] or 'Treino'
+    candidato = base
+    sufixo = 2
+    while candidato.lower() in usados:
+        candidato = f'{base[:31 - len(str(sufixo)) - 1]} {sufixo}'
+        sufixo += 1
+    return candidato
+
+
+def escrever_treino(wb, plano, usuario, titulo_aba='Treino Atual'):
+    """Acrescenta uma aba com o treino (TreinoPlano) do aluno."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(_nome_aba(titulo_aba, {nome.lower() for nome in wb.sheetnames}))
+    for indice in range(1, len(COLUNAS) + 1):
+        ws.column_dimensions[get_column_letter(indice)].width = LARGURA_COLUNA
+
+    def celula(valor, estilo=None):
+        cell = WriteOnlyCell(ws, value=valor)
+        if estilo:
+            cell.style = estilo
+        return cell
+
+    ws.append([celula('PersonalTrainer', ESTILO_MARCA)])
+    ws.append([])
+    ws.append([celula('Aluno:', ESTILO_ROTULO), usuario.get_full_name() or usuario.username])
+    ws.append([celula('Treino:', ESTILO_ROTULO), plano.titulo])
+    ws.append([celula('Gerado em:', ESTILO_ROTULO), timezone.localtime().strftime('%d/%m/%Y %H:%M')])
+    ws.append([])
+
+    cabecalho = [celula(titulo, ESTILO_CABECALHO) for titulo in COLUNAS]
+    for dia in plano.dias:
+        ws.append([celula(dia.nome, ESTILO_DIA)] + [celula(None, ESTILO_DIA) for _ in COLUNAS[1:]])
+        ws.append(cabecalho)
+        for item in dia.exercicios:
+            ws.append([
+                item.nome,
+                item.series,
+                item.repeticoes,
+                item.carga or '',
+                item.descanso or '',
+                item.observacao_especifica or '',
+                item.link_video or '',
+            ])
+        ws.append([])
+    return ws
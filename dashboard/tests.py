@@ -1,3 +1,380 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock, skipUnless
+import importlib
+import io
+import os
+import shutil
+import tempfile
+import tracemalloc
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import empty
+
+from accounts.models import ConsultoriaOnline
+from accounts.tests import criar_consultoria, criar_treino
+from accounts.treinos import DiaPlano, ExercicioPlano, TreinoPlano, carregar_treino_atual
+from produtos.models import AcessoProduto, Categoria, ConteudoDigital, Produto
+from .admin import ExportacaoTreinoAdmin
+from .exportacao import armazenamento, exportar_treinos_excel, gerar_excel, nome_exportacao, solicitar_exportacao
+from .models import ExportacaoTreino
+from .planilhas import COLUNAS, PlanilhaIndisponivel, _nome_aba, escrever_treino, nova_pasta
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+User = get_user_model()
+
+
+class MidiaProtegidaTestCase(TestCase):
+    """Arquivos dos conteúdos pagos: fora de MEDIA_ROOT e entregues só com acesso ativo."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.protegida_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.addCleanup(shutil.rmtree, self.protegida_root, True)
+        configuracao = override_settings(MEDIA_ROOT=self.media_root, MIDIA_PROTEGIDA_ROOT=self.protegida_root)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        cache.clear()
+
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        categoria = Categoria.objects.create(nome='Ebooks', slug='ebooks')
+        self.produto = Produto.objects.create(nome='Ebook', slug='ebook', categoria=categoria, preco='10.00')
+        self.conteudo = ConteudoDigital.objects.create(produto=self.produto, titulo='Capítulo 1', tipo='pdf')
+        self.conteudo.arquivo.save('capitulo.pdf', ContentFile(b'0123456789'))
+        self.url = reverse('dashboard:conteudo_arquivo', args=[self.conteudo.id, 'arquivo'])
+
+    def test_arquivo_gravado_fora_de_media_root(self):
+        caminho = os.path.realpath(self.conteudo.arquivo.path)
+        self.assertTrue(caminho.startswith(os.path.realpath(self.protegida_root)))
+        self.assertFalse(caminho.startswith(os.path.realpath(self.media_root)))
+        self.assertFalse(self.conteudo.arquivo.url.startswith('/media/'))
+
+    def test_sem_acesso_recebe_403(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_com_acesso_recebe_arquivo_e_intervalo(self):
+        AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto)
+        self.client.force_login(self.usuario)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+
+    def test_migracao_move_arquivos_de_media_root(self):
+        migracao = importlib.import_module('produtos.migrations.0009_conteudo_midia_protegida')
+        antigo = os.path.join(self.media_root, 'produtos/conteudos/antigo.pdf')
+        os.makedirs(os.path.dirname(antigo))
+        with open(antigo, 'wb') as arquivo:
+            arquivo.write(b'pdf')
+        ConteudoDigital.objects.create(
+            produto=self.produto, titulo='Antigo', tipo='pdf', arquivo='produtos/conteudos/antigo.pdf'
+        )
+
+        migracao.mover_para_midia_protegida(apps, None)
+
+        self.assertFalse(os.path.exists(antigo))
+        self.assertTrue(os.path.isfile(os.path.join(self.protegida_root, 'produtos/conteudos/antigo.pdf')))
+
+
+def plano_grande(exercicios):
+    item = ExercicioPlano(
+        nome='Supino', grupo_muscular='Peito', descricao='', link_video='', series=4,
+        repeticoes='10', carga='20kg', descanso='60s', observacao_especifica='',
+    )
+    dias = tuple(DiaPlano(nome=f'Dia {indice}', descricao='', exercicios=(item,) * 100)
+                 for indice in range(exercicios // 100))
+    return TreinoPlano(id=1, titulo='Volume', descricao='', arquivo_pdf_url='', atualizado_em=None, dias=dias)
+
+
+class NomeAbaTestCase(TestCase):
+    """Nomes de aba válidos no Excel e únicos na pasta."""
+
+    def test_remove_caracteres_invalidos_e_limita_tamanho(self):
+        self.assertEqual(_nome_aba('Ana [A/B]: treino?', set()), 'Ana  A B   treino')
+        self.assertEqual(len(_nome_aba('x' * 40, set())), 31)
+        self.assertEqual(_nome_aba('***', set()), 'Treino')
+
+    def test_nomes_repetidos_recebem_sufixo(self):
+        self.assertEqual(_nome_aba('Ana', {'ana'}), 'Ana 2')
+        self.assertEqual(_nome_aba('Ana', {'ana', 'ana 2'}), 'Ana 3')
+        self.assertEqual(len(_nome_aba('x' * 31, {'x' * 31})), 31)
+
+    def test_sem_openpyxl(self):
+        with mock.patch.dict('sys.modules', {'openpyxl': None}):
+            with self.assertRaises(PlanilhaIndisponivel):
+                nova_pasta()
+
+
+@skipUnless(openpyxl, 'openpyxl não instalado')
+class PlanilhaTreinoTestCase(TestCase):
+    """Planilha do treino gerada em modo write-only."""
+
+    def setUp(self):
+        self.consultoria = criar_consultoria()
+        self.consultoria.usuario.first_name, self.consultoria.usuario.last_name = 'Ana', 'Souza'
+        self.consultoria.usuario.save()
+
+    def ler(self, destino):
+        destino.seek(0)
+        return openpyxl.load_workbook(destino)
+
+    def test_planilha_do_aluno(self):
+        criar_treino(self.consultoria, dias=2, exercicios_por_dia=3)
+        destino = io.BytesIO()
+        gerar_excel(carregar_treino_atual(self.consultoria), self.consultoria.usuario, destino)
+
+        wb = self.ler(destino)
+        self.assertEqual(wb.sheetnames, ['Treino Atual'])
+        linhas = [linha for linha in wb.active.iter_rows(values_only=True)]
+        self.assertEqual(linhas[0][0], 'PersonalTrainer')
+        self.assertEqual(linhas[2][:2], ('Aluno:', 'Ana Souza'))
+        self.assertEqual(linhas[3][:2], ('Treino:', 'Hipertrofia'))
+        self.assertEqual(linhas[6][0], 'Treino 1')
+        self.assertEqual(list(linhas[7]), COLUNAS)
+        self.assertEqual(linhas[8][:4], ('Exercício 1.1', 4, '10-12', '20kg'))
+        self.assertEqual(len([linha for linha in linhas if linha[0] and linha[0].startswith('Exercício')]), 6)
+        self.assertEqual(wb.active['A7'].style, 'evoluty_dia')
+        self.assertEqual(wb.active['A8'].style, 'evoluty_cabecalho')
+
+    def test_exportacao_em_lote_uma_aba_por_aluno(self):
+        homonimo = criar_consultoria('outra@a.com')
+        homonimo.usuario.first_name, homonimo.usuario.last_name = 'Ana', 'Souza'
+        homonimo.usuario.save()
+        sem_treino = criar_consultoria('sem@a.com')
+        for consultoria in (self.consultoria, homonimo):
+            criar_treino(consultoria, dias=1, exercicios_por_dia=2)
+
+        destino = io.BytesIO()
+        total = exportar_treinos_excel(ConsultoriaOnline.objects.all(), destino)
+
+        self.assertEqual(total, 2)
+        self.assertEqual(self.ler(destino).sheetnames, ['Ana Souza', 'Ana Souza 2'])
+        self.assertEqual(exportar_treinos_excel(ConsultoriaOnline.objects.filter(pk=sem_treino.pk), io.BytesIO()), 0)
+
+    def test_memoria_nao_cresce_com_o_numero_de_linhas(self):
+        def pico(exercicios):
+            plano = plano_grande(exercicios)
+            tracemalloc.start()
+            try:
+                wb = nova_pasta()
+                escrever_treino(wb, plano, self.consultoria.usuario)
+                with tempfile.TemporaryFile() as destino:
+                    wb.save(destino)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        pequeno, grande = pico(1000), pico(10000)
+        self.assertLess(grande, pequeno * 2)
+
+    def test_acao_do_admin_envia_a_planilha(self):
+        criar_treino(self.consultoria, dias=1, exercicios_por_dia=1)
+        admin = get_user_model().objects.create_superuser(username='admin', email='admin@a.com', password='x12345')
+        self.client.force_login(admin)
+
+        resposta = self.client.post(reverse('admin:accounts_consultoriaonline_changelist'), {
+            'action': 'exportar_treinos', '_selected_action': [self.consultoria.pk],
+        })
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('attachment;', resposta['Content-Disposition'])
+        self.assertEqual(self.ler(io.BytesIO(b''.join(resposta.streaming_content))).sheetnames, ['Ana Souza'])
+
+
+class ProdutoDetalhesTestCase(TestCase):
+    """Página do produto no dashboard: acesso expirado redireciona com aviso; contadores em meus produtos."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        categoria = Categoria.objects.create(nome='Ebooks', slug='ebooks')
+        self.produto = Produto.objects.create(nome='Ebook', slug='ebook', categoria=categoria, preco='10.00')
+        self.url = reverse('dashboard:produto_detalhes', args=['ebook'])
+        self.client.force_login(self.usuario)
+
+    def test_sem_acesso_404(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_acesso_ativo(self):
+        AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_meus_produtos_mostra_contadores_atuais(self):
+        AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto)
+        self.client.get(reverse('dashboard:meus_produtos'))
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertContains(self.client.get(reverse('dashboard:meus_produtos')), '2 acessos')
+
+    def test_acesso_expirado_redireciona_com_aviso(self):
+        AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto,
+                                     expira_em=timezone.now() - timedelta(days=1))
+        resposta = self.client.get(self.url, follow=True)
+        self.assertRedirects(resposta, reverse('dashboard:meus_produtos'))
+        self.assertContains(resposta, 'Seu acesso a este produto expirou.')
+
+    def test_acesso_desativado_redireciona_com_aviso(self):
+        AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto, ativo=False)
+        resposta = self.client.get(self.url)
+        self.assertRedirects(resposta, reverse('dashboard:meus_produtos'), fetch_redirect_response=False)
+
+
+class ExportacaoTreinoTestCase(TestCase):
+    """GET só entrega arquivo pronto; a fila é alimentada pelo POST, uma exportação ativa por formato."""
+
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, True)
+        configuracao = override_settings(EXPORTACOES_ROOT=pasta)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.addCleanup(self.reiniciar_armazenamento)
+        self.reiniciar_armazenamento()
+
+        cache.clear()
+        self.consultoria = criar_consultoria()
+        criar_treino(self.consultoria, dias=1, exercicios_por_dia=1)
+        self.client.force_login(self.consultoria.usuario)
+
+    def reiniciar_armazenamento(self):
+        armazenamento._wrapped = empty
+
+    def solicitar(self, formato='pdf', **extra):
+        return self.client.post(reverse('dashboard:exportacao_solicitar', args=[formato]),
+                                HTTP_ACCEPT='application/json', **extra)
+
+    def test_get_sem_arquivo_pronto_nao_enfileira(self):
+        for nome in ('dashboard:consultoria_treino_pdf', 'dashboard:consultoria_treino_excel'):
+            resposta = self.client.get(reverse(nome))
+            self.assertRedirects(resposta, reverse('dashboard:consultoria_treino'), fetch_redirect_response=False)
+        self.assertFalse(ExportacaoTreino.objects.exists())
+
+    def test_get_com_arquivo_pronto_baixa(self):
+        plano = carregar_treino_atual(self.consultoria)
+        armazenamento.save(nome_exportacao(self.consultoria, plano, 'pdf'), ContentFile(b'%PDF'))
+        resposta = self.client.get(reverse('dashboard:consultoria_treino_pdf'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF')
+
+    def test_post_enfileira_uma_vez_por_formato(self):
+        primeira = self.solicitar()
+        self.assertEqual(primeira.status_code, 202)
+        self.assertEqual(self.solicitar().json()['id'], primeira.json()['id'])
+        self.assertEqual(ExportacaoTreino.objects.count(), 1)
+
+    def test_post_sem_javascript_volta_para_a_pagina(self):
+        resposta = self.client.post(reverse('dashboard:exportacao_solicitar', args=['excel']))
+        self.assertRedirects(resposta, reverse('dashboard:consultoria_treino'), fetch_redirect_response=False)
+        self.assertEqual(ExportacaoTreino.objects.get().formato, 'excel')
+
+    @override_settings(EXPORTACAO_MAX_POR_USUARIO=1)
+    def test_limite_de_exportacoes_em_andamento(self):
+        self.solicitar('pdf')
+        self.assertEqual(self.solicitar('excel').status_code, 429)
+
+    def test_banco_recusa_segunda_exportacao_ativa_do_mesmo_formato(self):
+        dados = {'usuario': self.consultoria.usuario, 'consultoria': self.consultoria, 'formato': 'pdf'}
+        ExportacaoTreino.objects.create(status='concluido', **dados)
+        ExportacaoTreino.objects.create(**dados)
+        with self.assertRaises(IntegrityError):
+            ExportacaoTreino.objects.create(status='processando', **dados)
+
+    def test_solicitacao_que_perde_a_corrida_devolve_a_concorrente(self):
+        # A outra requisição insere depois da nossa verificação e antes do nosso INSERT
+        concorrente = ExportacaoTreino.objects.create(
+            usuario=self.consultoria.usuario, consultoria=self.consultoria, formato='pdf'
+        )
+        primeira = QuerySet.first
+        verificacoes = []
+
+        def first(queryset):
+            verificacoes.append(queryset)
+            return None if len(verificacoes) == 1 else primeira(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=first):
+            exportacao = solicitar_exportacao(self.consultoria, 'pdf')
+        self.assertEqual(exportacao, concorrente)
+        self.assertEqual(ExportacaoTreino.objects.count(), 1)
+
+    def test_reprocessar_no_admin_respeita_a_exportacao_em_andamento(self):
+        dados = {'usuario': self.consultoria.usuario, 'consultoria': self.consultoria}
+        erro_pdf = [ExportacaoTreino.objects.create(status='erro', formato='pdf', **dados) for _ in range(2)]
+        erro_excel = ExportacaoTreino.objects.create(status='erro', formato='excel', **dados)
+        ExportacaoTreino.objects.create(formato='excel', **dados)
+
+        request = mock.Mock()
+        modelo_admin = ExportacaoTreinoAdmin(ExportacaoTreino, site)
+        with mock.patch.object(modelo_admin, 'message_user'):
+            modelo_admin.reprocessar(request, ExportacaoTreino.objects.filter(status='erro'))
+
+        self.assertEqual(ExportacaoTreino.objects.filter(formato='pdf', status='pendente').count(), 1)
+        self.assertEqual(ExportacaoTreino.objects.get(pk=erro_excel.pk).status, 'erro')
+        self.assertEqual(ExportacaoTreino.objects.filter(pk__in=[e.pk for e in erro_pdf], status='erro').count(), 1)
+
+    def salvar_no_admin(self, treino, titulo):
+        admin = User.objects.create_superuser(username=f'admin{User.objects.count()}', email='admin@a.com', password='x12345')
+        self.client.force_login(admin)
+        dias = list(treino.dias.order_by('ordem'))
+        dados = {
+            'consultoria': self.consultoria.id,
+            'titulo': titulo,
+            'status': 'atual',
+            'descricao': '',
+            'dias-TOTAL_FORMS': len(dias),
+            'dias-INITIAL_FORMS': len(dias),
+            'dias-MIN_NUM_FORMS': 0,
+            'dias-MAX_NUM_FORMS': 1000,
+        }
+        for indice, dia in enumerate(dias):
+            dados.update({
+                f'dias-{indice}-id': dia.id,
+                f'dias-{indice}-treino': treino.id,
+                f'dias-{indice}-nome': dia.nome,
+                f'dias-{indice}-descricao': dia.descricao,
+                f'dias-{indice}-ordem': dia.ordem,
+            })
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resposta = self.client.post(reverse('admin:accounts_treino_change', args=[treino.id]), dados)
+        self.assertEqual(resposta.status_code, 302)
+        return callbacks
+
+    def test_salvar_treino_no_admin_pregera_uma_vez_por_formato(self):
+        treino = self.consultoria.treinos.get()
+        callbacks = self.salvar_no_admin(treino, 'Força')
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            sorted(ExportacaoTreino.objects.filter(status='pendente').values_list('formato', flat=True)),
+            ['excel', 'pdf'],
+        )
+
+    def test_salvar_treino_sem_mudar_o_conteudo_nao_enfileira(self):
+        treino = self.consultoria.treinos.get()
+        plano = carregar_treino_atual(self.consultoria)
+        for formato in ('pdf', 'excel'):
+            armazenamento.save(nome_exportacao(self.consultoria, plano, formato), ContentFile(b'pronto'))
+
+        self.salvar_no_admin(treino, treino.titulo)
+        self.assertFalse(ExportacaoTreino.objects.exists())
+
+        # Com o título alterado o conteúdo muda e os dois formatos são gerados de novo
+        self.salvar_no_admin(treino, 'Força')
+        self.assertEqual(ExportacaoTreino.objects.count(), 2)
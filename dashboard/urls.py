@@ -7,6 +7,7 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('meus-produtos/', views.meus_produtos, name='meus_produtos'),
     path('produto/<slug:slug>/', views.produto_detalhes, name='produto_detalhes'),
+    path('conteudo/<int:conteudo_id>/<str:campo>/', views.conteudo_arquivo, name='conteudo_arquivo'),
     path('pedidos/', views.pedidos, name='pedidos'),
     path('perfil/', views.perfil, name='perfil'),
     
@@ -14,6 +15,9 @@ urlpatterns = [
     path('consultoria/treino/', views.consultoria_treino, name='consultoria_treino'),
     path('consultoria/treino/pdf/', views.consultoria_treino_pdf, name='consultoria_treino_pdf'),
     path('consultoria/treino/excel/', views.consultoria_treino_excel, name='consultoria_treino_excel'),
+    path('consultoria/treino/exportar/<str:formato>/', views.exportacao_solicitar, name='exportacao_solicitar'),
+    path('consultoria/exportacao/<int:exportacao_id>/', views.exportacao_status, name='exportacao_status'),
+    path('consultoria/exportacao/<int:exportacao_id>/baixar/', views.exportacao_baixar, name='exportacao_baixar'),
     path('consultoria/plano-alimentar/', views.consultoria_plano_alimentar, name='consultoria_plano_alimentar'),
     path('consultoria/medicacao/', views.consultoria_medicacao, name='consultoria_medicacao'),
 ]
@@ -1,26 +1,30 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.utils import timezone
-from produtos.models import AcessoProduto, Produto, Pedido
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from accounts.treinos import carregar_treino_atual
+from produtos.acessos import acessos_ativos, acessos_usuario, acesso_produto, tem_acesso
+from produtos.contadores import aplicar_contadores, registrar_visualizacao
+from produtos.models import ConteudoDigital, Pedido
+from .arquivos import responder_arquivo
+from .exportacao import (
+    FORMATOS, STATUS_ATIVOS, LimiteExportacoes, armazenamento, exportacao_pronta, solicitar_exportacao,
+)
+from .models import ExportacaoTreino
 
 
 @login_required
 def home(request):
     """Dashboard principal do cliente"""
-    # Produtos com acesso
-    acessos_qs = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto', 'produto__categoria')
-    acessos = acessos_qs.order_by('-liberado_em')
+    # Produtos com acesso (cache de acessos)
+    acessos = acessos_ativos(request.user)
     
     # Últimos pedidos (para exibir na tabela)
     pedidos = Pedido.objects.filter(usuario=request.user).order_by('-criado_em')[:5]
     # Contador de todos os pedidos do usuário
-    total_produtos = acessos_qs.count()
+    total_produtos = len(acessos)
     total_pedidos = Pedido.objects.filter(usuario=request.user).count()
     
     context = {
@@ -36,13 +40,12 @@ def home(request):
 @login_required
 def meus_produtos(request):
     """Lista todos os produtos do usuário"""
-    acessos = AcessoProduto.objects.filter(
-        usuario=request.user
-    ).select_related('produto', 'produto__categoria').order_by('-liberado_em')
+    # Contadores lidos à parte: visualizações não invalidam o cache de acessos
+    acessos = aplicar_contadores(acessos_usuario(request.user))
     
     context = {
         'acessos': acessos,
-        'user_produtos': acessos[:10],  # Para menu sidebar
+        'user_produtos': acessos_ativos(request.user)[:10],  # Para menu sidebar
     }
     return render(request, 'dashboard/meus_produtos.html', context)
 
@@ -50,33 +53,24 @@ def meus_produtos(request):
 @login_required
 def produto_detalhes(request, slug):
     """Visualizar conteúdo de um produto"""
-    produto = get_object_or_404(Produto, slug=slug)
-    
-    # Verificar se tem acesso
-    acesso = get_object_or_404(
-        AcessoProduto,
-        usuario=request.user,
-        produto=produto
-    )
-    
+    # Verificar se tem acesso (cache de acessos)
+    acesso = acesso_produto(request.user, slug)
+    if acesso is None:
+        raise Http404
+    produto = acesso.produto
+
     if not acesso.is_ativo:
         messages.error(request, 'Seu acesso a este produto expirou.')
         return redirect('dashboard:meus_produtos')
-    
-    # Atualizar último acesso e contador
-    from django.utils import timezone
-    acesso.ultimo_acesso = timezone.now()
-    acesso.total_acessos += 1
-    acesso.save()
-    
+
+    # Atualizar último acesso e contador (no cache; gravado por `gravar_contadores_acesso`)
+    registrar_visualizacao(acesso)
+
     # Pegar conteúdos
     conteudos = produto.conteudos.filter(liberado=True).order_by('ordem')
     
-    # Carregar produtos para sidebar
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    # Produtos para sidebar (cache de acessos)
+    user_produtos = acessos_ativos(request.user)[:10]
     
     context = {
         'produto': produto,
@@ -87,6 +81,25 @@ def produto_detalhes(request, slug):
     return render(request, 'dashboard/produto_conteudo.html', context)
 
 
+@login_required
+def conteudo_arquivo(request, conteudo_id, campo):
+    """Entrega o arquivo (ou imagem) de um conteúdo apenas para quem tem acesso ativo ao produto"""
+    if campo not in ('arquivo', 'imagem'):
+        raise Http404
+    conteudo = get_object_or_404(ConteudoDigital, id=conteudo_id, liberado=True)
+
+    if not tem_acesso(request.user, conteudo.produto_id):
+        return HttpResponseForbidden('Acesso não liberado para este conteúdo.')
+
+    arquivo = getattr(conteudo, campo)
+    if not arquivo:
+        raise Http404
+    try:
+        return responder_arquivo(request, arquivo, download=bool(request.GET.get('download')))
+    except FileNotFoundError:
+        raise Http404
+
+
 @login_required
 def pedidos(request):
     """Histórico de pedidos"""
@@ -94,11 +107,8 @@ def pedidos(request):
         usuario=request.user
     ).prefetch_related('itens').order_by('-criado_em')
     
-    # Carregar produtos para sidebar
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    # Produtos para sidebar (cache de acessos)
+    user_produtos = acessos_ativos(request.user)[:10]
     
     context = {
         'pedidos': pedidos_list,
@@ -110,14 +120,12 @@ def pedidos(request):
 @login_required
 def perfil(request):
     """Perfil do usuário"""
-    # Carregar produtos para sidebar
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    # Produtos para sidebar (cache de acessos)
+    user_produtos = acessos_ativos(request.user)[:10]
     
     context = {
         'user_produtos': user_produtos,
+        'total_produtos': len(acessos_usuario(request.user)),
     }
     return render(request, 'dashboard/perfil.html', context)
 
@@ -132,140 +140,147 @@ def consultoria_treino(request):
         return redirect('dashboard:home')
     
     consultoria = request.user.consultoria
-    treino_atual = consultoria.get_treino_atual()
+    treino_atual = carregar_treino_atual(consultoria)
+    
+    user_produtos = acessos_ativos(request.user)[:10]
     
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    # Exportações em andamento: a página continua acompanhando o status
+    exportacoes = [
+        _status_exportacao(exportacao)
+        for exportacao in ExportacaoTreino.objects.filter(usuario=request.user, status__in=STATUS_ATIVOS)
+    ]
     
     context = {
         'consultoria': consultoria,
         'treino_atual': treino_atual,
         'user_produtos': user_produtos,
+        'exportacoes': exportacoes,
     }
     return render(request, 'dashboard/consultoria/treino.html', context)
 
 
-@login_required
-def consultoria_treino_pdf(request):
-    """Exporta o treino atual em PDF"""
+def _exportar_treino(request, formato):
+    """
+    Entrega o treino atual no formato pedido se já estiver gerado; caso
+    contrário volta para a página do treino, onde o aluno solicita a
+    exportação (POST em `exportacao_solicitar`). GET nunca enfileira.
+    """
     if not request.user.tem_consultoria_online():
         messages.error(request, 'Você não tem acesso à consultoria online.')
         return redirect('dashboard:home')
 
     consultoria = request.user.consultoria
-    treino_atual = consultoria.get_treino_atual()
+    treino_atual = carregar_treino_atual(consultoria)
 
     if not treino_atual:
         messages.error(request, 'Nenhum treino atual para exportar.')
         return redirect('dashboard:consultoria_treino')
 
-    try:
-        from xhtml2pdf import pisa
-    except ImportError:
-        messages.error(request, 'Biblioteca de PDF nao instalada. Instale xhtml2pdf.')
-        return redirect('dashboard:consultoria_treino')
+    nome = exportacao_pronta(consultoria, treino_atual, formato)
+    if nome:
+        return _responder_exportacao(request, nome, formato)
+
+    messages.info(request, 'O arquivo ainda não foi gerado. Clique em exportar para gerá-lo.')
+    return redirect('dashboard:consultoria_treino')
 
-    html_string = render_to_string(
-        'dashboard/consultoria/treino_export_pdf.html',
-        {
-            'consultoria': consultoria,
-            'treino_atual': treino_atual,
-            'usuario': request.user,
-            'gerado_em': timezone.now(),
-        }
+
+def _responder_exportacao(request, nome, formato):
+    _, extensao, tipo_conteudo = FORMATOS[formato]
+    return FileResponse(
+        armazenamento.open(nome, 'rb'),
+        as_attachment=True,
+        filename=f"treino_{request.user.username}.{extensao}",
+        content_type=tipo_conteudo,
     )
 
-    filename = f"treino_{request.user.username}.pdf"
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    pisa_status = pisa.CreatePDF(html_string, dest=response, encoding='utf-8')
-    if pisa_status.err:
-        messages.error(request, 'Nao foi possivel gerar o PDF.')
-        return redirect('dashboard:consultoria_treino')
-    return response
+
+def _status_exportacao(exportacao):
+    dados = {
+        'id': exportacao.id,
+        'formato': exportacao.formato,
+        'status': exportacao.status,
+        'url_status': reverse('dashboard:exportacao_status', args=[exportacao.id]),
+    }
+    if exportacao.status == 'concluido':
+        dados['url'] = reverse('dashboard:exportacao_baixar', args=[exportacao.id])
+    elif exportacao.status == 'erro':
+        dados['erro'] = 'Não foi possível gerar o arquivo. Tente novamente mais tarde.'
+    return dados
+
+
+@login_required
+def consultoria_treino_pdf(request):
+    """Exporta o treino atual em PDF"""
+    return _exportar_treino(request, 'pdf')
 
 
 @login_required
 def consultoria_treino_excel(request):
     """Exporta o treino atual em Excel"""
-    if not request.user.tem_consultoria_online():
-        messages.error(request, 'Você não tem acesso à consultoria online.')
-        return redirect('dashboard:home')
+    return _exportar_treino(request, 'excel')
 
-    consultoria = request.user.consultoria
-    treino_atual = consultoria.get_treino_atual()
 
+@login_required
+@require_POST
+def exportacao_solicitar(request, formato):
+    """
+    Enfileira a exportação do treino. A página do treino chama via fetch e
+    recebe o status em JSON; sem JavaScript, o formulário volta para a página
+    (ou já baixa o arquivo, se estiver pronto).
+    """
+    if formato not in FORMATOS or not request.user.tem_consultoria_online():
+        raise Http404
+    quer_json = 'application/json' in request.headers.get('Accept', '')
+
+    consultoria = request.user.consultoria
+    treino_atual = carregar_treino_atual(consultoria)
     if not treino_atual:
-        messages.error(request, 'Nenhum treino atual para exportar.')
-        return redirect('dashboard:consultoria_treino')
+        if not quer_json:
+            messages.error(request, 'Nenhum treino atual para exportar.')
+            return redirect('dashboard:consultoria_treino')
+        return JsonResponse({'erro': 'Nenhum treino atual para exportar.'}, status=404)
+
+    if exportacao_pronta(consultoria, treino_atual, formato):
+        if not quer_json:
+            return redirect(f'dashboard:consultoria_treino_{formato}')
+        return JsonResponse({
+            'formato': formato,
+            'status': 'concluido',
+            'url': reverse(f'dashboard:consultoria_treino_{formato}'),
+        })
 
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Alignment, Font, PatternFill
-    except ImportError:
-        messages.error(request, 'Biblioteca de Excel nao instalada. Instale openpyxl.')
+        exportacao = solicitar_exportacao(consultoria, formato)
+    except LimiteExportacoes as e:
+        if not quer_json:
+            messages.warning(request, str(e))
+            return redirect('dashboard:consultoria_treino')
+        return JsonResponse({'erro': str(e)}, status=429)
+
+    if not quer_json:
+        messages.info(request, 'Seu arquivo está sendo gerado. O link aparece aqui assim que ficar pronto.')
         return redirect('dashboard:consultoria_treino')
+    return JsonResponse(_status_exportacao(exportacao), status=202)
+
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Treino Atual'
-
-    brand_font = Font(bold=True, size=14)
-    header_font = Font(bold=True, size=12)
-    muted_fill = PatternFill('solid', fgColor='EEF2F6')
-
-    ws.merge_cells('A1:F1')
-    ws['A1'] = 'PersonalTrainer'
-    ws['A1'].font = brand_font
-    ws['A1'].alignment = Alignment(horizontal='left')
-
-    ws['A3'] = 'Aluno:'
-    ws['B3'] = request.user.get_full_name() or request.user.username
-    ws['A4'] = 'Treino:'
-    ws['B4'] = treino_atual.titulo
-    ws['A5'] = 'Gerado em:'
-    ws['B5'] = timezone.now().strftime('%d/%m/%Y %H:%M')
-
-    row = 7
-    for dia in treino_atual.dias.all():
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-        ws.cell(row=row, column=1, value=dia.nome).font = header_font
-        ws.cell(row=row, column=1).fill = muted_fill
-        row += 1
-
-        ws.cell(row=row, column=1, value='Exercicio').font = header_font
-        ws.cell(row=row, column=2, value='Series').font = header_font
-        ws.cell(row=row, column=3, value='Repeticoes').font = header_font
-        ws.cell(row=row, column=4, value='Carga').font = header_font
-        ws.cell(row=row, column=5, value='Descanso').font = header_font
-        ws.cell(row=row, column=6, value='Obs').font = header_font
-        ws.cell(row=row, column=7, value='Video').font = header_font
-        row += 1
-
-        for item in dia.exercicios.all():
-            ws.cell(row=row, column=1, value=item.exercicio.nome)
-            ws.cell(row=row, column=2, value=item.series)
-            ws.cell(row=row, column=3, value=item.repeticoes)
-            ws.cell(row=row, column=4, value=item.carga or '')
-            ws.cell(row=row, column=5, value=item.descanso or '')
-            ws.cell(row=row, column=6, value=item.observacao_especifica or '')
-            ws.cell(row=row, column=7, value=item.exercicio.link_video or '')
-            row += 1
-
-        row += 1
-
-    for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-        ws.column_dimensions[col].width = 22
-
-    filename = f"treino_{request.user.username}.xlsx"
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+@login_required
+def exportacao_status(request, exportacao_id):
+    """Status de uma exportação do próprio usuário (consultado periodicamente pela página)"""
+    exportacao = get_object_or_404(ExportacaoTreino, id=exportacao_id, usuario=request.user)
+    return JsonResponse(_status_exportacao(exportacao))
+
+
+@login_required
+def exportacao_baixar(request, exportacao_id):
+    """Download do arquivo de uma exportação concluída do próprio usuário"""
+    exportacao = get_object_or_404(
+        ExportacaoTreino, id=exportacao_id, usuario=request.user, status='concluido'
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    wb.save(response)
-    return response
+    if not armazenamento.exists(exportacao.arquivo):
+        # O treino mudou depois da exportação: a versão antiga foi descartada
+        messages.info(request, 'O treino foi atualizado. Exporte novamente para baixar a versão atual.')
+        return redirect('dashboard:consultoria_treino')
+    return _responder_exportacao(request, exportacao.arquivo, exportacao.formato)
 
 
 @login_required
@@ -276,10 +291,7 @@ def consultoria_plano_alimentar(request):
         return redirect('dashboard:home')
     
     consultoria = request.user.consultoria
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    user_produtos = acessos_ativos(request.user)[:10]
     
     context = {
         'consultoria': consultoria,
@@ -296,10 +308,7 @@ def consultoria_medicacao(request):
         return redirect('dashboard:home')
     
     consultoria = request.user.consultoria
-    user_produtos = AcessoProduto.objects.filter(
-        usuario=request.user,
-        ativo=True
-    ).select_related('produto')[:10]
+    user_produtos = acessos_ativos(request.user)[:10]
     
     context = {
         'consultoria': consultoria,
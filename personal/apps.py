@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PersonalConfig(AppConfig):
+    name = 'personal'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configurar_conexao
+        connection_created.connect(configurar_conexao, dispatch_uid='personal_configurar_conexao')
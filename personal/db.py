@@ -0,0 +1,21 @@
+"""
+Ajustes de conexão com o banco
+
+No SQLite, cada nova conexão recebe os PRAGMAs de settings.SQLITE_PRAGMAS
+(WAL, synchronous=NORMAL, busy_timeout, mmap_size): leitores não bloqueiam o
+escritor e escritas concorrentes (webhook, contadores) esperam em vez de
+falhar com "database is locked".
+"""
+from django.conf import settings
+
+
+def configurar_conexao(sender, connection, **kwargs):
+    """Receptor de `connection_created`: aplica os PRAGMAs nas conexões SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
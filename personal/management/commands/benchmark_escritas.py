@@ -0,0 +1,177 @@
+"""
+Benchmark de escritas concorrentes: SQLite (WAL) x PostgreSQL
+
+Para cada banco, cria um banco temporário (SQLite: arquivo com os mesmos
+PRAGMAs de settings.SQLITE_PRAGMAS; PostgreSQL: banco de teste criado com as
+variáveis DB_*), aplica as migrações e dispara escritores simultâneos. Cada
+escrita é uma transação curta como a do checkout/webhook: cria um pedido e
+incrementa `total_vendas` do mesmo produto (linha disputada por todos).
+
+Mede escritas por segundo, latência (p50/p95/máx) e erros de lock. O
+PostgreSQL só entra se o psycopg estiver instalado e o servidor aceitar a
+conexão (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT); caso contrário é
+informado e ignorado. O banco configurado não é tocado.
+
+Uso:
+    python manage.py benchmark_escritas
+    python manage.py benchmark_escritas --escritores=16 --escritas=200
+    python manage.py benchmark_escritas --bancos sqlite
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, OperationalError, connections, transaction
+from django.db.models import F
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from produtos.models import Categoria, Pedido, Produto
+
+User = get_user_model()
+
+
+def _percentil(tempos, fracao):
+    if not tempos:
+        return 0.0
+    ordenados = sorted(tempos)
+    return ordenados[min(int(len(ordenados) * fracao), len(ordenados) - 1)] * 1000
+
+
+def _configuracao_postgres(original):
+    configuracao = dict(original)
+    configuracao.update({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'personal'),
+        'USER': os.environ.get('DB_USER', 'personal'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    })
+    return configuracao
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão de escritas concorrentes no SQLite (WAL) e no PostgreSQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escritores',
+            type=int,
+            default=8,
+            help='Escritores simultâneos (padrão: 8)'
+        )
+        parser.add_argument(
+            '--escritas',
+            type=int,
+            default=100,
+            help='Transações por escritor (padrão: 100)'
+        )
+        parser.add_argument(
+            '--bancos',
+            nargs='+',
+            choices=['sqlite', 'postgres'],
+            default=['sqlite', 'postgres'],
+            help='Bancos comparados (padrão: sqlite postgres)'
+        )
+
+    def handle(self, *args, **options):
+        configuracao = connections.settings['default']
+        original = dict(configuracao)
+        pasta = tempfile.mkdtemp(prefix='benchmark_escritas_')
+        try:
+            for banco in options['bancos']:
+                self._trocar_conexao(configuracao, original if banco == 'sqlite' else _configuracao_postgres(original))
+                if banco == 'sqlite':
+                    configuracao['NAME'] = os.path.join(pasta, 'benchmark.sqlite3')
+                    self.stdout.write('\n🛠️  Criando banco SQLite temporário...')
+                    call_command('migrate', verbosity=0, interactive=False)
+                    self._executar('SQLite (WAL)', options['escritores'], options['escritas'])
+                    continue
+
+                self.stdout.write('\n🛠️  Criando banco PostgreSQL temporário...')
+                nome_original = configuracao['NAME']
+                try:
+                    connections['default'].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                except (ImproperlyConfigured, DatabaseError) as e:
+                    self.stdout.write(self.style.WARNING(f'   ⚠️  PostgreSQL indisponível, ignorado: {e}'))
+                    continue
+                try:
+                    self._executar('PostgreSQL', options['escritores'], options['escritas'])
+                finally:
+                    connections.close_all()
+                    connections['default'].creation.destroy_test_db(nome_original, verbosity=0)
+        finally:
+            self._trocar_conexao(configuracao, original)
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    def _trocar_conexao(self, configuracao, nova):
+        # A conexão desta thread guarda a classe do backend: descarta para recriar
+        connections.close_all()
+        configuracao.clear()
+        configuracao.update(nova)
+        try:
+            del connections['default']
+        except AttributeError:
+            # Ainda não aberta nesta thread
+            pass
+
+    def _executar(self, titulo, escritores, escritas):
+        categoria = Categoria.objects.create(nome='Benchmark', slug='benchmark')
+        produto = Produto.objects.create(nome='Benchmark', slug='benchmark', categoria=categoria, preco='1.00')
+        usuarios = [
+            User.objects.create_user(username=f'escritor{indice}@benchmark', email=f'escritor{indice}@benchmark')
+            for indice in range(escritores)
+        ]
+
+        tempos = []
+        erros = []
+        lock = threading.Lock()
+        largada = threading.Barrier(escritores)
+
+        def escritor(usuario):
+            medidos = []
+            try:
+                largada.wait()
+                for _ in range(escritas):
+                    inicio = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            Pedido.objects.create(
+                                usuario=usuario, nome_compra='Benchmark', email_compra=usuario.email,
+                                subtotal=Decimal('1.00'), total=Decimal('1.00'),
+                            )
+                            Produto.objects.filter(id=produto.id).update(total_vendas=F('total_vendas') + 1)
+                    except OperationalError as e:
+                        with lock:
+                            erros.append(str(e))
+                        continue
+                    medidos.append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+            with lock:
+                tempos.extend(medidos)
+
+        threads = [threading.Thread(target=escritor, args=(usuario,)) for usuario in usuarios]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        gravadas = Produto.objects.values_list('total_vendas', flat=True).get(id=produto.id)
+        self.stdout.write(f'📊 {titulo}')
+        self.stdout.write(f'   ✍️  {len(tempos)} escritas de {escritores} escritores em {duracao:.2f}s '
+                          f'({len(tempos) / duracao:.0f}/s)')
+        self.stdout.write(f'   ⏱️  Transação: p50 {_percentil(tempos, 0.5):.2f}ms, '
+                          f'p95 {_percentil(tempos, 0.95):.2f}ms, máx {_percentil(tempos, 1):.2f}ms')
+        self.stdout.write(f'   🔢 Gravado no banco: {gravadas} de {escritores * escritas}')
+        if erros:
+            self.stdout.write(self.style.WARNING(f'   ⚠️  {len(erros)} erro(s) de lock: {erros[0]}'))
@@ -0,0 +1,38 @@
+"""
+Paginação do admin para tabelas grandes
+
+Em listas sem filtro, o PostgreSQL informa uma estimativa do total de linhas
+(pg_class.reltuples, atualizada pelo autovacuum) sem percorrer a tabela; o
+COUNT(*) exato só é feito quando a estimativa é pequena ou há filtros/busca.
+Nos demais bancos o comportamento é o do Paginator padrão.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def contagem_estimada(queryset):
+    """Estimativa de linhas da tabela do queryset, ou None se não disponível."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        linha = cursor.fetchone()
+    return linha[0] if linha and linha[0] > 0 else None
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator que usa a contagem estimada em tabelas grandes sem filtro."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimativa = contagem_estimada(self.object_list)
+            if estimativa is not None and estimativa >= getattr(settings, 'ADMIN_CONTAGEM_ESTIMADA_MINIMO', 10000):
+                return estimativa
+        return super().count
@@ -79,6 +79,7 @@ INSTALLED_APPS = [
     'dashboard',
     'carrinho',
     'checkout',
+    'personal',
 ]
 
 MIDDLEWARE = [
@@ -116,14 +117,91 @@ WSGI_APPLICATION = 'personal.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 # SQLite em todos os ambientes (dev e prod)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE: 'sqlite' (padrão) ou 'postgres' (requer psycopg e as variáveis DB_*)
+# Em produção as conexões são persistentes (CONN_MAX_AGE) com verificação de saúde.
+# Sem pool de conexões: o Django fixado em requirements.txt (5.0) não tem OPTIONS['pool'];
+# a conexão persistente de cada processo/thread do servidor faz esse papel.
+# Compare a vazão de escritas dos dois bancos com `python manage.py benchmark_escritas`.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60 if IS_PRODUCTION else 0))
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'personal'),
+            'USER': os.environ.get('DB_USER', 'personal'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# PRAGMAs aplicados a cada nova conexão SQLite (personal/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 20000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
 }
 
 
+# Cache (catálogo de produtos - ver produtos/cache.py)
+# CACHE_BACKEND: 'locmem' (um processo), 'file' (compartilhado entre processos,
+# padrão em produção) ou 'redis' (requer o pacote redis e REDIS_URL)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file' if IS_PRODUCTION else 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+CATALOGO_CACHE_TIMEOUT = int(os.environ.get('CATALOGO_CACHE_TIMEOUT', 60 * 60 * 24))
+ACESSOS_CACHE_TIMEOUT = int(os.environ.get('ACESSOS_CACHE_TIMEOUT', 60 * 60))  # acessos de cada usuário (produtos/acessos.py)
+# Contadores de visualização acumulados e gravados por `gravar_contadores_acesso` (produtos/contadores.py):
+# 'arquivo' (padrão com o cache em arquivo), 'cache' (exige incr/add atômicos: CACHE_BACKEND=redis)
+# ou 'banco' (um UPDATE por visualização)
+CONTADORES_ACESSO = os.environ.get('CONTADORES_ACESSO', {'redis': 'cache', 'file': 'arquivo'}.get(CACHE_BACKEND, 'banco'))
+CONTADORES_ACESSO_PASTA = os.environ.get('CONTADORES_ACESSO_PASTA', str(BASE_DIR / '.contadores'))
+CONTADORES_LACUNA_TIMEOUT = int(os.environ.get('CONTADORES_LACUNA_TIMEOUT', 300))  # posição reservada sem marcador
+
+# Sessões (carrinho, cupom, login)
+# SESSION_BACKEND: 'cached_db' (leitura pelo cache, gravação no banco - padrão),
+# 'cache' (só cache; use com CACHE_BACKEND=redis para não perder sessões) ou 'db'
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}.get(SESSION_BACKEND, 'django.contrib.sessions.backends.cached_db')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -172,6 +250,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Arquivos dos conteúdos digitais: ficam em MIDIA_PROTEGIDA_ROOT, fora de MEDIA_ROOT e sem
+# URL pública (produtos/armazenamento.py). Após verificar o acesso (dashboard/arquivos.py),
+# a transferência é delegada ao servidor web. '' = Django serve com suporte a Range;
+# 'nginx' = X-Accel-Redirect (location internal em MIDIA_PROTEGIDA_PREFIXO -> MIDIA_PROTEGIDA_ROOT);
+# 'apache' = X-Sendfile (mod_xsendfile)
+MIDIA_PROTEGIDA_ROOT = os.environ.get('MIDIA_PROTEGIDA_ROOT', str(BASE_DIR / 'midia_protegida'))
+MIDIA_PROTEGIDA_SERVIDOR = os.environ.get('MIDIA_PROTEGIDA_SERVIDOR', '')
+MIDIA_PROTEGIDA_PREFIXO = os.environ.get('MIDIA_PROTEGIDA_PREFIXO', '/midia-protegida/')
+
+# Exportações de treino (PDF/Excel) em cache - fora de MEDIA_ROOT, sem URL pública (dashboard/exportacao.py)
+EXPORTACOES_ROOT = os.environ.get('EXPORTACOES_ROOT', str(BASE_DIR / 'exportacoes'))
+EXPORTACAO_MAX_POR_USUARIO = int(os.environ.get('EXPORTACAO_MAX_POR_USUARIO', 2))  # exportações em andamento por aluno
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
@@ -246,6 +337,18 @@ MERCADOPAGO_BASE_URL = get_dynamic_base_url()
 MERCADOPAGO_PAYER_EMAIL_OVERRIDE = ''  # Deixe vazio para usar email do usuário logado
 MERCADOPAGO_STATEMENT_DESCRIPTOR = 'EVOLUTYAPP'  # Aparece na fatura do cartão (max 13 chars alfanum)
 
+# Cliente HTTP do gateway (checkout/gateway.py) - uma sessão keep-alive por processo
+MERCADOPAGO_API_URL = os.environ.get('MERCADOPAGO_API_URL', 'https://api.mercadopago.com')  # aponte para um stub local em testes
+MERCADOPAGO_TIMEOUT_CONEXAO = float(os.environ.get('MERCADOPAGO_TIMEOUT_CONEXAO', 3.05))
+MERCADOPAGO_TIMEOUT_LEITURA = float(os.environ.get('MERCADOPAGO_TIMEOUT_LEITURA', 10))
+MERCADOPAGO_POOL_CONEXOES = int(os.environ.get('MERCADOPAGO_POOL_CONEXOES', 10))
+MERCADOPAGO_MAX_RETENTATIVAS = 2  # apenas GET/PUT, em respostas 429/5xx
+MERCADOPAGO_CIRCUITO_FALHAS = 5  # falhas seguidas que abrem o circuito
+MERCADOPAGO_CIRCUITO_REABERTURA = 30  # segundos até testar o gateway novamente
+MERCADOPAGO_RECONCILIACAO_THREADS = 4  # consultas simultâneas em reconciliar_pagamentos
+MERCADOPAGO_RECONCILIACAO_TAXA = 5  # consultas por segundo em reconciliar_pagamentos
+PEDIDO_ABANDONADO_HORAS = 72  # pedidos pendentes sem alteração há mais tempo são cancelados (limpar_pedidos_abandonados)
+
 # =============================================================================
 # EMAIL
 # =============================================================================
@@ -0,0 +1,144 @@
+from pathlib import Path
+from unittest import mock
+import os
+import runpy
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .db import configurar_conexao
+from .paginacao import PaginadorEstimado
+
+ARQUIVO_SETTINGS = Path(__file__).resolve().parent / 'settings.py'
+
+
+class ChangelistMixin:
+    """Compara as consultas de um changelist do admin com poucas e com muitas linhas."""
+
+    def setUp(self):
+        super().setUp()
+        admin = get_user_model().objects.create_superuser(username='admin', email='admin@a.com', password='x12345')
+        self.client.force_login(admin)
+
+    def consultas_changelist(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def assertChangelistConstante(self, modelo, criar, poucas=2, muitas=20):
+        """`criar(n)` acrescenta n linhas exibidas no changelist de `modelo`."""
+        url = reverse(f'admin:{modelo._meta.app_label}_{modelo._meta.model_name}_changelist')
+        criar(poucas)
+        self.client.get(url)
+        esperado = self.consultas_changelist(url)
+        criar(muitas - poucas)
+        with self.assertNumQueries(esperado):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+
+
+def carregar_settings(**ambiente):
+    """Executa settings.py com as variáveis de ambiente informadas."""
+    with mock.patch.dict(os.environ, ambiente):
+        return runpy.run_path(str(ARQUIVO_SETTINGS))
+
+
+class PerfilBancoTestCase(SimpleTestCase):
+    """Perfil do banco escolhido pelo ambiente (DB_ENGINE, DB_CONN_MAX_AGE)."""
+
+    def test_sqlite_por_padrao(self):
+        configuracao = carregar_settings(DB_ENGINE='sqlite', DJANGO_ENV='development')
+        banco = configuracao['DATABASES']['default']
+        self.assertEqual(banco['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(banco['CONN_MAX_AGE'], 0)
+        self.assertTrue(banco['CONN_HEALTH_CHECKS'])
+
+    def test_postgres_pelas_variaveis_db(self):
+        configuracao = carregar_settings(
+            DB_ENGINE='postgres', DB_NAME='loja', DB_USER='loja', DB_HOST='db', DB_PORT='6432',
+            DJANGO_ENV='production',
+        )
+        banco = configuracao['DATABASES']['default']
+        self.assertEqual(banco['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((banco['NAME'], banco['HOST'], banco['PORT']), ('loja', 'db', '6432'))
+        self.assertEqual(banco['CONN_MAX_AGE'], 60)
+
+    def test_conexoes_persistentes_configuraveis(self):
+        configuracao = carregar_settings(DB_ENGINE='sqlite', DB_CONN_MAX_AGE='300')
+        self.assertEqual(configuracao['DATABASES']['default']['CONN_MAX_AGE'], 300)
+
+
+class PragmasSqliteTestCase(SimpleTestCase):
+    """PRAGMAs aplicados em cada nova conexão SQLite (receptor de connection_created)."""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Apenas SQLite')
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.caminho = os.path.join(pasta.name, 'pragmas.sqlite3')
+
+    def nova_conexao(self):
+        padrao = connections['default']
+        conexao = padrao.__class__({**padrao.settings_dict, 'NAME': self.caminho}, alias='pragmas')
+        self.addCleanup(conexao.close)
+        conexao.ensure_connection()
+        return conexao
+
+    def pragma(self, conexao, nome):
+        with conexao.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    def test_nova_conexao_recebe_os_pragmas(self):
+        conexao = self.nova_conexao()
+        self.assertEqual(self.pragma(conexao, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(conexao, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(conexao, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(conexao, 'mmap_size'), 128 * 1024 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_pragmas_vem_das_settings(self):
+        conexao = self.nova_conexao()
+        self.assertEqual(self.pragma(conexao, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(conexao, 'journal_mode'), 'delete')
+
+    def test_outros_bancos_sao_ignorados(self):
+        conexao = mock.Mock(vendor='postgresql')
+        configurar_conexao(sender=None, connection=conexao)
+        conexao.cursor.assert_not_called()
+
+
+class PaginadorEstimadoTestCase(TestCase):
+    """Contagem estimada só no PostgreSQL, em listas sem filtro."""
+
+    def setUp(self):
+        User = get_user_model()
+        for indice in range(3):
+            User.objects.create_user(username=f'u{indice}', password='x12345')
+        self.usuarios = User.objects.order_by('id')
+
+    @override_settings(ADMIN_CONTAGEM_ESTIMADA_MINIMO=100)
+    def test_usa_estimativa_em_tabela_grande_sem_filtro(self):
+        with mock.patch('personal.paginacao.contagem_estimada', return_value=50000) as estimativa:
+            self.assertEqual(PaginadorEstimado(self.usuarios, 100).count, 50000)
+        estimativa.assert_called_once()
+
+    @override_settings(ADMIN_CONTAGEM_ESTIMADA_MINIMO=100)
+    def test_conta_de_verdade_com_filtro_ou_estimativa_pequena(self):
+        with mock.patch('personal.paginacao.contagem_estimada', return_value=50000) as estimativa:
+            self.assertEqual(PaginadorEstimado(self.usuarios.filter(username='u1'), 100).count, 1)
+        estimativa.assert_not_called()
+        with mock.patch('personal.paginacao.contagem_estimada', return_value=10):
+            self.assertEqual(PaginadorEstimado(self.usuarios, 100).count, 3)
+
+    def test_outros_bancos_contam_normalmente(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('Apenas bancos sem estimativa')
+        with self.assertNumQueries(1):
+            self.assertEqual(PaginadorEstimado(self.usuarios, 100).count, 3)
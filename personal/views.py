@@ -1,16 +1,11 @@
 from django.shortcuts import render
-from produtos.models import Produto, Categoria
+from produtos.cache import produtos_publicados, categorias_ativas
 
 
 def sales_view(request):
     """View da página inicial com produtos reais para acesso direto"""
-    produtos = (
-        Produto.objects
-        .filter(status='publicado')
-        .select_related('categoria')
-        .order_by('-destaque', 'ordem', '-criado_em')
-    )
-    categorias = Categoria.objects.filter(ativo=True)
+    produtos = produtos_publicados()
+    categorias = categorias_ativas()
 
     context = {
         'produtos': produtos,
@@ -0,0 +1,211 @@
+"""
+Acessos aos produtos comprados
+
+Liberação: trabalha com vários pedidos de uma vez. Uma consulta para os itens,
+uma para os acessos já existentes, um `bulk_create` para os novos e um UPDATE
+atômico de `total_vendas` por grupo de produtos. Aprovar 500 pedidos no admin
+custa um punhado de queries em vez de milhares. `revogar_acessos` faz o
+caminho inverso no cancelamento/reembolso de pedidos aprovados; uma nova
+aprovação reativa os acessos desativados.
+
+Consulta: os acessos de cada usuário (com produto, categoria e expiração)
+ficam no cache e são compartilhados pelo dashboard e pelas verificações de
+acesso. A chave leva uma versão por usuário, trocada quando um AcessoProduto
+dele é criado, alterado ou removido (signals.py, `liberar_acessos` e
+`revogar_acessos`): uma leitura que começou antes da troca grava na versão
+antiga e não volta a ser lida. Alterações no catálogo não invalidam os
+acessos de todos os usuários; nome e imagem do produto no dashboard se
+atualizam em até ACESSOS_CACHE_TIMEOUT.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+import time
+
+from .models import AcessoProduto, ItemPedido, Produto
+
+
+def _timeout():
+    return getattr(settings, 'ACESSOS_CACHE_TIMEOUT', 60 * 60)
+
+
+def _chave_versao(usuario_id):
+    return f'acessos:versao:{usuario_id}'
+
+
+def _versao_acessos(usuario_id):
+    """Versão atual dos acessos do usuário (criada na primeira leitura)."""
+    chave = _chave_versao(usuario_id)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, time.time_ns(), _timeout())
+        versao = cache.get(chave)
+    return versao
+
+
+def acessos_usuario(usuario):
+    """Todos os acessos do usuário (inclusive inativos), mais recentes primeiro."""
+    chave = f'acessos:{usuario.pk}:{_versao_acessos(usuario.pk)}'
+    acessos = cache.get(chave)
+    if acessos is None:
+        acessos = list(
+            AcessoProduto.objects.filter(usuario_id=usuario.pk)
+            .select_related('produto', 'produto__categoria')
+            .order_by('-liberado_em')
+        )
+        cache.set(chave, acessos, _timeout())
+    return acessos
+
+
+def acessos_ativos(usuario):
+    """Acessos ativos e não expirados do usuário."""
+    return [acesso for acesso in acessos_usuario(usuario) if acesso.is_ativo]
+
+
+def acesso_produto(usuario, slug):
+    """Acesso do usuário ao produto (mesmo inativo ou expirado), ou None."""
+    for acesso in acessos_usuario(usuario):
+        if acesso.produto.slug == slug:
+            return acesso
+    return None
+
+
+def tem_acesso(usuario, produto):
+    """True se o usuário tem acesso ativo e não expirado ao produto."""
+    if not usuario.is_authenticated:
+        return False
+    produto_id = getattr(produto, 'pk', produto)
+    return any(acesso.produto_id == produto_id for acesso in acessos_ativos(usuario))
+
+
+def invalidar_acessos(*usuario_ids):
+    """Troca a versão dos acessos dos usuários (após o commit da transação atual)."""
+    chaves = [_chave_versao(usuario_id) for usuario_id in usuario_ids]
+    if chaves:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(chaves, time.time_ns()), _timeout()))
+
+
+def liberar_acessos(pedidos):
+    """
+    Libera o acesso aos produtos dos pedidos informados (instâncias ou ids)
+    e contabiliza as vendas. Retorna a quantidade de acessos criados ou
+    reativados.
+
+    Deve ser chamado uma única vez por pedido, na transição para 'aprovado'.
+    """
+    pedido_ids = [getattr(pedido, 'pk', pedido) for pedido in pedidos]
+    if not pedido_ids:
+        return 0
+
+    itens = ItemPedido.objects.filter(pedido_id__in=pedido_ids).values_list(
+        'pedido__usuario_id', 'produto_id', 'quantidade'
+    )
+
+    pares = set()
+    vendas = defaultdict(int)
+    for usuario_id, produto_id, quantidade in itens:
+        pares.add((usuario_id, produto_id))
+        vendas[produto_id] += quantidade
+    if not pares:
+        return 0
+
+    with transaction.atomic():
+        existentes = {}
+        for acesso_id, usuario_id, produto_id, ativo in AcessoProduto.objects.filter(
+            usuario_id__in={usuario_id for usuario_id, _ in pares},
+            produto_id__in={produto_id for _, produto_id in pares},
+        ).values_list('id', 'usuario_id', 'produto_id', 'ativo'):
+            existentes[(usuario_id, produto_id)] = (acesso_id, ativo)
+        novos = [
+            AcessoProduto(usuario_id=usuario_id, produto_id=produto_id)
+            for usuario_id, produto_id in pares - existentes.keys()
+        ]
+        AcessoProduto.objects.bulk_create(novos, ignore_conflicts=True)
+
+        # Acessos desativados por um cancelamento anterior (revogar_acessos) voltam
+        # como um acesso novo: ativos e vitalícios
+        reativados = [
+            (acesso_id, usuario_id)
+            for (usuario_id, produto_id), (acesso_id, ativo) in existentes.items()
+            if not ativo and (usuario_id, produto_id) in pares
+        ]
+        AcessoProduto.objects.filter(id__in=[acesso_id for acesso_id, _ in reativados]).update(
+            ativo=True, expira_em=None
+        )
+
+        # Um UPDATE por quantidade distinta (normalmente um só)
+        por_quantidade = defaultdict(list)
+        for produto_id, quantidade in vendas.items():
+            por_quantidade[quantidade].append(produto_id)
+        for quantidade, produto_ids in por_quantidade.items():
+            Produto.objects.filter(id__in=produto_ids).update(
+                total_vendas=F('total_vendas') + quantidade
+            )
+
+        # bulk_create e update() não disparam post_save
+        invalidar_acessos(
+            *{acesso.usuario_id for acesso in novos} | {usuario_id for _, usuario_id in reativados}
+        )
+
+    return len(novos) + len(reativados)
+
+
+def revogar_acessos(pedidos):
+    """
+    Desfaz `liberar_acessos` para pedidos aprovados que foram cancelados ou
+    reembolsados: desativa os acessos e desconta as vendas. Retorna a
+    quantidade de acessos desativados.
+
+    O acesso continua ativo se o usuário tem outro pedido aprovado com o mesmo
+    produto. Deve ser chamado uma única vez por pedido, na saída de 'aprovado'.
+    """
+    pedido_ids = [getattr(pedido, 'pk', pedido) for pedido in pedidos]
+    if not pedido_ids:
+        return 0
+
+    itens = ItemPedido.objects.filter(pedido_id__in=pedido_ids).values_list(
+        'pedido__usuario_id', 'produto_id', 'quantidade'
+    )
+
+    pares = set()
+    vendas = defaultdict(int)
+    for usuario_id, produto_id, quantidade in itens:
+        pares.add((usuario_id, produto_id))
+        vendas[produto_id] += quantidade
+    if not pares:
+        return 0
+
+    usuario_ids = {usuario_id for usuario_id, _ in pares}
+    produto_ids = {produto_id for _, produto_id in pares}
+    with transaction.atomic():
+        mantidos = set(
+            ItemPedido.objects.filter(
+                pedido__status='aprovado',
+                pedido__usuario_id__in=usuario_ids,
+                produto_id__in=produto_ids,
+            ).exclude(pedido_id__in=pedido_ids).values_list('pedido__usuario_id', 'produto_id')
+        )
+        revogar = pares - mantidos
+        revogados = [
+            (acesso_id, usuario_id)
+            for acesso_id, usuario_id, produto_id in AcessoProduto.objects.filter(
+                usuario_id__in=usuario_ids, produto_id__in=produto_ids, ativo=True,
+            ).values_list('id', 'usuario_id', 'produto_id')
+            if (usuario_id, produto_id) in revogar
+        ]
+        AcessoProduto.objects.filter(id__in=[acesso_id for acesso_id, _ in revogados]).update(ativo=False)
+
+        por_quantidade = defaultdict(list)
+        for produto_id, quantidade in vendas.items():
+            por_quantidade[quantidade].append(produto_id)
+        for quantidade, produto_ids_grupo in por_quantidade.items():
+            Produto.objects.filter(id__in=produto_ids_grupo).update(
+                total_vendas=F('total_vendas') - quantidade
+            )
+
+        # update() não dispara post_save
+        invalidar_acessos(*{usuario_id for _, usuario_id in revogados})
+
+    return len(revogados)
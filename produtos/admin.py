@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
 from django.utils.html import format_html, mark_safe
-from .models import Categoria, Produto, ConteudoDigital, Pedido, ItemPedido, AcessoProduto
+from personal.paginacao import PaginadorEstimado
+from .models import Categoria, Produto, ConteudoDigital, Pedido, ItemPedido, AcessoProduto, VendaDiaria
 
 
 @admin.register(Categoria)
@@ -10,9 +13,13 @@ class CategoriaAdmin(admin.ModelAdmin):
     search_fields = ['nome', 'descricao']
     prepopulated_fields = {'slug': ('nome',)}
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_total_produtos=Count('produtos'))
+    
     def total_produtos(self, obj):
-        return obj.produtos.count()
+        return obj._total_produtos
     total_produtos.short_description = 'Produtos'
+    total_produtos.admin_order_field = '_total_produtos'
 
 
 class ConteudoDigitalInline(admin.TabularInline):
@@ -26,6 +33,7 @@ class ProdutoAdmin(admin.ModelAdmin):
     list_display = ['nome', 'categoria', 'preco_display', 'status', 'destaque', 'total_vendas', 'criado_em']
     list_filter = ['status', 'categoria', 'destaque', 'criado_em']
     list_editable = ['destaque', 'status']
+    list_select_related = ['categoria']
     search_fields = ['nome', 'titulo_hero', 'subtitulo_hero']
     prepopulated_fields = {'slug': ('nome',)}
     readonly_fields = ['total_vendas', 'criado_em', 'atualizado_em', 'preview_capa', 'preview_destaque']
@@ -100,7 +108,9 @@ class ConteudoDigitalAdmin(admin.ModelAdmin):
     list_display = ['titulo', 'produto', 'tipo', 'ordem', 'liberado']
     list_filter = ['tipo', 'liberado', 'produto__categoria']
     list_editable = ['ordem', 'liberado']
+    list_select_related = ['produto']
     search_fields = ['titulo', 'produto__nome']
+    autocomplete_fields = ['produto']
 
 
 class ItemPedidoInline(admin.TabularInline):
@@ -109,13 +119,20 @@ class ItemPedidoInline(admin.TabularInline):
     readonly_fields = ['produto', 'nome_produto', 'preco_unitario', 'quantidade', 'subtotal']
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('produto')
+
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ['id', 'usuario', 'total', 'status', 'metodo_pagamento', 'criado_em']
     list_filter = ['status', 'metodo_pagamento', 'criado_em']
+    list_select_related = ['usuario']
     search_fields = ['usuario__email', 'usuario__first_name', 'transaction_id']
-    readonly_fields = ['subtotal', 'desconto', 'total', 'criado_em', 'atualizado_em', 'aprovado_em']
+    autocomplete_fields = ['usuario']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    readonly_fields = ['subtotal', 'desconto', 'total', 'codigo_cupom', 'cupom_status', 'criado_em', 'atualizado_em', 'aprovado_em']
     inlines = [ItemPedidoInline]
     
     fieldsets = (
@@ -123,7 +140,7 @@ class PedidoAdmin(admin.ModelAdmin):
             'fields': ('usuario', 'nome_compra', 'email_compra')
         }),
         ('Valores', {
-            'fields': ('subtotal', 'desconto', 'total')
+            'fields': ('subtotal', 'desconto', 'total', 'codigo_cupom', 'cupom_status')
         }),
         ('Pagamento', {
             'fields': ('status', 'metodo_pagamento', 'transaction_id')
@@ -136,18 +153,40 @@ class PedidoAdmin(admin.ModelAdmin):
     actions = ['aprovar_pedidos', 'cancelar_pedidos']
     
     def aprovar_pedidos(self, request, queryset):
+        from django.db import transaction
         from django.utils import timezone
-        for pedido in queryset:
-            pedido.status = 'aprovado'
-            pedido.aprovado_em = timezone.now()
-            pedido.save()
-            pedido.liberar_acesso_produtos()
-        self.message_user(request, f'{queryset.count()} pedido(s) aprovado(s) e acessos liberados.')
+        from carrinho.cupons import confirmar_usos
+        from .acessos import liberar_acessos
+        from .vendas import registrar_vendas
+        with transaction.atomic():
+            agora = timezone.now()
+            # Pedidos já aprovados ficam de fora para não contar a venda duas vezes
+            ids = list(queryset.exclude(status='aprovado').select_for_update().values_list('id', flat=True))
+            Pedido.objects.filter(id__in=ids).update(
+                status='aprovado', aprovado_em=agora, atualizado_em=agora
+            )
+            liberar_acessos(ids)
+            confirmar_usos(ids)
+            registrar_vendas(ids)
+        self.message_user(request, f'{len(ids)} pedido(s) aprovado(s) e acessos liberados.')
     aprovar_pedidos.short_description = 'Aprovar pedidos selecionados'
     
     def cancelar_pedidos(self, request, queryset):
-        queryset.update(status='cancelado')
-        self.message_user(request, f'{queryset.count()} pedido(s) cancelado(s).')
+        from django.db import transaction
+        from carrinho.cupons import liberar_usos
+        from .acessos import revogar_acessos
+        from .vendas import estornar_vendas
+        with transaction.atomic():
+            selecionados = list(queryset.select_for_update().values_list('id', 'status'))
+            ids = [pedido_id for pedido_id, _ in selecionados]
+            # Pedidos que estavam aprovados perdem o acesso e saem das vendas
+            aprovados = [pedido_id for pedido_id, status in selecionados if status == 'aprovado']
+            revogar_acessos(aprovados)
+            estornar_vendas(aprovados)
+            Pedido.objects.filter(id__in=ids).update(status='cancelado')
+            # Devolve os usos de cupom ainda reservados (pedidos aprovados já confirmaram)
+            liberar_usos(ids)
+        self.message_user(request, f'{len(ids)} pedido(s) cancelado(s).')
     cancelar_pedidos.short_description = 'Cancelar pedidos selecionados'
 
 
@@ -155,7 +194,11 @@ class PedidoAdmin(admin.ModelAdmin):
 class AcessoProdutoAdmin(admin.ModelAdmin):
     list_display = ['usuario', 'produto', 'liberado_em', 'expira_em', 'ativo', 'is_ativo_display']
     list_filter = ['ativo', 'liberado_em', 'produto__categoria']
+    list_select_related = ['usuario', 'produto']
     search_fields = ['usuario__email', 'produto__nome']
+    autocomplete_fields = ['usuario', 'produto']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
     readonly_fields = ['liberado_em', 'total_acessos', 'ultimo_acesso']
     
     def is_ativo_display(self, obj):
@@ -163,3 +206,73 @@ class AcessoProdutoAdmin(admin.ModelAdmin):
             return mark_safe('<span style="color: #0f9d58;">✓ Ativo</span>')
         return mark_safe('<span style="color: #d93025;">✗ Inativo</span>')
     is_ativo_display.short_description = 'Status'
+
+
+@admin.register(VendaDiaria)
+class VendaDiariaAdmin(admin.ModelAdmin):
+    """
+    Painel de faturamento: lê as vendas diárias consolidadas
+    (recalculáveis com `python manage.py recalcular_vendas_diarias`).
+    Os pedidos são contados uma vez mesmo com vários produtos (contar_pedidos).
+    """
+    change_list_template = 'admin/produtos/vendadiaria/change_list.html'
+    list_display = ['dia', 'produto', 'codigo_cupom', 'pedidos', 'quantidade', 'bruto', 'desconto', 'liquido']
+    list_filter = ['produto', 'codigo_cupom']
+    list_select_related = ['produto']
+    date_hierarchy = 'dia'
+    search_fields = ['produto__nome', 'codigo_cupom']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            cl = response.context_data['cl']
+        except (AttributeError, KeyError):
+            # Redirecionamento (ex.: filtro inválido)
+            return response
+        from .vendas import contar_pedidos
+
+        vendas = cl.queryset
+        pedidos, pedidos_por_mes, exato = contar_pedidos(
+            vendas,
+            um_produto='produto__id__exact' in cl.get_filters_params(),
+            busca=bool(cl.query),
+        )
+
+        totais = vendas.aggregate(bruto=Sum('bruto'), desconto=Sum('desconto'), liquido=Sum('liquido'))
+        totais['pedidos'] = pedidos
+        totais['pedidos_exato'] = exato
+        meses = list(
+            vendas.order_by()
+            .annotate(mes=TruncMonth('dia'))
+            .values('mes')
+            .annotate(liquido=Sum('liquido'))
+            .order_by('mes')
+        )
+        maior = max((mes['liquido'] for mes in meses), default=0) or 1
+        for mes in meses:
+            mes['largura'] = int(mes['liquido'] * 100 / maior)
+            mes['pedidos'] = pedidos_por_mes.get(mes['mes'], 0)
+        mais_vendidos = list(
+            vendas.order_by()
+            .values('produto__nome')
+            .annotate(quantidade=Sum('quantidade'), liquido=Sum('liquido'))
+            .order_by('-liquido')[:10]
+        )
+
+        response.context_data.update({
+            'resumo_vendas': totais,
+            'vendas_por_mes': meses,
+            'produtos_mais_vendidos': mais_vendidos,
+        })
+        return response
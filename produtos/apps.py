@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ProdutosConfig(AppConfig):
     name = 'produtos'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
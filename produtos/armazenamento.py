@@ -0,0 +1,36 @@
+"""
+Armazenamento privado dos arquivos dos conteúdos digitais
+
+Os arquivos pagos ficam em MIDIA_PROTEGIDA_ROOT, fora de MEDIA_ROOT, e não têm
+URL pública: só são entregues por `dashboard:conteudo_arquivo`, depois da
+verificação de acesso (dashboard/arquivos.py). A URL do storage é o prefixo
+`internal` do nginx (MIDIA_PROTEGIDA_PREFIXO), inacessível diretamente.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+
+class _MidiaProtegida(LazyObject):
+    def _setup(self):
+        self._wrapped = FileSystemStorage(
+            location=settings.MIDIA_PROTEGIDA_ROOT,
+            base_url=getattr(settings, 'MIDIA_PROTEGIDA_PREFIXO', '/midia-protegida/'),
+        )
+
+
+_midia_protegida = _MidiaProtegida()
+
+
+@receiver(setting_changed)
+def _recriar_midia_protegida(*, setting, **kwargs):
+    # override_settings nos testes
+    if setting in ('MIDIA_PROTEGIDA_ROOT', 'MIDIA_PROTEGIDA_PREFIXO'):
+        _midia_protegida._wrapped = empty
+
+
+def midia_protegida():
+    """Storage dos campos `arquivo`/`imagem` de ConteudoDigital (referenciado nas migrações)."""
+    return _midia_protegida
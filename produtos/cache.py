@@ -0,0 +1,105 @@
+"""
+Cache do catálogo (página inicial e /produtos/catalogo/)
+
+As listas de produtos publicados e categorias ativas são guardadas prontas no
+cache do Django. Todas as chaves levam a versão atual do catálogo; qualquer
+alteração em Produto, Categoria ou ConteudoDigital troca a versão (ver
+signals.py) e as chaves antigas simplesmente expiram.
+
+Com vários processos (PythonAnywhere, gunicorn), use um cache compartilhado
+(CACHE_BACKEND=file ou redis) para que a troca de versão valha para todos.
+"""
+from django.conf import settings
+from django.core.cache import cache
+import hashlib
+import time
+
+from .models import Produto, Categoria
+
+CHAVE_VERSAO = 'catalogo:versao'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def versao_catalogo():
+    """Versão atual do catálogo (criada na primeira leitura)."""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, time.time_ns(), None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def invalidar_catalogo():
+    """Troca a versão do catálogo: as próximas leituras reconstroem as listas."""
+    cache.set(CHAVE_VERSAO, time.time_ns(), None)
+
+
+def _chave(nome):
+    return f'catalogo:{versao_catalogo()}:{nome}'
+
+
+def _obter(nome, construir):
+    chave = _chave(nome)
+    valor = cache.get(chave)
+    if valor is None:
+        valor = construir()
+        cache.set(chave, valor, _timeout())
+    return valor
+
+
+def produtos_publicados(categoria_slug=None):
+    """Produtos publicados (com categoria), opcionalmente filtrados por categoria."""
+    def construir():
+        produtos = Produto.objects.filter(status='publicado').select_related('categoria')
+        if categoria_slug:
+            produtos = produtos.filter(categoria__slug=categoria_slug)
+        return list(produtos)
+
+    return _obter(f'produtos:{categoria_slug or "todos"}', construir)
+
+
+def categorias_ativas():
+    """Categorias ativas, na ordem de exibição."""
+    return _obter('categorias', lambda: list(Categoria.objects.filter(ativo=True)))
+
+
+def validadores_produto(slug):
+    """
+    (etag, last_modified) da página do produto publicado, ou None se ele não
+    existir. Derivados de `atualizado_em` e da categoria do produto.
+    """
+    def construir():
+        dados = (
+            Produto.objects.filter(slug=slug, status='publicado')
+            .values_list('atualizado_em', 'categoria_id', 'categoria__nome')
+            .first()
+        )
+        if dados is None:
+            return False
+        atualizado_em, categoria_id, categoria_nome = dados
+        assinatura = f'{slug}:{atualizado_em.isoformat()}:{categoria_id}:{categoria_nome}'
+        etag = 'W/"%s"' % hashlib.md5(assinatura.encode()).hexdigest()
+        return (etag, atualizado_em)
+
+    return _obter(f'validadores:{slug}', construir) or None
+
+
+def pagina_em_cache(nome, slug):
+    """HTML já renderizado da página pública do produto, ou None."""
+    return cache.get(_chave(f'pagina:{nome}:{slug}'))
+
+
+def guardar_pagina(nome, slug, conteudo):
+    cache.set(_chave(f'pagina:{nome}:{slug}'), conteudo, _timeout())
+
+
+def aquecer_catalogo():
+    """Preenche o cache com todas as listas do catálogo. Retorna a quantidade de listas."""
+    categorias = categorias_ativas()
+    produtos_publicados()
+    for categoria in categorias:
+        produtos_publicados(categoria.slug)
+    return len(categorias) + 2
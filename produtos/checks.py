@@ -0,0 +1,26 @@
+"""
+Verificações de configuração do app produtos (python manage.py check)
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends em que incr/add são atômicos e compartilhados entre processos
+CACHES_ATOMICOS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+@register()
+def verificar_cache_contadores(app_configs, **kwargs):
+    """CONTADORES_ACESSO='cache' perde visualizações sem um cache atômico compartilhado."""
+    if getattr(settings, 'CONTADORES_ACESSO', 'banco') != 'cache':
+        return []
+    if settings.CACHES['default']['BACKEND'] in CACHES_ATOMICOS:
+        return []
+    return [Error(
+        "CONTADORES_ACESSO='cache' exige um cache com incr/add atômicos compartilhado entre os processos.",
+        hint="Use CACHE_BACKEND=redis ou CONTADORES_ACESSO='arquivo'.",
+        id='produtos.E001',
+    )]
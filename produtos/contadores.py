@@ -0,0 +1,279 @@
+"""
+Contadores de acesso aos conteúdos (AcessoProduto.total_acessos / ultimo_acesso)
+
+CONTADORES_ACESSO escolhe onde cada visualização é acumulada até
+`python manage.py gravar_contadores_acesso` gravá-las com um `bulk_update`
+(F() + n) por lote, sem disputar o lock de escrita do SQLite a cada
+visualização:
+
+    arquivo - uma linha acrescentada (O_APPEND) em um arquivo por processo em
+              CONTADORES_ACESSO_PASTA. Padrão com o cache em arquivo; a
+              gravação precisa rodar na mesma máquina que o site.
+    cache   - incremento no cache, com o acesso marcado como pendente. Exige
+              `incr`/`add` atômicos e compartilhados entre os processos
+              (redis); a verificação `produtos.E001` impede usá-lo com o cache
+              em arquivo ou em memória. Uma posição da sequência reservada sem
+              marcador só é descartada após CONTADORES_LACUNA_TIMEOUT segundos.
+    banco   - sem acúmulo: cada visualização faz um UPDATE da linha.
+
+Nos dois modos acumulados o pendente só é descartado depois que a gravação é
+confirmada: se o banco falhar, continua para a próxima.
+
+Os contadores não fazem parte do cache de acessos (acessos.py): contar uma
+visualização não troca a versão dos acessos do usuário. Quem exibe os
+contadores lê os valores atuais com `aplicar_contadores`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+import os
+import time
+
+from .models import AcessoProduto
+
+CHAVE_SEQUENCIA = 'contadores:sequencia'
+CHAVE_GRAVADO = 'contadores:gravado'
+CHAVE_LACUNA = 'contadores:lacuna'
+
+
+def _chave_contador(acesso_id):
+    return f'contadores:acesso:{acesso_id}'
+
+
+def _chave_ultimo(acesso_id):
+    return f'contadores:acesso:{acesso_id}:ultimo'
+
+
+def _chave_pendente(posicao):
+    return f'contadores:pendente:{posicao}'
+
+
+def modo_contadores():
+    return getattr(settings, 'CONTADORES_ACESSO', 'banco')
+
+
+def contadores_em_cache():
+    return modo_contadores() == 'cache'
+
+
+def _pasta():
+    return getattr(settings, 'CONTADORES_ACESSO_PASTA', os.path.join(settings.BASE_DIR, '.contadores'))
+
+
+def _registrar_em_arquivo(acesso):
+    # Uma escrita curta em modo append por visualização: linhas de processos e
+    # threads diferentes não se misturam
+    caminho = os.path.join(_pasta(), f'pendentes-{os.getpid()}.log')
+    linha = f'{acesso.pk} {time.time():.6f}\n'
+    try:
+        arquivo = open(caminho, 'a')
+    except FileNotFoundError:
+        os.makedirs(_pasta(), exist_ok=True)
+        arquivo = open(caminho, 'a')
+    with arquivo:
+        arquivo.write(linha)
+
+
+def _marcar_pendente(acesso_id, usuario_id):
+    cache.add(CHAVE_SEQUENCIA, 0, None)
+    posicao = cache.incr(CHAVE_SEQUENCIA)
+    cache.set(_chave_pendente(posicao), (acesso_id, usuario_id), None)
+
+
+def registrar_visualizacao(acesso):
+    """Conta uma visualização do produto (ver CONTADORES_ACESSO)."""
+    if modo_contadores() == 'arquivo':
+        _registrar_em_arquivo(acesso)
+        return
+    if not contadores_em_cache():
+        AcessoProduto.objects.filter(id=acesso.pk).update(
+            ultimo_acesso=timezone.now(),
+            total_acessos=F('total_acessos') + 1,
+        )
+        return
+
+    chave = _chave_contador(acesso.pk)
+    cache.set(_chave_ultimo(acesso.pk), timezone.now(), None)
+    try:
+        valor = cache.incr(chave)
+    except ValueError:
+        valor = 1 if cache.add(chave, 1, None) else cache.incr(chave)
+    if valor == 1:
+        # Primeira visualização desde a última gravação: marca como pendente
+        _marcar_pendente(acesso.pk, acesso.usuario_id)
+
+
+def _lacuna_timeout():
+    return getattr(settings, 'CONTADORES_LACUNA_TIMEOUT', 300)
+
+
+def _ultima_posicao_completa(chaves_pendentes, marcadores, inicio):
+    """
+    Última posição da sequência que pode ser gravada. Uma posição já reservada
+    e ainda sem marcador (visualização no meio do registro) encerra o lote.
+    Só depois de CONTADORES_LACUNA_TIMEOUT segundos vazia é considerada
+    abandonada (processo morto entre a reserva e o marcador) e ignorada: um
+    registro apenas lento ainda é gravado quando o marcador chegar.
+    """
+    lacuna = cache.get(CHAVE_LACUNA)
+    agora = time.time()
+    for posicao, chave in enumerate(chaves_pendentes, inicio + 1):
+        if chave in marcadores:
+            continue
+        if lacuna and lacuna[0] == posicao:
+            if agora - lacuna[1] >= _lacuna_timeout():
+                continue
+        else:
+            cache.set(CHAVE_LACUNA, (posicao, agora), None)
+        return posicao - 1
+    return inicio + len(chaves_pendentes)
+
+
+def gravar_contadores(tamanho_lote=500):
+    """Grava no banco os contadores pendentes. Retorna a quantidade de acessos atualizados."""
+    if modo_contadores() == 'arquivo':
+        return _gravar_arquivos(tamanho_lote)
+    if not contadores_em_cache():
+        return 0
+
+    fim = cache.get(CHAVE_SEQUENCIA) or 0
+    inicio = cache.get(CHAVE_GRAVADO) or 0
+    if fim <= inicio:
+        return 0
+
+    chaves_pendentes = [_chave_pendente(posicao) for posicao in range(inicio + 1, fim + 1)]
+    marcadores = cache.get_many(chaves_pendentes)
+    ate = _ultima_posicao_completa(chaves_pendentes, marcadores, inicio)
+    if ate <= inicio:
+        return 0
+    chaves_pendentes = chaves_pendentes[:ate - inicio]
+
+    pendentes = dict(marcadores[chave] for chave in chaves_pendentes if chave in marcadores)
+    incrementos = cache.get_many([_chave_contador(acesso_id) for acesso_id in pendentes])
+    ultimos = cache.get_many([_chave_ultimo(acesso_id) for acesso_id in pendentes])
+
+    atualizacoes = []
+    gravados = []
+    for acesso_id, usuario_id in pendentes.items():
+        incremento = incrementos.get(_chave_contador(acesso_id))
+        if not incremento:
+            continue
+        atualizacoes.append(AcessoProduto(
+            id=acesso_id,
+            total_acessos=F('total_acessos') + incremento,
+            ultimo_acesso=ultimos.get(_chave_ultimo(acesso_id)) or timezone.now(),
+        ))
+        gravados.append((acesso_id, usuario_id, incremento))
+
+    def descontar():
+        # Visualizações que chegaram durante a gravação continuam no contador
+        for acesso_id, usuario_id, incremento in gravados:
+            if cache.decr(_chave_contador(acesso_id), incremento) > 0:
+                _marcar_pendente(acesso_id, usuario_id)
+        cache.delete_many(chaves_pendentes)
+        cache.set(CHAVE_GRAVADO, ate, None)
+
+    with transaction.atomic():
+        AcessoProduto.objects.bulk_update(
+            atualizacoes, ['total_acessos', 'ultimo_acesso'], batch_size=tamanho_lote
+        )
+        transaction.on_commit(descontar)
+
+    return len(atualizacoes)
+
+
+def _rotacionar_arquivos(pasta):
+    """
+    Renomeia os arquivos em uso (novas visualizações abrem um arquivo novo) e
+    retorna os já renomeados há pelo menos CONTADORES_ACESSO_CARENCIA
+    segundos: quem abriu o arquivo antes da troca de nome termina a escrita
+    nesse intervalo. Espera a carência dos renomeados agora.
+    """
+    try:
+        nomes = os.listdir(pasta)
+    except FileNotFoundError:
+        return []
+    for nome in nomes:
+        if nome.startswith('pendentes-'):
+            os.replace(os.path.join(pasta, nome), os.path.join(pasta, f'gravando-{time.time_ns()}-{nome[10:]}'))
+
+    carencia = getattr(settings, 'CONTADORES_ACESSO_CARENCIA', 1)
+    rotacionados = sorted(nome for nome in os.listdir(pasta) if nome.startswith('gravando-'))
+    if rotacionados:
+        mais_recente = int(rotacionados[-1].split('-')[1]) / 1e9
+        espera = carencia - (time.time() - mais_recente)
+        if espera > 0:
+            time.sleep(espera)
+    return [os.path.join(pasta, nome) for nome in rotacionados]
+
+
+def _gravar_arquivos(tamanho_lote):
+    arquivos = _rotacionar_arquivos(_pasta())
+    totais = {}
+    for caminho in arquivos:
+        with open(caminho) as arquivo:
+            for linha in arquivo:
+                try:
+                    if not linha.endswith('\n'):
+                        raise ValueError(linha)
+                    acesso_id, momento = linha.split()
+                    acesso_id, momento = int(acesso_id), float(momento)
+                except ValueError:
+                    # Linha incompleta (processo morto no meio da escrita)
+                    continue
+                total, ultimo = totais.get(acesso_id, (0, 0.0))
+                totais[acesso_id] = (total + 1, max(ultimo, momento))
+
+    atualizacoes = [
+        AcessoProduto(
+            id=acesso_id,
+            total_acessos=F('total_acessos') + total,
+            ultimo_acesso=datetime.fromtimestamp(ultimo, dt_timezone.utc),
+        )
+        for acesso_id, (total, ultimo) in totais.items()
+    ]
+
+    def remover():
+        for caminho in arquivos:
+            os.remove(caminho)
+
+    with transaction.atomic():
+        AcessoProduto.objects.bulk_update(
+            atualizacoes, ['total_acessos', 'ultimo_acesso'], batch_size=tamanho_lote
+        )
+        transaction.on_commit(remover)
+
+    return len(atualizacoes)
+
+
+def aplicar_contadores(acessos):
+    """
+    Atualiza total_acessos/ultimo_acesso dos acessos informados (vindos do
+    cache de acessos, com os valores da hora em que foram carregados): uma
+    consulta ao banco, mais as visualizações ainda no cache esperando gravação
+    (no modo arquivo, as pendentes aparecem depois da próxima gravação).
+    """
+    ids = [acesso.pk for acesso in acessos]
+    if not ids:
+        return acessos
+    valores = {
+        acesso_id: (total, ultimo)
+        for acesso_id, total, ultimo in AcessoProduto.objects.filter(id__in=ids).values_list(
+            'id', 'total_acessos', 'ultimo_acesso'
+        )
+    }
+    pendentes, ultimos = {}, {}
+    if contadores_em_cache():
+        pendentes = cache.get_many([_chave_contador(acesso_id) for acesso_id in ids])
+        ultimos = cache.get_many([_chave_ultimo(acesso_id) for acesso_id in ids])
+
+    for acesso in acessos:
+        total, ultimo = valores.get(acesso.pk, (acesso.total_acessos, acesso.ultimo_acesso))
+        if pendentes.get(_chave_contador(acesso.pk)):
+            total += pendentes[_chave_contador(acesso.pk)]
+            ultimo = ultimos.get(_chave_ultimo(acesso.pk)) or ultimo
+        acesso.total_acessos, acesso.ultimo_acesso = total, ultimo
+    return acessos
@@ -0,0 +1,29 @@
+"""
+Comando para aquecer o cache do catálogo após o deploy
+
+Uso:
+    python manage.py aquecer_cache_catalogo
+    python manage.py aquecer_cache_catalogo --invalidar   # força reconstrução
+"""
+from django.core.management.base import BaseCommand
+
+from produtos.cache import aquecer_catalogo, invalidar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Preenche o cache do catálogo (página inicial e catálogo de produtos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invalidar',
+            action='store_true',
+            help='Descarta a versão atual do cache antes de aquecer'
+        )
+
+    def handle(self, *args, **options):
+        if options['invalidar']:
+            invalidar_catalogo()
+            self.stdout.write('🗑️  Versão anterior do catálogo descartada')
+
+        total = aquecer_catalogo()
+        self.stdout.write(self.style.SUCCESS(f'✅ Cache do catálogo aquecido ({total} listas)'))
@@ -0,0 +1,187 @@
+"""
+Benchmark dos contadores de acesso no SQLite: gravação direta x acumulada
+
+Cria um banco SQLite temporário (mesmas opções do banco configurado: WAL,
+busy_timeout...), aplica as migrações e simula leitores simultâneos abrindo
+conteúdos, com um escritor concorrente (ex.: checkout) medindo quanto espera
+pelo lock de escrita. Roda um cenário por modo de CONTADORES_ACESSO:
+
+    banco   - um UPDATE por visualização (antes)
+    arquivo - linhas em arquivo + uma gravação em lote ao final
+    cache   - contadores no cache + uma gravação em lote ao final
+
+O banco configurado não é tocado.
+
+Uso:
+    python manage.py benchmark_contadores_acesso
+    python manage.py benchmark_contadores_acesso --leitores=16 --visualizacoes=500
+"""
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import F, Sum
+from django.test.utils import override_settings
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from produtos.contadores import gravar_contadores, registrar_visualizacao
+from produtos.models import AcessoProduto, Categoria, Produto
+
+User = get_user_model()
+
+CACHE_BENCHMARK = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-contadores',
+    }
+}
+
+
+def _percentil(tempos, fracao):
+    if not tempos:
+        return 0.0
+    ordenados = sorted(tempos)
+    return ordenados[min(int(len(ordenados) * fracao), len(ordenados) - 1)] * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compara no SQLite a gravação direta dos contadores de acesso com a acumulada (arquivo/cache) + gravação em lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--leitores',
+            type=int,
+            default=8,
+            help='Leitores simultâneos, cada um com seu acesso (padrão: 8)'
+        )
+        parser.add_argument(
+            '--visualizacoes',
+            type=int,
+            default=200,
+            help='Visualizações por leitor (padrão: 200)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('O benchmark compara o comportamento do SQLite (DB_ENGINE=sqlite)')
+
+        configuracao = connections.settings['default']
+        nome_original = configuracao['NAME']
+        pasta = tempfile.mkdtemp(prefix='benchmark_contadores_')
+        connections.close_all()
+        configuracao['NAME'] = os.path.join(pasta, 'benchmark.sqlite3')
+        try:
+            self.stdout.write('🛠️  Criando banco SQLite temporário...')
+            call_command('migrate', verbosity=0, interactive=False)
+            acessos = self._preparar(options['leitores'])
+
+            for modo in ('banco', 'arquivo', 'cache'):
+                # Leitores já terminaram quando a gravação roda: sem carência
+                with override_settings(CACHES=CACHE_BENCHMARK, CONTADORES_ACESSO=modo,
+                                       CONTADORES_ACESSO_PASTA=os.path.join(pasta, 'contadores'),
+                                       CONTADORES_ACESSO_CARENCIA=0):
+                    self._executar(modo, acessos, options['visualizacoes'])
+        finally:
+            connections.close_all()
+            configuracao['NAME'] = nome_original
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    def _preparar(self, leitores):
+        categoria = Categoria.objects.create(nome='Benchmark', slug='benchmark')
+        produto = Produto.objects.create(nome='Benchmark', slug='benchmark', categoria=categoria, preco='1.00')
+        usuarios = User.objects.bulk_create([
+            User(username=f'leitor{indice}@benchmark', email=f'leitor{indice}@benchmark')
+            for indice in range(leitores)
+        ])
+        if usuarios[0].pk is None:
+            usuarios = list(User.objects.filter(username__endswith='@benchmark').order_by('id'))
+        AcessoProduto.objects.bulk_create([AcessoProduto(usuario=usuario, produto=produto) for usuario in usuarios])
+        return list(AcessoProduto.objects.filter(produto=produto).order_by('id'))
+
+    def _executar(self, modo, acessos, visualizacoes):
+        AcessoProduto.objects.filter(id__in=[acesso.id for acesso in acessos]).update(total_acessos=0)
+        categoria_id = Categoria.objects.values_list('id', flat=True).get(slug='benchmark')
+
+        tempos_leitura = []
+        tempos_escrita = []
+        erros = []
+        lock = threading.Lock()
+        leitores_ativos = threading.Event()
+        leitores_ativos.set()
+
+        def leitor(acesso):
+            tempos = []
+            try:
+                for _ in range(visualizacoes):
+                    inicio = time.perf_counter()
+                    try:
+                        registrar_visualizacao(acesso)
+                    except OperationalError as e:
+                        with lock:
+                            erros.append(str(e))
+                    tempos.append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+            with lock:
+                tempos_leitura.extend(tempos)
+
+        def escritor():
+            # Outra escrita do site (ex.: checkout) disputando o lock com os leitores
+            try:
+                while leitores_ativos.is_set():
+                    inicio = time.perf_counter()
+                    try:
+                        Categoria.objects.filter(id=categoria_id).update(ordem=F('ordem') + 1)
+                    except OperationalError as e:
+                        with lock:
+                            erros.append(str(e))
+                    tempos_escrita.append(time.perf_counter() - inicio)
+                    time.sleep(0.005)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=leitor, args=(acesso,)) for acesso in acessos]
+        thread_escritor = threading.Thread(target=escritor)
+        inicio = time.perf_counter()
+        thread_escritor.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        leitores_ativos.clear()
+        thread_escritor.join()
+
+        duracao_gravacao = 0.0
+        if modo != 'banco':
+            inicio = time.perf_counter()
+            gravar_contadores()
+            duracao_gravacao = time.perf_counter() - inicio
+
+        total = len(tempos_leitura)
+        gravado = AcessoProduto.objects.filter(id__in=[acesso.id for acesso in acessos]).aggregate(
+            total=Sum('total_acessos')
+        )['total'] or 0
+
+        titulo = {
+            'banco': 'ANTES: UPDATE por visualização',
+            'arquivo': 'DEPOIS: arquivo + gravação em lote',
+            'cache': 'DEPOIS: cache + gravação em lote',
+        }[modo]
+        self.stdout.write(f'\n📊 {titulo}')
+        self.stdout.write(f'   👀 {total} visualizações de {len(acessos)} leitores em {duracao:.2f}s '
+                          f'({total / duracao:.0f}/s)')
+        self.stdout.write(f'   ⏱️  Visualização: p50 {_percentil(tempos_leitura, 0.5):.2f}ms, '
+                          f'p95 {_percentil(tempos_leitura, 0.95):.2f}ms')
+        self.stdout.write(f'   ✍️  Escritor concorrente: {len(tempos_escrita)} escritas, '
+                          f'p95 {_percentil(tempos_escrita, 0.95):.2f}ms, '
+                          f'máx {_percentil(tempos_escrita, 1):.2f}ms')
+        if modo != 'banco':
+            self.stdout.write(f'   💾 Gravação em lote: {duracao_gravacao * 1000:.1f}ms')
+        self.stdout.write(f'   🔢 Gravado no banco: {gravado} de {total}')
+        if erros:
+            self.stdout.write(self.style.WARNING(f'   ⚠️  {len(erros)} erro(s) de lock: {erros[0]}'))
@@ -0,0 +1,52 @@
+"""
+Comando para gravar no banco os contadores de acesso acumulados (arquivo ou cache)
+
+Uso:
+    python manage.py gravar_contadores_acesso               # grava e termina (cron)
+    python manage.py gravar_contadores_acesso --continuo    # grava a cada --intervalo segundos
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+
+from produtos.contadores import gravar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Grava total_acessos/ultimo_acesso acumulados (CONTADORES_ACESSO)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Acessos atualizados por UPDATE (padrão: 500)'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Mantém o comando rodando, gravando a cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=60,
+            help='Segundos entre gravações no modo contínuo (padrão: 60)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['continuo']:
+            total = gravar_contadores(options['lote'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} acesso(s) atualizado(s)'))
+            return
+
+        self.stdout.write(f'🔄 Gravação de contadores iniciada (intervalo={options["intervalo"]}s)')
+        try:
+            while True:
+                close_old_connections()
+                total = gravar_contadores(options['lote'])
+                if total:
+                    self.stdout.write(f'   {total} acesso(s) atualizado(s)')
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹️  Gravação de contadores encerrada')
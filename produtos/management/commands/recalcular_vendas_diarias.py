@@ -0,0 +1,56 @@
+"""
+Comando para reconstruir as vendas diárias (VendaDiaria e PedidoDiario) a partir dos pedidos aprovados
+
+Necessário uma vez após a implantação (pedidos anteriores) e sempre que os
+totais precisarem ser conferidos/corrigidos. O período é apagado e regravado
+em uma única transação.
+
+Uso:
+    python manage.py recalcular_vendas_diarias                          # todo o histórico
+    python manage.py recalcular_vendas_diarias --desde=2025-01-01
+    python manage.py recalcular_vendas_diarias --desde=2025-01-01 --ate=2025-01-31
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+
+from produtos.vendas import recalcular_vendas
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Data inválida: {valor} (use AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as vendas diárias consolidadas a partir dos pedidos aprovados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Primeiro dia do período (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--ate',
+            type=str,
+            help='Último dia do período (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Itens de pedido lidos do banco por vez (padrão: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        desde = _data(options['desde']) if options['desde'] else None
+        ate = _data(options['ate']) if options['ate'] else None
+        if desde and ate and desde > ate:
+            raise CommandError('--desde deve ser anterior ou igual a --ate')
+
+        periodo = f'{desde or "início"} até {ate or "hoje"}'
+        self.stdout.write(f'🔄 Recalculando vendas diárias ({periodo})...')
+        total = recalcular_vendas(desde, ate, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} linha(s) de vendas diárias gravada(s)'))
@@ -0,0 +1,75 @@
+"""
+Comando para verificar o plano de execução das consultas mais frequentes
+
+Roda EXPLAIN em cada consulta quente e falha (código de saída 1) se alguma
+voltar a fazer varredura completa da tabela, por exemplo depois de remover ou
+alterar um índice em Meta.indexes. Útil no deploy ou no CI.
+
+Uso:
+    python manage.py verificar_planos_consulta
+    python manage.py verificar_planos_consulta --verbose   # mostra os planos
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+import re
+
+from produtos.models import Produto, ConteudoDigital, Pedido, AcessoProduto
+
+
+def consultas_quentes():
+    """(descrição, queryset) das consultas que precisam usar índice."""
+    limite = timezone.now() - timedelta(days=1)
+    return [
+        ('Pedido pendente do usuário (checkout)',
+         Pedido.objects.filter(usuario_id=1, status__in=['pendente', 'processando']).order_by('-criado_em')),
+        ('Pedidos do usuário (dashboard)',
+         Pedido.objects.filter(usuario_id=1).order_by('-criado_em')),
+        ('Pedido por transaction_id (retorno do Mercado Pago)',
+         Pedido.objects.filter(transaction_id='pref-123')),
+        ('Pedidos pendentes antigos (limpeza)',
+         Pedido.objects.filter(status='pendente', criado_em__lt=limite)),
+        ('Acessos do usuário (dashboard)',
+         AcessoProduto.objects.filter(usuario_id=1, ativo=True).order_by('-liberado_em')),
+        ('Produtos publicados (catálogo)',
+         Produto.objects.filter(status='publicado')),
+        ('Conteúdos liberados do produto',
+         ConteudoDigital.objects.filter(produto_id=1, liberado=True).order_by('ordem')),
+    ]
+
+
+def varredura_completa(plano, tabela):
+    """True se o plano lê a tabela inteira (SQLite: 'SCAN tabela'; PostgreSQL: 'Seq Scan on tabela')."""
+    if connection.vendor == 'postgresql':
+        return f'Seq Scan on {tabela}' in plano
+    return re.search(rf'\bSCAN {re.escape(tabela)}\b(?! USING)', plano) is not None
+
+
+class Command(BaseCommand):
+    help = 'Verifica se as consultas mais frequentes usam índice (EXPLAIN)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Mostra o plano de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        falhas = []
+        for descricao, queryset in consultas_quentes():
+            tabela = queryset.model._meta.db_table
+            plano = queryset.explain()
+            if varredura_completa(plano, tabela):
+                falhas.append(descricao)
+                self.stdout.write(self.style.ERROR(f'❌ {descricao}: varredura completa de {tabela}'))
+            else:
+                self.stdout.write(f'✅ {descricao}')
+            if options['verbose'] or descricao in falhas:
+                for linha in plano.splitlines():
+                    self.stdout.write(f'      {linha}')
+
+        if falhas:
+            raise CommandError(f'{len(falhas)} consulta(s) sem índice')
+        self.stdout.write(self.style.SUCCESS('✅ Todas as consultas usam índice'))
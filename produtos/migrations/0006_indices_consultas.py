@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrinho', '0001_initial'),
+        ('produtos', '0005_pedido_codigo_cupom_pedido_cupom'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='acessoproduto',
+            index=models.Index(fields=['usuario', 'ativo', '-liberado_em'], name='produtos_acesso_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conteudodigital',
+            index=models.Index(fields=['produto', 'liberado', 'ordem'], name='produtos_conteudo_lib_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'status', '-criado_em'], name='produtos_pedido_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['transaction_id'], name='produtos_pedido_transacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', '-criado_em'], name='produtos_pedido_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['status', '-destaque', 'ordem', '-criado_em'], name='produtos_catalogo_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0006_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='cupom_status',
+            field=models.CharField(blank=True, choices=[('reservado', 'Reservado'), ('confirmado', 'Confirmado'), ('liberado', 'Liberado')], help_text='Situação do uso do cupom (reservado na criação, confirmado na aprovação)', max_length=20),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0007_pedido_cupom_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('codigo_cupom', models.CharField(blank=True, max_length=50, verbose_name='Cupom')),
+                ('pedidos', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('bruto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Bruto')),
+                ('desconto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Desconto')),
+                ('liquido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Líquido')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='vendas_diarias', to='produtos.produto')),
+            ],
+            options={
+                'verbose_name': 'Venda diária',
+                'verbose_name_plural': 'Vendas diárias',
+                'ordering': ['-dia', 'produto'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='vendadiaria',
+            constraint=models.UniqueConstraint(fields=('dia', 'produto', 'codigo_cupom'), name='produtos_venda_diaria_unica'),
+        ),
+    ]
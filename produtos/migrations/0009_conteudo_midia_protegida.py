@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:21
+
+import os
+import shutil
+
+import produtos.armazenamento
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _mover_arquivos(apps, origem, destino):
+    ConteudoDigital = apps.get_model('produtos', 'ConteudoDigital')
+    for arquivo, imagem in ConteudoDigital.objects.values_list('arquivo', 'imagem'):
+        for nome in (arquivo, imagem):
+            if not nome:
+                continue
+            de = os.path.join(origem, nome)
+            para = os.path.join(destino, nome)
+            if os.path.isfile(de) and not os.path.exists(para):
+                os.makedirs(os.path.dirname(para), exist_ok=True)
+                shutil.move(de, para)
+
+
+def mover_para_midia_protegida(apps, schema_editor):
+    _mover_arquivos(apps, str(settings.MEDIA_ROOT), str(settings.MIDIA_PROTEGIDA_ROOT))
+
+
+def mover_para_media(apps, schema_editor):
+    _mover_arquivos(apps, str(settings.MIDIA_PROTEGIDA_ROOT), str(settings.MEDIA_ROOT))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0008_vendadiaria'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conteudodigital',
+            name='arquivo',
+            field=models.FileField(blank=True, help_text='Para PDF, vídeo, ZIP', null=True, storage=produtos.armazenamento.midia_protegida, upload_to='produtos/conteudos/'),
+        ),
+        migrations.AlterField(
+            model_name='conteudodigital',
+            name='imagem',
+            field=models.ImageField(blank=True, help_text='Para planilhas de treino, infográficos, etc', null=True, storage=produtos.armazenamento.midia_protegida, upload_to='produtos/imagens/'),
+        ),
+        # Os nomes gravados no banco não mudam: só os arquivos saem de MEDIA_ROOT
+        migrations.RunPython(mover_para_midia_protegida, mover_para_media),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0009_conteudo_midia_protegida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('codigo_cupom', models.CharField(blank=True, max_length=50, verbose_name='Cupom')),
+                ('pedidos', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Pedidos do dia',
+                'verbose_name_plural': 'Pedidos por dia',
+                'ordering': ['-dia'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pedidodiario',
+            constraint=models.UniqueConstraint(fields=('dia', 'codigo_cupom'), name='produtos_pedido_diario_unico'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils.text import slugify
 from decimal import Decimal
 
+from .armazenamento import midia_protegida
+
 
 class Categoria(models.Model):
     """Categorias de produtos: Ebooks, Cursos, Treinos, etc"""
@@ -96,6 +98,10 @@ class Produto(models.Model):
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         ordering = ['-destaque', 'ordem', '-criado_em']
+        indexes = [
+            # Catálogo e página inicial: publicados na ordem de exibição
+            models.Index(fields=['status', '-destaque', 'ordem', '-criado_em'], name='produtos_catalogo_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -159,8 +165,9 @@ class ConteudoDigital(models.Model):
     ordem = models.PositiveIntegerField(default=0)
     
     # Diferentes tipos de conteúdo
-    arquivo = models.FileField(upload_to='produtos/conteudos/', blank=True, null=True, help_text="Para PDF, vídeo, ZIP")
-    imagem = models.ImageField(upload_to='produtos/imagens/', blank=True, null=True, help_text="Para planilhas de treino, infográficos, etc")
+    # Arquivos pagos: storage privado (fora de MEDIA_ROOT), entregues só após verificar o acesso
+    arquivo = models.FileField(upload_to='produtos/conteudos/', storage=midia_protegida, blank=True, null=True, help_text="Para PDF, vídeo, ZIP")
+    imagem = models.ImageField(upload_to='produtos/imagens/', storage=midia_protegida, blank=True, null=True, help_text="Para planilhas de treino, infográficos, etc")
     url_externa = models.URLField(blank=True, help_text="Para vídeos externos ou links")
     texto_html = models.TextField(blank=True, help_text="Para conteúdo em texto/HTML")
     
@@ -173,6 +180,9 @@ class ConteudoDigital(models.Model):
         verbose_name = "Conteúdo Digital"
         verbose_name_plural = "Conteúdos Digitais"
         ordering = ['ordem', 'titulo']
+        indexes = [
+            models.Index(fields=['produto', 'liberado', 'ordem'], name='produtos_conteudo_lib_idx'),
+        ]
     
     def __str__(self):
         return f"{self.produto.nome} - {self.titulo}"
@@ -203,6 +213,15 @@ class Pedido(models.Model):
         max_length=50, blank=True,
         help_text="Código do cupom (preservado mesmo se o cupom for excluído)"
     )
+    CUPOM_STATUS_CHOICES = [
+        ('reservado', 'Reservado'),
+        ('confirmado', 'Confirmado'),
+        ('liberado', 'Liberado'),
+    ]
+    cupom_status = models.CharField(
+        max_length=20, choices=CUPOM_STATUS_CHOICES, blank=True,
+        help_text="Situação do uso do cupom (reservado na criação, confirmado na aprovação)"
+    )
 
     # Valores
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
@@ -227,17 +246,22 @@ class Pedido(models.Model):
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-criado_em']
+        indexes = [
+            # Pedido pendente do usuário (checkout) e histórico no dashboard
+            models.Index(fields=['usuario', 'status', '-criado_em'], name='produtos_pedido_usuario_idx'),
+            # Retorno/fallback do Mercado Pago e conciliação
+            models.Index(fields=['transaction_id'], name='produtos_pedido_transacao_idx'),
+            # Admin, limpeza de pendentes e relatórios por status
+            models.Index(fields=['status', '-criado_em'], name='produtos_pedido_status_idx'),
+        ]
     
     def __str__(self):
         return f"Pedido #{self.id} - {self.usuario.email}"
     
     def liberar_acesso_produtos(self):
         """Libera acesso aos produtos quando o pedido é aprovado"""
-        for item in self.itens.all():
-            AcessoProduto.objects.get_or_create(
-                usuario=self.usuario,
-                produto=item.produto
-            )
+        from .acessos import liberar_acessos
+        return liberar_acessos([self])
 
 
 class ItemPedido(models.Model):
@@ -278,6 +302,9 @@ class AcessoProduto(models.Model):
         verbose_name_plural = "Acessos aos Produtos"
         unique_together = ['usuario', 'produto']
         ordering = ['-liberado_em']
+        indexes = [
+            models.Index(fields=['usuario', 'ativo', '-liberado_em'], name='produtos_acesso_usuario_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario.email} - {self.produto.nome}"
@@ -291,3 +318,57 @@ class AcessoProduto(models.Model):
             from django.utils import timezone
             return timezone.now() < self.expira_em
         return True
+
+
+class VendaDiaria(models.Model):
+    """
+    Vendas consolidadas por dia x produto x cupom (pedidos aprovados).
+    Atualizada a cada aprovação/estorno (produtos/vendas.py) e reconstruída
+    por `python manage.py recalcular_vendas_diarias`.
+    """
+    dia = models.DateField('Dia')
+    produto = models.ForeignKey(Produto, on_delete=models.PROTECT, related_name='vendas_diarias')
+    codigo_cupom = models.CharField('Cupom', max_length=50, blank=True)
+
+    pedidos = models.IntegerField('Pedidos', default=0)
+    quantidade = models.IntegerField('Quantidade', default=0)
+    bruto = models.DecimalField('Bruto', max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    desconto = models.DecimalField('Desconto', max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    liquido = models.DecimalField('Líquido', max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Venda diária"
+        verbose_name_plural = "Vendas diárias"
+        ordering = ['-dia', 'produto']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'produto', 'codigo_cupom'], name='produtos_venda_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia:%d/%m/%Y} - {self.produto_id} - R$ {self.liquido}"
+
+
+class PedidoDiario(models.Model):
+    """
+    Pedidos aprovados por dia x cupom, sem o produto: um pedido com vários
+    produtos conta uma vez (em VendaDiaria conta uma vez por produto).
+    Mantida junto com VendaDiaria (produtos/vendas.py).
+    """
+    dia = models.DateField('Dia')
+    codigo_cupom = models.CharField('Cupom', max_length=50, blank=True)
+    pedidos = models.IntegerField('Pedidos', default=0)
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Pedidos do dia"
+        verbose_name_plural = "Pedidos por dia"
+        ordering = ['-dia']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'codigo_cupom'], name='produtos_pedido_diario_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia:%d/%m/%Y} - {self.pedidos} pedido(s)"
@@ -0,0 +1,29 @@
+"""
+Sinais do app produtos: alterações no catálogo invalidam o cache (ver cache.py)
+e alterações em acessos invalidam o cache de acessos do usuário (ver acessos.py).
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .acessos import invalidar_acessos
+from .cache import invalidar_catalogo
+from .models import Produto, Categoria, ConteudoDigital, AcessoProduto
+
+
+@receiver([post_save, post_delete], sender=Produto)
+@receiver([post_save, post_delete], sender=Categoria)
+@receiver([post_save, post_delete], sender=ConteudoDigital)
+def invalidar_cache_catalogo(sender, **kwargs):
+    invalidar_catalogo()
+
+
+@receiver([post_save, post_delete], sender=ConteudoDigital)
+def atualizar_produto_do_conteudo(sender, instance, **kwargs):
+    """Mudança de conteúdo altera a página do produto: renova o validador HTTP (atualizado_em)."""
+    Produto.objects.filter(id=instance.produto_id).update(atualizado_em=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=AcessoProduto)
+def invalidar_cache_acessos(sender, instance, **kwargs):
+    invalidar_acessos(instance.usuario_id)
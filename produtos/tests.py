@@ -1,3 +1,607 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
+import os
+import shutil
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from personal.tests import ChangelistMixin
+from .acessos import acesso_produto, acessos_ativos, acessos_usuario, invalidar_acessos, liberar_acessos
+from .cache import produtos_publicados, versao_catalogo
+from .checks import verificar_cache_contadores
+from .management.commands.verificar_planos_consulta import consultas_quentes, varredura_completa
+from .contadores import CHAVE_SEQUENCIA, aplicar_contadores, gravar_contadores, registrar_visualizacao
+from .models import AcessoProduto, Categoria, ConteudoDigital, ItemPedido, Pedido, PedidoDiario, Produto, VendaDiaria
+from .vendas import recalcular_vendas, registrar_vendas
+
+User = get_user_model()
+
+
+def criar_produto(slug='ebook', preco='10.00', categoria=None):
+    categoria = categoria or Categoria.objects.get_or_create(nome='Ebooks', slug='ebooks')[0]
+    return Produto.objects.create(nome=slug.title(), slug=slug, categoria=categoria, preco=preco)
+
+
+@override_settings(CONTADORES_ACESSO='cache')
+class ContadoresAcessoTestCase(TestCase):
+    """Contadores de visualização no cache (redis), gravados em lote por gravar_contadores."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.acesso = AcessoProduto.objects.create(usuario=self.usuario, produto=criar_produto())
+
+    def gravar(self):
+        # O desconto no cache acontece no on_commit da gravação
+        with self.captureOnCommitCallbacks(execute=True):
+            return gravar_contadores()
+
+    def total_gravado(self):
+        return AcessoProduto.objects.get(pk=self.acesso.pk).total_acessos
+
+    def test_visualizacao_nao_escreve_no_banco(self):
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                registrar_visualizacao(self.acesso)
+        self.assertEqual(self.gravar(), 1)
+        self.assertEqual(self.total_gravado(), 5)
+        self.assertEqual(self.gravar(), 0)
+
+    def test_falha_na_gravacao_mantem_contadores(self):
+        for _ in range(3):
+            registrar_visualizacao(self.acesso)
+        with mock.patch.object(AcessoProduto.objects, 'bulk_update', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.gravar()
+
+        registrar_visualizacao(self.acesso)
+        self.gravar()
+        self.assertEqual(self.total_gravado(), 4)
+
+    def test_visualizacoes_apos_gravacao_voltam_a_ser_pendentes(self):
+        registrar_visualizacao(self.acesso)
+        self.gravar()
+        registrar_visualizacao(self.acesso)
+        registrar_visualizacao(self.acesso)
+        self.gravar()
+        self.assertEqual(self.total_gravado(), 3)
+
+    def reservar_sem_marcador(self):
+        """Outra visualização reservou a próxima posição e ainda não gravou o marcador."""
+        outro = AcessoProduto.objects.create(usuario=self.usuario, produto=criar_produto('outro'))
+        cache.add(CHAVE_SEQUENCIA, 0, None)
+        posicao = cache.incr(CHAVE_SEQUENCIA)
+        cache.set(f'contadores:acesso:{outro.pk}', 1, None)
+        return outro, f'contadores:pendente:{posicao}'
+
+    def test_posicao_reservada_sem_marcador_nao_e_perdida(self):
+        registrar_visualizacao(self.acesso)
+        outro, marcador = self.reservar_sem_marcador()
+
+        self.assertEqual(self.gravar(), 1)
+        cache.set(marcador, (outro.pk, self.usuario.pk), None)
+        self.assertEqual(self.gravar(), 1)
+        self.assertEqual(AcessoProduto.objects.get(pk=outro.pk).total_acessos, 1)
+
+    def test_marcador_atrasado_e_gravado_antes_do_timeout(self):
+        outro, marcador = self.reservar_sem_marcador()
+        registrar_visualizacao(self.acesso)
+
+        # Duas gravações com a lacuna aberta: nada depois dela é gravado nem descartado
+        self.assertEqual(self.gravar(), 0)
+        self.assertEqual(self.gravar(), 0)
+        cache.set(marcador, (outro.pk, self.usuario.pk), None)
+
+        self.assertEqual(self.gravar(), 2)
+        self.assertEqual(AcessoProduto.objects.get(pk=outro.pk).total_acessos, 1)
+        self.assertEqual(self.total_gravado(), 1)
+
+    @override_settings(CONTADORES_LACUNA_TIMEOUT=60)
+    def test_lacuna_abandonada_e_ignorada_apos_o_timeout(self):
+        self.reservar_sem_marcador()
+        registrar_visualizacao(self.acesso)
+        agora = time.time()
+
+        with mock.patch('produtos.contadores.time.time', return_value=agora):
+            self.assertEqual(self.gravar(), 0)
+        with mock.patch('produtos.contadores.time.time', return_value=agora + 59):
+            self.assertEqual(self.gravar(), 0)
+        with mock.patch('produtos.contadores.time.time', return_value=agora + 60):
+            self.assertEqual(self.gravar(), 1)
+        self.assertEqual(self.total_gravado(), 1)
+
+    @override_settings(CONTADORES_ACESSO='banco')
+    def test_sem_cache_grava_direto(self):
+        registrar_visualizacao(self.acesso)
+        self.assertEqual(self.total_gravado(), 1)
+        self.assertEqual(self.gravar(), 0)
+
+    def test_contadores_nao_invalidam_o_cache_de_acessos(self):
+        acessos_usuario(self.usuario)
+        registrar_visualizacao(self.acesso)
+        registrar_visualizacao(self.acesso)
+        self.gravar()
+        registrar_visualizacao(self.acesso)
+
+        with self.assertNumQueries(0):
+            acessos = acessos_usuario(self.usuario)
+        self.assertEqual(acessos[0].total_acessos, 0)
+        # Valores atuais: gravados no banco + pendentes no cache
+        with self.assertNumQueries(1):
+            aplicar_contadores(acessos)
+        self.assertEqual(acessos[0].total_acessos, 3)
+        self.assertIsNotNone(acessos[0].ultimo_acesso)
+
+    @override_settings(CONTADORES_ACESSO='banco')
+    def test_gravacao_direta_nao_invalida_o_cache_de_acessos(self):
+        acessos_usuario(self.usuario)
+        registrar_visualizacao(self.acesso)
+        with self.assertNumQueries(1):
+            acessos = aplicar_contadores(acessos_usuario(self.usuario))
+        self.assertEqual(acessos[0].total_acessos, 1)
+
+    def test_cache_nao_atomico_e_recusado(self):
+        arquivo = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=arquivo):
+            self.assertEqual([erro.id for erro in verificar_cache_contadores(None)], ['produtos.E001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(verificar_cache_contadores(None), [])
+
+
+class ContadoresArquivoTestCase(TestCase):
+    """Contadores de visualização em arquivo (padrão com o cache em arquivo)."""
+
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, True)
+        configuracao = override_settings(
+            CONTADORES_ACESSO='arquivo', CONTADORES_ACESSO_PASTA=os.path.join(pasta, 'contadores'),
+            CONTADORES_ACESSO_CARENCIA=0,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.pasta = os.path.join(pasta, 'contadores')
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.acesso = AcessoProduto.objects.create(usuario=self.usuario, produto=criar_produto())
+
+    def gravar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return gravar_contadores()
+
+    def test_visualizacao_nao_escreve_no_banco(self):
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                registrar_visualizacao(self.acesso)
+
+        self.assertEqual(self.gravar(), 1)
+        acesso = AcessoProduto.objects.get(pk=self.acesso.pk)
+        self.assertEqual(acesso.total_acessos, 5)
+        self.assertIsNotNone(acesso.ultimo_acesso)
+        self.assertEqual(os.listdir(self.pasta), [])
+        self.assertEqual(self.gravar(), 0)
+
+    def test_falha_na_gravacao_mantem_os_arquivos(self):
+        registrar_visualizacao(self.acesso)
+        with mock.patch.object(AcessoProduto.objects, 'bulk_update', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.gravar()
+
+        registrar_visualizacao(self.acesso)
+        self.assertEqual(self.gravar(), 1)
+        self.assertEqual(AcessoProduto.objects.get(pk=self.acesso.pk).total_acessos, 2)
+
+    def test_linha_incompleta_e_ignorada(self):
+        registrar_visualizacao(self.acesso)
+        with open(os.path.join(self.pasta, 'pendentes-99999.log'), 'a') as arquivo:
+            arquivo.write(f'{self.acesso.pk} 17')
+        self.gravar()
+        self.assertEqual(AcessoProduto.objects.get(pk=self.acesso.pk).total_acessos, 1)
+
+    @override_settings(CONTADORES_ACESSO_CARENCIA=60)
+    def test_arquivo_renomeado_so_e_lido_apos_a_carencia(self):
+        registrar_visualizacao(self.acesso)
+        with mock.patch('produtos.contadores.time.sleep') as esperar:
+            self.gravar()
+        self.assertGreater(esperar.call_args.args[0], 59)
+
+
+class IndicesConsultasTestCase(TestCase):
+    """As consultas quentes usam os índices de Meta.indexes (sem varredura completa)."""
+
+    INDICES = {
+        Pedido: ['produtos_pedido_usuario_idx', 'produtos_pedido_transacao_idx', 'produtos_pedido_status_idx'],
+        AcessoProduto: ['produtos_acesso_usuario_idx'],
+        Produto: ['produtos_catalogo_idx'],
+        ConteudoDigital: ['produtos_conteudo_lib_idx'],
+    }
+
+    def test_indices_existem_no_banco(self):
+        with connection.cursor() as cursor:
+            for modelo, nomes in self.INDICES.items():
+                restricoes = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+                for nome in nomes:
+                    with self.subTest(indice=nome):
+                        self.assertIn(nome, restricoes)
+                        self.assertTrue(restricoes[nome]['index'])
+
+    def test_consultas_quentes_nao_varrem_a_tabela(self):
+        for descricao, queryset in consultas_quentes():
+            with self.subTest(consulta=descricao):
+                plano = queryset.explain()
+                self.assertFalse(varredura_completa(plano, queryset.model._meta.db_table), plano)
+
+    def test_deteccao_de_varredura_completa(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Planos no formato do SQLite')
+        self.assertTrue(varredura_completa('SCAN produtos_pedido', 'produtos_pedido'))
+        self.assertFalse(varredura_completa(
+            'SEARCH produtos_pedido USING INDEX produtos_pedido_usuario_idx (usuario_id=?)', 'produtos_pedido'
+        ))
+        self.assertFalse(varredura_completa(
+            'SCAN produtos_produto USING INDEX produtos_catalogo_idx', 'produtos_produto'
+        ))
+
+
+class ChangelistsProdutosTestCase(ChangelistMixin, TestCase):
+    """Changelists do admin de produtos: consultas constantes em relação ao número de linhas."""
+
+    def novos_usuarios(self, n):
+        inicio = User.objects.count()
+        return [User.objects.create_user(username=f'u{inicio + i}@a.com', email=f'u{inicio + i}@a.com')
+                for i in range(n)]
+
+    def novos_produtos(self, n):
+        inicio = Produto.objects.count()
+        return [criar_produto(f'p{inicio + i}', categoria=Categoria.objects.create(
+            nome=f'C{inicio + i}', slug=f'c{inicio + i}')) for i in range(n)]
+
+    def test_categorias(self):
+        self.assertChangelistConstante(Categoria, self.novos_produtos)
+
+    def test_produtos(self):
+        self.assertChangelistConstante(Produto, self.novos_produtos)
+
+    def test_conteudos(self):
+        def criar(n):
+            for produto in self.novos_produtos(n):
+                ConteudoDigital.objects.create(produto=produto, titulo='Aula', tipo='texto')
+        self.assertChangelistConstante(ConteudoDigital, criar)
+
+    def test_pedidos(self):
+        def criar(n):
+            for usuario in self.novos_usuarios(n):
+                pedido = Pedido.objects.create(
+                    usuario=usuario, nome_compra='Aluno', email_compra=usuario.email,
+                    subtotal='10.00', desconto='0.00', total='10.00',
+                )
+                ItemPedido.objects.create(
+                    pedido=pedido, produto=self.novos_produtos(1)[0], nome_produto='P',
+                    preco_unitario='10.00', quantidade=1, subtotal='10.00',
+                )
+        self.assertChangelistConstante(Pedido, criar)
+
+    def test_acessos(self):
+        def criar(n):
+            for usuario, produto in zip(self.novos_usuarios(n), self.novos_produtos(n)):
+                AcessoProduto.objects.create(usuario=usuario, produto=produto)
+        self.assertChangelistConstante(AcessoProduto, criar)
+
+    def test_vendas_diarias(self):
+        def criar(n):
+            for produto in self.novos_produtos(n):
+                VendaDiaria.objects.create(dia=timezone.localdate(), produto=produto, pedidos=1, quantidade=1,
+                                           bruto='10.00', liquido='10.00')
+        self.assertChangelistConstante(VendaDiaria, criar)
+
+
+class CacheAcessosTestCase(TestCase):
+    """Acessos do usuário no cache, com versão por usuário."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.produto = criar_produto()
+        self.acesso = AcessoProduto.objects.create(usuario=self.usuario, produto=self.produto)
+
+    def test_segunda_leitura_vem_do_cache(self):
+        acessos_usuario(self.usuario)
+        with self.assertNumQueries(0):
+            self.assertEqual(acessos_ativos(self.usuario), [self.acesso])
+
+    def test_acesso_inativo_ou_expirado_continua_sendo_encontrado(self):
+        AcessoProduto.objects.filter(pk=self.acesso.pk).update(ativo=False)
+        acesso = acesso_produto(self.usuario, 'ebook')
+        self.assertEqual(acesso, self.acesso)
+        self.assertFalse(acesso.is_ativo)
+        self.assertEqual(acessos_ativos(self.usuario), [])
+        self.assertIsNone(acesso_produto(self.usuario, 'outro'))
+
+    def test_alteracao_do_acesso_troca_a_versao_do_usuario(self):
+        outro = User.objects.create_user(username='outro@a.com', email='outro@a.com', password='x12345')
+        AcessoProduto.objects.create(usuario=outro, produto=self.produto)
+        acessos_usuario(self.usuario)
+        acessos_usuario(outro)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.acesso.ativo = False
+            self.acesso.save()
+
+        self.assertEqual(acessos_ativos(self.usuario), [])
+        with self.assertNumQueries(0):
+            acessos_usuario(outro)
+
+    def test_alteracao_do_catalogo_nao_invalida_os_acessos(self):
+        acessos_usuario(self.usuario)
+        criar_produto('novo')
+        with self.assertNumQueries(0):
+            acessos_usuario(self.usuario)
+
+    def test_leitura_anterior_a_invalidacao_nao_volta_ao_cache(self):
+        # Leitura em andamento: consultou o banco antes da troca de versão e grava depois
+        with mock.patch('produtos.acessos.cache.set', wraps=cache.set) as gravar:
+            def invalidar_antes_de_gravar(*args, **kwargs):
+                gravar.side_effect = None
+                with self.captureOnCommitCallbacks(execute=True):
+                    invalidar_acessos(self.usuario.pk)
+                return cache.set(*args, **kwargs)
+            gravar.side_effect = invalidar_antes_de_gravar
+            acessos_usuario(self.usuario)
+
+        with self.assertNumQueries(1):
+            acessos_usuario(self.usuario)
+
+
+class PainelVendasTestCase(ChangelistMixin, TestCase):
+    """Painel de vendas diárias: um pedido com vários produtos conta uma vez."""
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.ebook = criar_produto('ebook')
+        self.treino = criar_produto('treino')
+        self.url = reverse('admin:produtos_vendadiaria_changelist')
+
+    def aprovar(self, *produtos):
+        pedido = Pedido.objects.create(
+            usuario=self.usuario, nome_compra='Aluno', email_compra=self.usuario.email,
+            subtotal=Decimal('10.00') * len(produtos), desconto=Decimal('0.00'),
+            total=Decimal('10.00') * len(produtos), status='aprovado', aprovado_em=timezone.now(),
+        )
+        for produto in produtos:
+            ItemPedido.objects.create(
+                pedido=pedido, produto=produto, nome_produto=produto.nome,
+                preco_unitario=Decimal('10.00'), quantidade=1, subtotal=Decimal('10.00'),
+            )
+        registrar_vendas([pedido.id])
+        return pedido
+
+    def pedidos_no_painel(self, exato=True, **filtros):
+        with CaptureQueriesContext(connection) as consultas:
+            contexto = self.client.get(self.url, filtros).context
+        # Só as tabelas consolidadas: nada de pedidos/itens
+        for consulta in consultas.captured_queries:
+            self.assertNotIn('produtos_itempedido', consulta['sql'])
+            self.assertNotIn('"produtos_pedido"', consulta['sql'])
+        meses = contexto['vendas_por_mes']
+        self.assertEqual(len(meses), 1)
+        self.assertEqual(meses[0]['pedidos'], contexto['resumo_vendas']['pedidos'])
+        self.assertEqual(contexto['resumo_vendas']['pedidos_exato'], exato)
+        return contexto['resumo_vendas']['pedidos']
+
+    def test_pedido_com_varios_produtos_conta_uma_vez(self):
+        self.aprovar(self.ebook, self.treino)
+        self.aprovar(self.ebook)
+
+        self.assertEqual(VendaDiaria.objects.get(produto=self.ebook).pedidos, 2)
+        self.assertEqual(PedidoDiario.objects.get().pedidos, 2)
+        self.assertEqual(self.pedidos_no_painel(), 2)
+
+    def test_filtro_por_produto_conta_pedidos_distintos(self):
+        self.aprovar(self.ebook, self.treino)
+        self.aprovar(self.treino)
+
+        self.assertEqual(self.pedidos_no_painel(produto__id__exact=self.ebook.pk), 1)
+        self.assertEqual(self.pedidos_no_painel(produto__id__exact=self.treino.pk), 2)
+        # A busca encontra um só produto: a contagem por produto é exata
+        self.assertEqual(self.pedidos_no_painel(q='Ebook'), 1)
+        # A busca encontra todos os produtos do dia: o pedido com ambos conta uma vez
+        Produto.objects.filter(pk__in=[self.ebook.pk, self.treino.pk]).update(nome='Plano')
+        self.assertEqual(self.pedidos_no_painel(q='Plano'), 2)
+
+    def test_busca_com_parte_dos_produtos_do_dia_soma_por_produto(self):
+        terceiro = criar_produto('livro')
+        self.aprovar(self.ebook, self.treino, terceiro)
+        Produto.objects.filter(pk__in=[self.ebook.pk, self.treino.pk]).update(nome='Plano')
+
+        self.assertEqual(self.pedidos_no_painel(exato=False, q='Plano'), 2)
+        self.assertContains(self.client.get(self.url, {'q': 'Plano'}), 'Pedidos (somados por produto)')
+
+    def test_recalculo_reconstroi_os_pedidos_do_dia(self):
+        self.aprovar(self.ebook, self.treino)
+        PedidoDiario.objects.update(pedidos=5)
+
+        recalcular_vendas()
+        self.assertEqual(PedidoDiario.objects.get().pedidos, 1)
+        self.assertEqual(self.pedidos_no_painel(), 1)
+
+
+class CancelarPedidosTestCase(TestCase):
+    """Ação do admin que cancela pedidos: aprovados perdem o acesso e saem das vendas."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser(username='admin', email='admin@a.com', password='x12345')
+        self.client.force_login(admin)
+        self.usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.produto = criar_produto()
+
+    def aprovar(self, quantidade=1):
+        pedido = Pedido.objects.create(
+            usuario=self.usuario, nome_compra='Aluno', email_compra=self.usuario.email,
+            subtotal=Decimal('10.00'), desconto=Decimal('0.00'), total=Decimal('10.00'),
+            status='aprovado', aprovado_em=timezone.now(),
+        )
+        ItemPedido.objects.create(
+            pedido=pedido, produto=self.produto, nome_produto=self.produto.nome,
+            preco_unitario=Decimal('10.00'), quantidade=quantidade, subtotal=Decimal('10.00'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            liberar_acessos([pedido])
+            registrar_vendas([pedido.id])
+        return pedido
+
+    def cancelar(self, *pedidos):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:produtos_pedido_changelist'), {
+                'action': 'cancelar_pedidos', '_selected_action': [pedido.pk for pedido in pedidos],
+            })
+
+    def test_pedido_aprovado_cancelado_perde_o_acesso(self):
+        pedido = self.aprovar(quantidade=2)
+        self.assertEqual(len(acessos_ativos(self.usuario)), 1)
+
+        self.cancelar(pedido)
+
+        self.assertEqual(Pedido.objects.get(pk=pedido.pk).status, 'cancelado')
+        self.assertFalse(AcessoProduto.objects.get(usuario=self.usuario).ativo)
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).total_vendas, 0)
+        self.assertEqual(VendaDiaria.objects.get().pedidos, 0)
+        # A versão do cache foi trocada: o dashboard já não mostra o acesso
+        self.assertEqual(acessos_ativos(self.usuario), [])
+
+    def test_acesso_de_outro_pedido_aprovado_continua_ativo(self):
+        cancelado = self.aprovar()
+        self.aprovar()
+
+        self.cancelar(cancelado)
+
+        self.assertTrue(AcessoProduto.objects.get(usuario=self.usuario).ativo)
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).total_vendas, 1)
+
+    def test_pedido_cancelado_e_aprovado_de_novo_recupera_o_acesso(self):
+        pedido = self.aprovar()
+        self.cancelar(pedido)
+        self.assertEqual(acessos_ativos(self.usuario), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:produtos_pedido_changelist'), {
+                'action': 'aprovar_pedidos', '_selected_action': [pedido.pk],
+            })
+
+        self.assertEqual(Pedido.objects.get(pk=pedido.pk).status, 'aprovado')
+        self.assertEqual(list(AcessoProduto.objects.values_list('ativo', flat=True)), [True])
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).total_vendas, 1)
+        self.assertEqual(len(acessos_ativos(self.usuario)), 1)
+
+    def test_pedido_pendente_cancelado_nao_mexe_nas_vendas(self):
+        self.aprovar()
+        pendente = Pedido.objects.create(
+            usuario=self.usuario, nome_compra='Aluno', email_compra=self.usuario.email,
+            subtotal=Decimal('10.00'), desconto=Decimal('0.00'), total=Decimal('10.00'),
+        )
+
+        self.cancelar(pendente)
+
+        self.assertEqual(Pedido.objects.get(pk=pendente.pk).status, 'cancelado')
+        self.assertTrue(AcessoProduto.objects.get(usuario=self.usuario).ativo)
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).total_vendas, 1)
+
+
+class PaginaProdutoTestCase(TestCase):
+    """Página pública do produto: ETag/304 e HTML em cache só para visitantes anônimos."""
+
+    def setUp(self):
+        cache.clear()
+        self.produto = criar_produto()
+        Produto.objects.filter(pk=self.produto.pk).update(status='publicado')
+        self.url = reverse('produtos:produto_vendas', args=['ebook'])
+
+    def test_etag_e_304(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta['ETag'])
+
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_etag_muda_com_o_produto_e_com_os_conteudos(self):
+        etag = self.client.get(self.url)['ETag']
+
+        produto = Produto.objects.get(pk=self.produto.pk)
+        produto.nome = 'Ebook novo'
+        produto.save()
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'Ebook novo')
+        self.assertNotEqual(resposta['ETag'], etag)
+
+        etag = resposta['ETag']
+        ConteudoDigital.objects.create(produto=produto, titulo='Aula 1', tipo='texto')
+        resposta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_pagina_anonima_em_cache_nao_consulta_o_banco(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotContains(resposta, 'pagina_publica__')
+        self.assertIn('private', resposta['Cache-Control'])
+
+    def test_usuario_logado_nunca_recebe_a_pagina_em_cache(self):
+        self.client.get(self.url)
+        usuario = User.objects.create_user(username='aluno@a.com', email='aluno@a.com', password='x12345')
+        self.client.force_login(usuario)
+
+        with mock.patch('produtos.views.pagina_em_cache') as pagina_em_cache:
+            resposta = self.client.get(self.url)
+        pagina_em_cache.assert_not_called()
+        self.assertFalse(resposta.has_header('ETag'))
+        self.assertContains(resposta, 'Área do Aluno')
+        self.assertNotContains(resposta, 'pagina_publica__')
+
+
+class CacheCatalogoTestCase(TestCase):
+    """Os sinais trocam a versão do catálogo: as listas em cache são reconstruídas."""
+
+    def setUp(self):
+        cache.clear()
+        self.produto = criar_produto()
+        Produto.objects.filter(pk=self.produto.pk).update(status='publicado')
+
+    def test_salvar_produto_troca_a_versao(self):
+        versao = versao_catalogo()
+        self.assertEqual([p.nome for p in produtos_publicados()], ['Ebook'])
+        with self.assertNumQueries(0):
+            produtos_publicados()
+
+        self.produto.refresh_from_db()
+        self.produto.nome = 'Ebook novo'
+        self.produto.save()
+
+        self.assertNotEqual(versao_catalogo(), versao)
+        self.assertEqual([p.nome for p in produtos_publicados()], ['Ebook novo'])
+
+    def test_salvar_e_excluir_conteudo_troca_a_versao(self):
+        versao = versao_catalogo()
+        conteudo = ConteudoDigital.objects.create(produto=self.produto, titulo='Aula 1', tipo='texto')
+        self.assertNotEqual(versao_catalogo(), versao)
+
+        versao = versao_catalogo()
+        conteudo.titulo = 'Aula 1 revisada'
+        conteudo.save()
+        self.assertNotEqual(versao_catalogo(), versao)
+
+        versao = versao_catalogo()
+        conteudo.delete()
+        self.assertNotEqual(versao_catalogo(), versao)
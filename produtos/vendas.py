@@ -0,0 +1,202 @@
+"""
+Vendas diárias consolidadas (VendaDiaria)
+
+Cada item de pedido aprovado soma na linha (dia da aprovação, produto, cupom):
+pedidos, quantidade, bruto (subtotal do item), desconto (o desconto do pedido
+rateado entre os itens na proporção do subtotal) e líquido.
+
+Incremental: `registrar_vendas` na aprovação e `estornar_vendas` no
+reembolso/cancelamento de um pedido aprovado, com UPDATE ... SET x = x + n na
+mesma transação da mudança de status. `recalcular_vendas` reconstrói um
+período inteiro a partir dos pedidos (comando `recalcular_vendas_diarias`).
+
+PedidoDiario guarda, junto, os pedidos distintos por (dia, cupom): somar
+VendaDiaria.pedidos entre produtos contaria N vezes um pedido com N produtos.
+O painel do admin lê apenas estas duas tabelas (`contar_pedidos`).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ItemPedido, PedidoDiario, VendaDiaria
+
+CENTAVO = Decimal('0.01')
+
+_CAMPOS_ITEM = (
+    'pedido_id', 'produto_id', 'quantidade', 'subtotal',
+    'pedido__subtotal', 'pedido__desconto', 'pedido__codigo_cupom',
+    'pedido__aprovado_em', 'pedido__criado_em',
+)
+
+
+def _novo_total():
+    return {
+        'pedidos': 0,
+        'quantidade': 0,
+        'bruto': Decimal('0.00'),
+        'desconto': Decimal('0.00'),
+        'liquido': Decimal('0.00'),
+    }
+
+
+def _acumular(itens, totais, pedidos):
+    """
+    Soma os itens (dicts de _CAMPOS_ITEM, ordenados por pedido) em
+    totais[(dia, produto_id, codigo_cupom)] e conta cada pedido uma vez em
+    pedidos[(dia, codigo_cupom)]. O desconto do pedido é rateado pelos itens;
+    o último item recebe a diferença de arredondamento.
+    """
+    def fechar(grupo):
+        if not grupo:
+            return
+        primeiro = grupo[0]
+        subtotal_pedido = primeiro['pedido__subtotal'] or Decimal('0.00')
+        desconto_pedido = primeiro['pedido__desconto'] or Decimal('0.00')
+        momento = primeiro['pedido__aprovado_em'] or primeiro['pedido__criado_em']
+        dia = timezone.localdate(momento)
+        cupom = primeiro['pedido__codigo_cupom'] or ''
+        pedidos[(dia, cupom)] += 1
+
+        restante = desconto_pedido
+        contados = set()
+        for indice, item in enumerate(grupo):
+            if indice == len(grupo) - 1 or not subtotal_pedido:
+                desconto = restante
+            else:
+                desconto = (desconto_pedido * item['subtotal'] / subtotal_pedido).quantize(CENTAVO, ROUND_HALF_UP)
+            restante -= desconto
+
+            chave = (dia, item['produto_id'], cupom)
+            total = totais[chave]
+            if chave not in contados:
+                total['pedidos'] += 1
+                contados.add(chave)
+            total['quantidade'] += item['quantidade']
+            total['bruto'] += item['subtotal']
+            total['desconto'] += desconto
+            total['liquido'] += item['subtotal'] - desconto
+
+    grupo = []
+    for item in itens:
+        if grupo and item['pedido_id'] != grupo[0]['pedido_id']:
+            fechar(grupo)
+            grupo = []
+        grupo.append(item)
+    fechar(grupo)
+    return totais, pedidos
+
+
+def _totais_pedidos(pedido_ids):
+    itens = ItemPedido.objects.filter(pedido_id__in=pedido_ids).order_by('pedido_id', 'id').values(*_CAMPOS_ITEM)
+    return _acumular(itens, defaultdict(_novo_total), defaultdict(int))
+
+
+def _somar(modelo, chave, total, sinal, agora):
+    filtro = modelo.objects.filter(**chave)
+    incrementos = {campo: F(campo) + sinal * valor for campo, valor in total.items()}
+    if filtro.update(atualizado_em=agora, **incrementos) or sinal < 0:
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**chave, **total)
+    except IntegrityError:
+        # Outra transação criou a linha ao mesmo tempo: soma nela
+        filtro.update(atualizado_em=agora, **incrementos)
+
+
+def _aplicar(totais, pedidos, sinal):
+    agora = timezone.now()
+    for (dia, produto_id, cupom), total in totais.items():
+        _somar(VendaDiaria, {'dia': dia, 'produto_id': produto_id, 'codigo_cupom': cupom}, total, sinal, agora)
+    for (dia, cupom), quantidade in pedidos.items():
+        _somar(PedidoDiario, {'dia': dia, 'codigo_cupom': cupom}, {'pedidos': quantidade}, sinal, agora)
+
+
+def registrar_vendas(pedido_ids):
+    """Soma nas vendas diárias os pedidos que acabaram de ser aprovados."""
+    _aplicar(*_totais_pedidos(pedido_ids), 1)
+
+
+def estornar_vendas(pedido_ids):
+    """Subtrai das vendas diárias pedidos aprovados que foram reembolsados/cancelados."""
+    _aplicar(*_totais_pedidos(pedido_ids), -1)
+
+
+def recalcular_vendas(desde=None, ate=None, lote=5000):
+    """
+    Reconstrói as vendas diárias do período (datas inclusivas, None = sem limite)
+    a partir dos pedidos aprovados. Retorna a quantidade de linhas gravadas.
+    """
+    vendas = VendaDiaria.objects.all()
+    dias = PedidoDiario.objects.all()
+    itens = ItemPedido.objects.filter(pedido__status='aprovado')
+    if desde:
+        vendas = vendas.filter(dia__gte=desde)
+        dias = dias.filter(dia__gte=desde)
+        itens = itens.filter(pedido__aprovado_em__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+    if ate:
+        vendas = vendas.filter(dia__lte=ate)
+        dias = dias.filter(dia__lte=ate)
+        itens = itens.filter(
+            pedido__aprovado_em__lt=timezone.make_aware(datetime.combine(ate + timedelta(days=1), time.min))
+        )
+
+    totais, pedidos = _acumular(
+        itens.order_by('pedido_id', 'id').values(*_CAMPOS_ITEM).iterator(chunk_size=lote),
+        defaultdict(_novo_total),
+        defaultdict(int),
+    )
+    with transaction.atomic():
+        vendas.delete()
+        dias.delete()
+        VendaDiaria.objects.bulk_create(
+            [
+                VendaDiaria(dia=dia, produto_id=produto_id, codigo_cupom=cupom, **total)
+                for (dia, produto_id, cupom), total in totais.items()
+            ],
+            batch_size=1000,
+        )
+        PedidoDiario.objects.bulk_create(
+            [
+                PedidoDiario(dia=dia, codigo_cupom=cupom, pedidos=quantidade)
+                for (dia, cupom), quantidade in pedidos.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totais)
+
+
+def contar_pedidos(vendas, um_produto=False, busca=False):
+    """
+    Pedidos nas vendas diárias selecionadas: (total, {mês: pedidos}, exato).
+    Lê apenas as tabelas consolidadas.
+
+    Com um único produto (filtro por produto), VendaDiaria.pedidos já conta
+    cada pedido uma vez. Sem filtro por produto, a seleção cobre todos os
+    produtos de cada (dia, cupom) e os pedidos vêm de PedidoDiario. Uma busca
+    pode separar produtos de um mesmo dia/cupom: nesse caso os pedidos são
+    somados por produto e, se a busca encontrou mais de um produto, `exato` é
+    False (um pedido com dois produtos encontrados conta duas vezes).
+    """
+    por_produto = um_produto
+    if busca and not um_produto:
+        # Alguma venda de um (dia, cupom) selecionado ficou de fora da busca?
+        por_produto = VendaDiaria.objects.filter(
+            Exists(vendas.filter(dia=OuterRef('dia'), codigo_cupom=OuterRef('codigo_cupom')))
+        ).exclude(pk__in=vendas.values('pk')).exists()
+        um_produto = por_produto and len(vendas.order_by().values('produto_id').distinct()[:2]) == 1
+
+    if por_produto:
+        dias = vendas
+    else:
+        dias = PedidoDiario.objects.filter(
+            Exists(vendas.filter(dia=OuterRef('dia'), codigo_cupom=OuterRef('codigo_cupom')))
+        )
+    total = dias.aggregate(pedidos=Sum('pedidos'))['pedidos'] or 0
+    por_mes = dias.order_by().annotate(mes=TruncMonth('dia')).values('mes').annotate(pedidos=Sum('pedidos'))
+    exato = um_produto or not por_produto
+    return total, {linha['mes']: linha['pedidos'] for linha in por_mes}, exato
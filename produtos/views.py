@@ -1,18 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .acessos import tem_acesso
+from .cache import (
+    produtos_publicados, categorias_ativas, validadores_produto,
+    pagina_em_cache, guardar_pagina,
+)
 from .models import Produto, Categoria, AcessoProduto, Pedido, ItemPedido
 
 
 def catalogo(request):
     """Catálogo de produtos digitais"""
-    produtos = Produto.objects.filter(status='publicado').select_related('categoria')
-    categorias = Categoria.objects.filter(ativo=True)
-    
-    # Filtrar por categoria se especificado
+    # Listas prontas do cache do catálogo (filtradas por categoria se especificado)
     categoria_slug = request.GET.get('categoria')
-    if categoria_slug:
-        produtos = produtos.filter(categoria__slug=categoria_slug)
+    produtos = produtos_publicados(categoria_slug)
+    categorias = categorias_ativas()
     
     context = {
         'produtos': produtos,
@@ -22,42 +30,89 @@ def catalogo(request):
     return render(request, 'produtos/catalogo.html', context)
 
 
+# Marcador do token CSRF no HTML em cache (trocado pelo token de cada visitante)
+CSRF_MARCADOR = '__csrf_token_pagina_publica__'
+
+
+def _pagina_publica(request):
+    """A página pode vir do cache: visitante anônimo com carrinho vazio."""
+    return not request.user.is_authenticated and not request.session.get(settings.CART_SESSION_ID)
+
+
+def _etag_produto(request, slug):
+    if not _pagina_publica(request):
+        return None
+    validadores = validadores_produto(slug)
+    return validadores[0] if validadores else None
+
+
+def _ultima_alteracao_produto(request, slug):
+    if not _pagina_publica(request):
+        return None
+    validadores = validadores_produto(slug)
+    return validadores[1] if validadores else None
+
+
+def _responder_pagina_publica(request, conteudo):
+    response = HttpResponse(conteudo.replace(CSRF_MARCADOR, get_token(request)))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _renderizar_produto(request, nome, slug, template, montar_contexto):
+    """
+    Renderiza a página do produto. Para visitantes anônimos com carrinho vazio,
+    serve o HTML do cache por slug (invalidado junto com o catálogo) sem tocar no banco.
+    """
+    publica = _pagina_publica(request)
+    if publica:
+        conteudo = pagina_em_cache(nome, slug)
+        if conteudo is not None:
+            return _responder_pagina_publica(request, conteudo)
+
+    context = montar_contexto()
+    if not publica:
+        return render(request, template, context)
+
+    context['csrf_token'] = CSRF_MARCADOR
+    conteudo = render_to_string(template, context, request)
+    guardar_pagina(nome, slug, conteudo)
+    return _responder_pagina_publica(request, conteudo)
+
+
+@condition(etag_func=_etag_produto, last_modified_func=_ultima_alteracao_produto)
 def produto_detalhes(request, slug):
     """Detalhes de um produto específico"""
-    produto = get_object_or_404(
-        Produto.objects.select_related('categoria').prefetch_related('conteudos'),
-        slug=slug,
-        status='publicado'
-    )
-    
-    # Verificar se usuário tem acesso (se logado)
-    tem_acesso = False
-    if request.user.is_authenticated:
-        tem_acesso = AcessoProduto.objects.filter(
-            usuario=request.user,
-            produto=produto,
-            ativo=True
-        ).exists()
-    
-    context = {
-        'produto': produto,
-        'tem_acesso': tem_acesso
-    }
-    return render(request, 'produtos/produto_detalhes.html', context)
+    def montar_contexto():
+        produto = get_object_or_404(
+            Produto.objects.select_related('categoria').prefetch_related('conteudos'),
+            slug=slug,
+            status='publicado'
+        )
+        
+        return {
+            'produto': produto,
+            # Verificar se usuário tem acesso (se logado)
+            'tem_acesso': tem_acesso(request.user, produto),
+        }
 
+    return _renderizar_produto(request, 'detalhes', slug, 'produtos/produto_detalhes.html', montar_contexto)
 
+
+@condition(etag_func=_etag_produto, last_modified_func=_ultima_alteracao_produto)
 def produto_vendas(request, slug):
     """Página de vendas dinâmica do produto"""
-    produto = get_object_or_404(
-        Produto.objects.select_related('categoria'),
-        slug=slug,
-        status='publicado'
-    )
-    
-    context = {
-        'produto': produto,
-    }
-    return render(request, 'produtos/produto_vendas.html', context)
+    def montar_contexto():
+        produto = get_object_or_404(
+            Produto.objects.select_related('categoria'),
+            slug=slug,
+            status='publicado'
+        )
+        return {
+            'produto': produto,
+        }
+
+    return _renderizar_produto(request, 'vendas', slug, 'produtos/produto_vendas.html', montar_contexto)
 
 
 @login_required
@@ -69,7 +124,7 @@ def criar_pedido(request, slug):
     produto = get_object_or_404(Produto, slug=slug, status='publicado')
     
     # Verificar se usuário já tem acesso a este produto
-    if AcessoProduto.objects.filter(usuario=request.user, produto=produto, ativo=True).exists():
+    if tem_acesso(request.user, produto):
         messages.info(request, 'Você já possui este produto!')
         return redirect('dashboard:home')
     